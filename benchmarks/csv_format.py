@@ -0,0 +1,93 @@
+"""
+Benchmark; compiled CsvPlan rows versus the previous recursive flattening of every reading.
+
+    python benchmarks/csv_format.py [rows]
+
+The previous implementation is retained below as legacy_csv_format for comparison and to confirm both produce
+identical csv output for the benchmark readings.
+"""
+
+import sys
+import time
+
+from digital_multimeter.exceptions import MultimeterException
+from digital_multimeter.multimeters.MultimeterFortuneFS9721 import MultimeterFortuneFS9721
+from digital_multimeter.multimeters.MultimeterVC870USBHID import MultimeterVC870USBHID
+from digital_multimeter.utils.cli_output import _csv_format
+
+FS9721_FRAMES = [
+    bytes.fromhex("162035435e677e8995a0b8c0d4e0"),
+    bytes.fromhex("1a2f3d4d5b617f879da0b0c1d5e0"),
+    bytes.fromhex("122035475d677d879da0b0c0d2e0"),
+]
+VC870_PACKETS = [b"000123450000000000000", b"811001230000000000100", b"903012340567800000000"]
+
+
+def legacy_csv_format(data, delimiter=".", row=0):
+    flat_data = _legacy_flatten_data(data=data, delimiter=delimiter)
+    output = ""
+    if row == 0:
+        output = "{}{}".format(output, _legacy_csv_row(list(flat_data.keys())))
+    output = "{}{}".format(output, _legacy_csv_row(list(flat_data.values())))
+    return output
+
+
+def _legacy_csv_row(list_items, char="", end="\n"):
+    return char + "{char},{char}".format(char=char).join(str(x) for x in list_items) + char + end
+
+
+def _legacy_flatten_data(data, parent_key="", delimiter="."):
+    items = []
+    if type(data) is list:
+        for list_index, value in enumerate(data):
+            new_key = "{}{}{}".format(parent_key, delimiter, str(list_index)) if parent_key else str(list_index)
+            if type(value) in (str, int, float, bool):
+                items.append((new_key, value))
+            else:
+                items.extend(_legacy_flatten_data(value, new_key, delimiter=delimiter).items())
+    elif type(data) is dict:
+        for key, value in data.items():
+            new_key = "{}{}{}".format(parent_key, delimiter, key) if parent_key else key
+            if type(value) in (str, int, float, bool) or value is None:
+                items.append((new_key, value))
+            else:
+                items.extend(_legacy_flatten_data(value, new_key, delimiter=delimiter).items())
+    else:
+        raise MultimeterException("Unsupported data type encountered while attempting to __flatten_data()")
+    return dict(items)
+
+
+def readings(multimeter_class, frames):
+    multimeter = multimeter_class(connect=None)
+    return [multimeter.parse_packet(frame) for frame in frames * 100]
+
+
+def run(format_function, data, rows):
+    started = time.perf_counter()
+    length = 0
+    for row in range(rows):
+        length += len(format_function(data[row % len(data)], "_", row))
+    return time.perf_counter() - started, length
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print("rows: {}".format(rows))
+    for name, data in (
+        ("MultimeterFortuneFS9721", readings(MultimeterFortuneFS9721, FS9721_FRAMES)),
+        ("MultimeterVC870USBHID", readings(MultimeterVC870USBHID, VC870_PACKETS)),
+    ):
+        for row, reading in enumerate(data):
+            assert _csv_format(reading, "_", row % 2) == legacy_csv_format(reading, "_", row % 2)
+        legacy_time, legacy_length = run(legacy_csv_format, data, rows)
+        plan_time, plan_length = run(_csv_format, data, rows)
+        assert plan_length == legacy_length
+        print(
+            "{:<24} legacy flatten {:.3f} us/row  compiled plan {:.3f} us/row  speedup {:.1f}x".format(
+                name, legacy_time / rows * 1e6, plan_time / rows * 1e6, legacy_time / plan_time
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Microbenchmark; FS9721 table-driven decode() versus the previous string/bit-string parse_packet() implementation.
+
+    python benchmarks/fs9721_decode.py [iterations]
+
+The previous implementation is retained below as LegacyFS9721 for comparison and to confirm both produce
+identical readings for the benchmark frames.
+"""
+
+import random
+import sys
+import timeit
+
+from digital_multimeter.exceptions import MultimeterException
+from digital_multimeter.multimeters.MultimeterFortuneFS9721 import decode
+
+FRAMES = [
+    bytes.fromhex("162035435e677e8995a0b8c0d4e0"),
+    bytes.fromhex("1a2f3d4d5b617f879da0b0c1d5e0"),
+    bytes.fromhex("122030475d6e788090a2b0c4d0e0"),
+    bytes.fromhex("122035475d677d879da0b0c0d2e0"),
+    bytes.fromhex("12273d475d657b839ea0b0c0d0e1"),
+]
+
+
+class LegacyFS9721:
+    def parse_packet(self, packet):
+        value = self._parse_packet_display_value(packet)
+        scale, scale_name, scale_symbol = self._parse_packet_scale(packet)
+        if value is None or scale is None:
+            scaled_value = None
+        else:
+            scaled_value = value * scale
+        unit_name, unit_symbol = self._parse_packet_units(packet)
+        return {
+            "reading": {
+                "value": value,
+                "unit_name": unit_name,
+                "unit_symbol": unit_symbol,
+                "scale": scale,
+                "scale_name": scale_name,
+                "scale_symbol": scale_symbol,
+                "scaled_value": scaled_value,
+                "is_relative": self._parse_packet_relative(packet),
+            },
+            "instrument": {
+                "module": "MultimeterFortuneFS9721",
+                "operation_mode": self._parse_packet_operation_mode(packet),
+                "low_battery": self._parse_packet_low_battery(packet),
+                "is_hold": self._parse_packet_hold(packet),
+            },
+        }
+
+    def _byte_nibble(self, data):
+        return "{:08b}".format(int(data.hex(), 16))[-4:]
+
+    def _parse_packet_operation_mode(self, packet):
+        if int(packet[12][0]) == 1 and int(packet[0][0]) == 1:
+            return "current_ac"
+        elif int(packet[12][0]) == 1 and int(packet[0][1]) == 1:
+            return "current_dc"
+        elif int(packet[12][1]) == 1 and int(packet[0][0]) == 1:
+            return "voltage_ac"
+        elif int(packet[12][1]) == 1 and int(packet[0][1]) == 1:
+            return "voltage_dc"
+        elif int(packet[11][1]) == 1 and int(packet[10][3]) == 0:
+            return "resistance"
+        elif int(packet[9][3]) == 1 and int(packet[12][1]) == 1:
+            return "diode"
+        elif int(packet[11][1]) == 1 and int(packet[10][3]) == 1:
+            return "continuity"
+        elif int(packet[11][0]) == 1:
+            return "capacitance"
+        elif int(packet[12][2]) == 1 or int(packet[10][1]) == 1:
+            return "frequency"
+        elif int(packet[13][3]) == 1:
+            return "temperature"
+        raise MultimeterException("Unsupported digital multimeter mode from packet")
+
+    def _parse_packet_display_value(self, packet):
+        if int(packet[1][0]) == 1:
+            sign = -1
+        else:
+            sign = 1
+
+        if int(packet[7][0]) == 1:
+            multiplier = 0.1
+        elif int(packet[5][0]) == 1:
+            multiplier = 0.01
+        elif int(packet[3][0]) == 1:
+            multiplier = 0.001
+        else:
+            multiplier = 1
+
+        def parse_digit(nibble_1, nibble_2):
+            bits = "{}{}".format(nibble_1, nibble_2)[1:]
+            if bits == "0000101":
+                return "1"
+            elif bits == "1011011":
+                return "2"
+            elif bits == "0011111":
+                return "3"
+            elif bits == "0100111":
+                return "4"
+            elif bits == "0111110":
+                return "5"
+            elif bits == "1111110":
+                return "6"
+            elif bits == "0010101":
+                return "7"
+            elif bits == "1111111":
+                return "8"
+            elif bits == "0111111":
+                return "9"
+            elif bits == "1111101":
+                return "0"
+            elif bits == "1101000":
+                return "L"
+            elif bits == "0000000":
+                return ""
+            else:
+                raise MultimeterException("Unknown digit")
+
+        digit_1 = parse_digit(packet[1], packet[2])
+        digit_2 = parse_digit(packet[3], packet[4])
+        digit_3 = parse_digit(packet[5], packet[6])
+        digit_4 = parse_digit(packet[7], packet[8])
+
+        try:
+            number = int("{}{}{}{}".format(digit_1, digit_2, digit_3, digit_4))
+        except ValueError:
+            return None
+        return sign * number * multiplier
+
+    def _parse_packet_scale(self, packet):
+        if int(packet[10][2]) == 1:
+            scale = 1e6
+            scale_name = "mega"
+            scale_symbol = "M"
+        elif int(packet[9][2]) == 1:
+            scale = 1e3
+            scale_name = "kilo"
+            scale_symbol = "k"
+        elif int(packet[10][0]) == 1:
+            scale = 1e-3
+            scale_name = "milli"
+            scale_symbol = "m"
+        elif int(packet[9][0]) == 1:
+            scale = 1e-6
+            scale_name = "micro"
+            scale_symbol = "\u03BC"
+        elif int(packet[9][1]) == 1:
+            scale = 1e-9
+            scale_name = "nano"
+            scale_symbol = "n"
+        else:
+            scale = 1
+            scale_name = None
+            scale_symbol = None
+        return scale, scale_name, scale_symbol
+
+    def _parse_packet_units(self, packet):
+        if int(packet[12][0]) == 1:
+            unit_name = "amps"
+            unit_symbol = "A"
+        elif int(packet[12][1]) == 1:
+            unit_name = "volts"
+            unit_symbol = "V"
+        elif int(packet[11][1]) == 1:
+            unit_name = "ohms"
+            unit_symbol = "\u03A9"
+        elif int(packet[11][0]) == 1:
+            unit_name = "farads"
+            unit_symbol = "F"
+        elif int(packet[12][2]) == 1:
+            unit_name = "hertz"
+            unit_symbol = "Hz"
+        elif int(packet[10][1]) == 1:
+            unit_name = "duty-cycle"
+            unit_symbol = "%"
+        elif int(packet[13][3]) == 1:
+            unit_name = "celsius"
+            unit_symbol = "C"
+        else:
+            raise MultimeterException("Unknown measurement units")
+        return unit_name, unit_symbol
+
+    def _parse_packet_low_battery(self, packet):
+        if int(packet[12][3]) == 1:
+            return True
+        return False
+
+    def _parse_packet_hold(self, packet):
+        if int(packet[11][3]) == 1:
+            return True
+        return False
+
+    def _parse_packet_relative(self, packet):
+        if int(packet[11][2]) == 1:
+            return True
+        return False
+
+
+def main(iterations=100000):
+    legacy = LegacyFS9721()
+    frames = [random.choice(FRAMES) for _ in range(iterations)]
+
+    for frame in FRAMES:
+        assert legacy.parse_packet([legacy._byte_nibble(frame[i : i + 1]) for i in range(14)]) == decode(frame)
+
+    def run_legacy():
+        for frame in frames:
+            legacy.parse_packet([legacy._byte_nibble(frame[i : i + 1]) for i in range(14)])
+
+    def run_decode():
+        for frame in frames:
+            decode(frame)
+
+    legacy_seconds = min(timeit.repeat(run_legacy, number=1, repeat=3))
+    decode_seconds = min(timeit.repeat(run_decode, number=1, repeat=3))
+    print("frames:          {}".format(iterations))
+    print("legacy parse:    {:.3f} us/frame".format(legacy_seconds / iterations * 1e6))
+    print("table decode():  {:.3f} us/frame".format(decode_seconds / iterations * 1e6))
+    print("speedup:         {:.1f}x".format(legacy_seconds / decode_seconds))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
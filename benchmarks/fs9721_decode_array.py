@@ -0,0 +1,68 @@
+"""
+Benchmark; vectorised FS9721 decode_array() versus the scalar FrameReader + decode() path over a synthetic
+raw serial capture.
+
+    python benchmarks/fs9721_decode_array.py [frames]
+
+The scalar path is timed over a tenth of the capture and extrapolated per frame.
+"""
+
+import sys
+import time
+
+import numpy
+
+from digital_multimeter.multimeters.MultimeterFortuneFS9721 import (
+    MultimeterFortuneFS9721FrameReader,
+    decode,
+    decode_array,
+)
+
+FRAMES = [
+    bytes.fromhex("162035435e677e8995a0b8c0d4e0"),
+    bytes.fromhex("1a2f3d4d5b617f879da0b0c1d5e0"),
+    bytes.fromhex("122030475d6e788090a2b0c4d0e0"),
+    bytes.fromhex("122035475d677d879da0b0c0d2e0"),
+    bytes.fromhex("12273d475d657b839ea0b0c0d0e1"),
+]
+
+
+def synthetic_capture(frames):
+    choices = numpy.random.default_rng(9721).integers(0, len(FRAMES), size=frames)
+    table = numpy.frombuffer(b"".join(FRAMES), dtype=numpy.uint8).reshape(len(FRAMES), -1)
+    return table[choices].tobytes()
+
+
+def scalar_decode(capture):
+    reader = MultimeterFortuneFS9721FrameReader()
+    reader.feed(capture)
+    readings = []
+    frame = reader.next_frame()
+    while frame is not None:
+        readings.append(decode(frame))
+        frame = reader.next_frame()
+    return readings
+
+
+def main(frames=2000000):
+    capture = synthetic_capture(frames)
+
+    started = time.perf_counter()
+    readings = decode_array(capture)
+    array_seconds = time.perf_counter() - started
+    assert len(readings) == frames
+
+    scalar_frames = max(frames // 10, 1)
+    started = time.perf_counter()
+    scalar_readings = scalar_decode(capture[: scalar_frames * 14])
+    scalar_seconds = (time.perf_counter() - started) * frames / scalar_frames
+    assert len(scalar_readings) == scalar_frames
+
+    print("frames:           {} ({:.1f} MB)".format(frames, len(capture) / 1e6))
+    print("decode_array():   {:.2f} s, {:.0f} frames/s".format(array_seconds, frames / array_seconds))
+    print("scalar decode():  {:.2f} s (extrapolated), {:.0f} frames/s".format(scalar_seconds, frames / scalar_seconds))
+    print("speedup:          {:.1f}x".format(scalar_seconds / array_seconds))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,81 @@
+"""
+Allocation benchmark; an in-memory history of readings held as nested dicts versus compact Reading objects.
+
+    python benchmarks/reading_memory.py [readings]
+
+Each driver parses a cycle of recorded frames with increasing timestamps, as `DigitalMultimeter.replay()` or a
+long `get_reading()` loop would, and the readings are retained in a list; the memory still allocated once
+the history is complete is measured with tracemalloc.
+"""
+
+import sys
+import time
+import tracemalloc
+
+from digital_multimeter.multimeters.MultimeterEDI9604 import MultimeterEDI9604
+from digital_multimeter.multimeters.MultimeterFortuneFS9721 import MultimeterFortuneFS9721
+from digital_multimeter.multimeters.MultimeterVC870USBHID import MultimeterVC870USBHID
+
+FRAMES = {
+    MultimeterFortuneFS9721: [
+        bytes.fromhex("162035435e677e8995a0b8c0d4e0"),
+        bytes.fromhex("1a2f3d4d5b617f879da0b0c1d5e0"),
+        bytes.fromhex("122035475d677d879da0b0c0d2e0"),
+    ],
+    MultimeterEDI9604: [
+        b"+1234 2" + bytes([0b10000, 0, 0, 0b10000000, 0]) + b"\r\n",
+        b"-0056 1" + bytes([0b100000, 0, 0b100000, 0b100000, 0]) + b"\r\n",
+    ],
+    MultimeterVC870USBHID: [
+        b"000123450000000000000",
+        b"811001230000000000100",
+        b"903012340567800000000",
+    ],
+}
+
+
+def history(multimeter_class, count, compact):
+    multimeter = multimeter_class(connect=None)
+    frames = FRAMES[multimeter_class]
+    timestamp = time.time_ns()
+    readings = []
+    for index in range(count):
+        # realistic frame values; distinct readings and timestamps rather than one repeated object
+        readings.append(multimeter.parse_packet(frames[index % len(frames)], timestamp + index, compact=compact))
+    return readings
+
+
+def measure(multimeter_class, count, compact):
+    tracemalloc.start()
+    started = time.perf_counter()
+    readings = history(multimeter_class, count, compact)
+    elapsed = time.perf_counter() - started
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del readings
+    return allocated, elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    print("{} readings held in memory".format(count))
+    for multimeter_class in FRAMES:
+        dict_bytes, dict_time = measure(multimeter_class, count, compact=False)
+        compact_bytes, compact_time = measure(multimeter_class, count, compact=True)
+        print(
+            "{:<24} dict {:7.1f} MB ({:4.0f} B/reading, {:.2f}s)  compact {:6.1f} MB ({:4.0f} B/reading, {:.2f}s)"
+            "  {:.1f}x less".format(
+                multimeter_class.__name__,
+                dict_bytes / 1e6,
+                dict_bytes / count,
+                dict_time,
+                compact_bytes / 1e6,
+                compact_bytes / count,
+                compact_time,
+                dict_bytes / compact_bytes,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Microbenchmark; VC870 table-driven decode() versus the previous str based parse_packet() implementation.
+
+    python benchmarks/vc870_decode.py [iterations]
+
+The previous implementation is retained below as LegacyVC870 for comparison and is also used by the
+differential test in tests/digital_multimeter/test_multimeter_vc870.py.
+"""
+
+import math
+import random
+import sys
+import timeit
+
+from digital_multimeter.exceptions import MultimeterException
+from digital_multimeter.multimeters.MultimeterVC870USBHID import decode, decode_packets
+
+PACKETS = [
+    b"000123450000000000000",
+    b"811001230000000000100",
+    b"900012340056700000000",
+    b"200099990000000000800",
+    b"300004560000000000000",
+]
+
+
+class LegacyVC870:
+    def parse_packet(self, packet):
+        mode = self._parse_packet_operation_mode(packet)
+        value, aux_value = self._parse_packet_display_value(packet)
+        value *= mode[2]
+        flags = self._parse_packet_flags(packet)
+
+        if "overflow" in flags or "open" in flags:
+            value = math.inf
+            aux_value = math.inf
+
+        return_dict = {
+            "reading": {
+                "operation_mode": mode[0],
+                "value": value,
+                "unit": mode[1],
+                "aux_value": None,
+                "aux_unit": None,
+            },
+            "instrument": {
+                "module": "MultimeterVC870USBHID",
+                "active_flags": flags,
+            },
+        }
+
+        # In certain modes AUX values are available
+        if len(mode) == 5:
+            aux_value *= mode[4]
+            return_dict["reading"]["aux_value"] = aux_value
+            return_dict["reading"]["aux_unit"] = mode[3]
+
+        return return_dict
+
+    def _parse_packet_operation_mode(self, packet):
+        operation_id = packet[:2]
+
+        # The first two bytes define the measurement mode (function code + function select code)
+        # Resulting from these two bytes the following parameters can be derived:
+        # 1. Operation mode
+        # 2. Physical unit that is measured
+        # 3. Base factor to calculate the SI value from the display value
+        # In some operation modes there is an auxiliary value measured and displayed.
+        # In this case the value tuple is extended by:
+        # 4. Physical unit of the auxiliary measurement
+        # 5. Base factor to calculate the SI value from the auxiliary value
+        id_to_op_mode = {
+            "00": ("DCV", "V", 1e-4),
+            "01": ("ACV", "V", 1e-4),
+            "10": ("DCmV", "V", 1e-5),
+            "11": ("TEMP", "°C", 1e-1),
+            "20": ("RES", "Ohm", 1e-2),
+            "21": ("CTN", "Ohm", 1e-2),
+            "30": ("CAP", "F", 1e-12),
+            "40": ("DIO", "V", 1e-4),
+            "50": ("FREQ", "Hz", 1),
+            "51": ("(4~20)mA%%", "%%", 1),
+            "60": ("DCuA", "A", 1e-8),
+            "61": ("ACuA", "A", 1e-8),
+            "70": ("DCmA", "A", 1e-6),
+            "71": ("ACmA", "A", 1e-6),
+            "80": ("DCA", "A", 1e-3),
+            "81": ("ACA", "A", 1e-3),
+            "90": ("Act+Apar_Power", "W", 0.1, "VA", 0.1),
+            "91": ("PowFactor+Freq", "cos_fi", 1e-3, "Hz", 0.1),
+            "92": ("VoltEff+CurrEff", "V", 0.1, "A", 0.1),
+        }
+
+        operation_mode = id_to_op_mode.get(operation_id)
+        if operation_mode is None:
+            raise MultimeterException("Unsupported digital multimeter mode from packet")
+
+        return operation_mode
+
+    def _parse_packet_display_value(self, packet):
+        value = int(packet[3:8])
+        aux_value = int(packet[8:13])
+
+        sign = 1
+        aux_sign = 1
+
+        status = ord(packet[15]) & 0b1111
+        if status & 0b100:
+            sign = -1
+        if status & 0b1000:
+            aux_sign = -1
+
+        multiplier = 10 ** int(packet[2])
+
+        value *= sign * multiplier
+        aux_value *= aux_sign * multiplier
+
+        return value, aux_value
+
+    def _parse_packet_flags(self, packet):
+        # rs232_dat[13] Simulate strip tens digit --> discard
+        # rs232_dat[14] Simulate strip the single digit --> discard
+        status = ord(packet[15]) & 0b1111
+        option1 = ord(packet[16]) & 0b1111
+        option2 = ord(packet[17]) & 0b1111
+        option3 = ord(packet[18]) & 0b1111
+        option4 = ord(packet[19]) & 0b1111
+
+        active_flags = []
+
+        if status & 0b10:
+            active_flags.append("battery")
+        if status & 0b1 or option2 & 0b1000:
+            active_flags.append("overflow")
+        if option1 & 0b1000:
+            active_flags.append("max")
+        if option1 & 0b100:
+            active_flags.append("min")
+        if option1 & 0b10:
+            active_flags.append("maxmin")
+        if option1 & 0b1:
+            active_flags.append("rel")
+        if option2 & 0b100 or option4 & 0b1:
+            active_flags.append("open")
+        if option2 & 0b10:
+            active_flags.append("manual")
+        if option2 & 0b1:
+            active_flags.append("hold")
+        if option3 & 0b1000:
+            active_flags.append("light")
+        if option3 & 0b10:
+            active_flags.append("warning")
+        if option4 & 0b1000:
+            active_flags.append("misplug_warn")
+        if option4 & 0b100:
+            active_flags.append("lo")
+        if option4 & 0b10:
+            active_flags.append("hi")
+
+        # They are always on and therefore not very helpful
+        # if option3 & 0b100:
+        # active_flags.append("usb")
+        # if option3 & 0b1:
+        # active_flags.append("auto_power")
+
+        return "|".join(active_flags)
+
+
+def main(iterations=100000):
+    legacy = LegacyVC870()
+    packets = [random.choice(PACKETS) for _ in range(iterations)]
+    packets_str = [packet.decode("ascii") for packet in packets]
+
+    for packet in PACKETS:
+        assert legacy.parse_packet(packet.decode("ascii")) == decode(packet)
+
+    def run_legacy():
+        for packet in packets_str:
+            legacy.parse_packet(packet)
+
+    def run_decode():
+        for packet in packets:
+            decode(packet)
+
+    def run_decode_packets():
+        for _ in decode_packets(packets):
+            pass
+
+    legacy_seconds = min(timeit.repeat(run_legacy, number=1, repeat=3))
+    decode_seconds = min(timeit.repeat(run_decode, number=1, repeat=3))
+    batch_seconds = min(timeit.repeat(run_decode_packets, number=1, repeat=3))
+    print("packets:           {}".format(iterations))
+    print("legacy parse:      {:.3f} us/packet".format(legacy_seconds / iterations * 1e6))
+    print("decode():          {:.3f} us/packet".format(decode_seconds / iterations * 1e6))
+    print("decode_packets():  {:.3f} us/packet".format(batch_seconds / iterations * 1e6))
+    print("speedup:           {:.1f}x".format(legacy_seconds / decode_seconds))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
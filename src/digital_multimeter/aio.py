@@ -0,0 +1,247 @@
+import asyncio
+import errno
+import logging
+import threading
+import time
+
+from digital_multimeter.exceptions import MultimeterException
+from digital_multimeter.main import DigitalMultimeter
+
+logger = logging.getLogger(__name__)
+
+READINGS_QUEUE_SIZE = 64
+HID_POLL_TIMEOUT_MS = 20
+
+
+class AsyncDigitalMultimeter:
+    """
+    Implements an asyncio interface for the digital multimeters, reading them from the event loop without a
+    thread per multimeter.
+
+    Serial multimeters register their serial port with `loop.add_reader()` and frames are decoded on the loop as
+    their bytes arrive; this requires an event loop that supports `add_reader()`, the default on POSIX.  USB HID
+    multimeters, the `Voltcraft_VC870`, are read by a single reader thread shared by all of them, which hands
+    packets to the loop.
+
+    Readings are queued for the consumer, up to `queue_size`.  When the queue is full a serial multimeter is no
+    longer read until the consumer catches up, leaving the bytes buffered by the operating system, while the
+    shared USB HID reader drops the oldest queued reading in favour of the newest.
+
+    Usage::
+
+        async with AsyncDigitalMultimeter(connect="/dev/ttyUSB0") as dmm:
+            async for reading in dmm.stream():
+                ...
+    """
+
+    api = None
+    multimeter = None
+    queue_size = None
+
+    readings = None
+    loop = None
+    fileno = None
+    paused = False
+    failed = False
+    received_at = None
+    readings_dropped = 0
+
+    def __init__(self, connect=None, model="Default", queue_size=READINGS_QUEUE_SIZE, **multimeter_options):
+        """
+        :param connect: str [required]
+            the connection to the digital multimeter, for example `/dev/ttyUSB0`
+        :param model: str [default `Default`]
+            the digital multimeter model to use for this connection, see `DigitalMultimeter`
+        :param queue_size: int [default 64]
+            the number of readings queued for the consumer
+        :param multimeter_options: [optional]
+            model specific options passed through to the multimeter implementation
+        """
+        self.api = DigitalMultimeter(connect=connect, model=model, **multimeter_options)
+        self.queue_size = queue_size
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        """
+        Connect the multimeter if required and start reading it from the running event loop.
+        """
+        if self.readings is not None:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.readings = asyncio.Queue(maxsize=self.queue_size)
+        self.multimeter = self.api.get_multimeter()
+        if hasattr(self.multimeter, "interface_receive"):
+            self.multimeter.interface_flush()
+            _HID_READER.register(self.multimeter, self._hid_packet, self._hid_error)
+        else:
+            self.multimeter.frame_reader.reset()
+            self.fileno = self.multimeter.serial.fileno()
+            self.loop.add_reader(self.fileno, self._serial_readable)
+        logger.debug("Started asyncio reader for {}".format(self.api.connect))
+
+    def stop(self):
+        """
+        Stop reading the multimeter; readings already queued are discarded.
+        """
+        if self.readings is None:
+            return
+        if self.fileno is not None:
+            if not self.paused:
+                self.loop.remove_reader(self.fileno)
+            self.fileno = None
+        else:
+            _HID_READER.unregister(self.multimeter)
+        self.readings = None
+        self.paused = self.failed = False
+        logger.debug("Stopped asyncio reader for {}".format(self.api.connect))
+
+    async def get_reading(self, compact=False):
+        """
+        Returns the next reading; see `DigitalMultimeter.get_reading()`.
+        """
+        self.start()
+        item = await self.readings.get()
+        if self.paused and not self.failed and not self.readings.full():
+            self._serial_resume()
+        if isinstance(item, Exception):
+            self.stop()
+            raise item
+        packet, timestamp = item
+        return self.multimeter.parse_packet(packet, timestamp=timestamp, compact=compact)
+
+    async def stream(self, count=0, compact=False):
+        """
+        Returns an async generator of readings; the multimeter is read until the generator is closed or the
+        task consuming it is cancelled, when reading stops.
+
+        :param count: int [default 0]
+            the number of readings to return; use 0 for non-stop
+        :param compact: bool [default False]
+            yield compact `Reading` objects instead of dicts, see `DigitalMultimeter.get_reading()`
+        """
+        counted = 0
+        try:
+            while counted < count or count == 0:
+                yield await self.get_reading(compact=compact)
+                counted += 1
+        finally:
+            self.stop()
+
+    def get_stats(self):
+        """
+        Returns the acquisition counters of the multimeter along with the readings queued and dropped.
+        """
+        return {
+            **self.api.get_stats(),
+            "readings_queued": self.readings.qsize() if self.readings is not None else 0,
+            "readings_dropped": self.readings_dropped,
+        }
+
+    def _serial_readable(self):
+        serial, frame_reader = self.multimeter.serial, self.multimeter.frame_reader
+        try:
+            data = serial.read(serial.in_waiting)
+        except Exception as e:
+            self._error(MultimeterException(e))
+            return
+        if not data:
+            return
+        self.received_at = time.time_ns()
+        frame_reader.feed(data)
+        self._serial_frames()
+
+    def _serial_frames(self):
+        while True:
+            frame = self.multimeter.frame_reader.next_frame()
+            if frame is None:
+                return
+            self.readings.put_nowait((frame, self.received_at))
+            if self.readings.full():
+                # backpressure; leave further bytes with the serial port until the consumer catches up
+                self.paused = True
+                self.loop.remove_reader(self.fileno)
+                return
+
+    def _serial_resume(self):
+        self.paused = False
+        self.loop.add_reader(self.fileno, self._serial_readable)
+        # frames already buffered when reading paused
+        self._serial_frames()
+
+    def _hid_packet(self, packet, timestamp):
+        if self.readings is None:
+            return
+        if self.readings.full():
+            self.readings.get_nowait()
+            self.readings_dropped += 1
+        self.readings.put_nowait((packet, timestamp))
+
+    def _hid_error(self, error):
+        if self.readings is not None:
+            self._error(MultimeterException("USB HID reader failed: {}".format(error)))
+
+    def _error(self, error):
+        self.failed = True
+        if self.readings.full():
+            self.readings.get_nowait()
+        self.readings.put_nowait(error)
+        if self.fileno is not None and not self.paused:
+            self.paused = True
+            self.loop.remove_reader(self.fileno)
+
+
+class _SharedHIDReader:
+    """
+    A single thread that reads the endpoints of all registered USB HID multimeters in turn, handing each packet
+    with its receive time to the event loop of the multimeter.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.multimeters = {}
+        self.thread = None
+
+    def register(self, multimeter, packet_callback, error_callback):
+        loop = asyncio.get_running_loop()
+
+        def deliver(packet):
+            loop.call_soon_threadsafe(packet_callback, packet, time.time_ns())
+
+        with self.lock:
+            multimeter.stream_callback = deliver
+            self.multimeters[multimeter] = (loop, error_callback)
+            if not self.thread:
+                self.thread = threading.Thread(target=self._reader, name="dmm-hid-reader", daemon=True)
+                self.thread.start()
+
+    def unregister(self, multimeter):
+        with self.lock:
+            if self.multimeters.pop(multimeter, None):
+                multimeter.stream_callback = None
+
+    def _reader(self):
+        while True:
+            with self.lock:
+                multimeters = list(self.multimeters.items())
+                if not multimeters:
+                    self.thread = None
+                    return
+            for multimeter, (loop, error_callback) in multimeters:
+                try:
+                    if multimeter.interface_receive(timeout_ms=HID_POLL_TIMEOUT_MS):
+                        multimeter._stream_packets()
+                except Exception as e:
+                    if getattr(e, "errno", None) == errno.ETIMEDOUT:
+                        continue
+                    logger.debug("USB HID reader failed: {}".format(e))
+                    self.unregister(multimeter)
+                    loop.call_soon_threadsafe(error_callback, e)
+
+
+_HID_READER = _SharedHIDReader()
@@ -0,0 +1,237 @@
+import bisect
+import logging
+import mmap
+import os
+import struct
+import time
+
+from digital_multimeter.exceptions import MultimeterException
+
+logger = logging.getLogger(__name__)
+
+#
+# Raw capture file format
+#
+# A capture file starts with CAPTURE_MAGIC followed by an append-only sequence of blocks, each block
+# starting with a one byte tag:-
+#  - BLOCK_SESSION: a recording session began; wall-clock ns, monotonic ns, model name length, model name
+#  - BLOCK_FRAME:   a raw frame as received; monotonic ns, frame length, frame bytes
+#
+# Frame timestamps are taken from the monotonic clock and converted to wall-clock time relative to the
+# session that contains them, which keeps them strictly ordered even if the system clock is adjusted.
+#
+
+CAPTURE_MAGIC = b"DMMCAP1\n"
+BLOCK_SESSION = b"S"
+BLOCK_FRAME = b"F"
+
+SESSION_STRUCT = struct.Struct("<QQB")
+FRAME_STRUCT = struct.Struct("<QH")
+
+#
+# Sparse capture index sidecar file (<capture>.idx)
+#
+# INDEX_MAGIC, a header (indexed capture size, current session offset, frames indexed, index interval) and
+# then one (wall-clock ns, frame block offset, session block offset) entry per INDEX_INTERVAL frames.
+#
+
+INDEX_SUFFIX = ".idx"
+INDEX_MAGIC = b"DMMIDX1\n"
+INDEX_INTERVAL = 1024
+INDEX_HEADER_STRUCT = struct.Struct("<QQQQ")
+INDEX_ENTRY_STRUCT = struct.Struct("<qQQ")
+NO_SESSION = 0xFFFFFFFFFFFFFFFF
+
+
+class CaptureException(MultimeterException):
+    pass
+
+
+class CaptureWriter:
+    """
+    Appends raw multimeter frames with their monotonic capture timestamps to a capture file.
+    """
+
+    filename = None
+    file = None
+
+    def __init__(self, filename, model):
+        self.filename = filename
+        try:
+            self.file = open(filename, "ab")
+        except OSError as e:
+            raise CaptureException("Unable to open capture file", e)
+
+        if self.file.tell() == 0:
+            self.file.write(CAPTURE_MAGIC)
+        else:
+            with open(filename, "rb") as file:
+                if file.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+                    self.file.close()
+                    raise CaptureException("Existing file is not a digital-multimeter capture file", filename)
+
+        model = model.encode("utf8")
+        self.file.write(BLOCK_SESSION + SESSION_STRUCT.pack(time.time_ns(), time.monotonic_ns(), len(model)) + model)
+        logger.debug("Capture file opened for append: {}".format(filename))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, frame, timestamp_monotonic=None):
+        if timestamp_monotonic is None:
+            timestamp_monotonic = time.monotonic_ns()
+        self.file.write(BLOCK_FRAME + FRAME_STRUCT.pack(timestamp_monotonic, len(frame)) + frame)
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+class CaptureReader:
+    """
+    Iterates the frames of a capture file as (model, timestamp_ns, frame) tuples, where timestamp_ns is the
+    wall-clock capture time in nanoseconds.  A truncated final block, for example from an interrupted
+    recording, ends the iteration.
+
+    The capture file is memory-mapped; time-range queries through `frames(since, until)` use a sparse
+    timestamp index, built lazily on first use and cached in a `<filename>.idx` sidecar file (in memory
+    only if the sidecar can not be written), so only the frames within the range are read.  The index is
+    extended rather than rebuilt when the capture file has since been appended to.
+    """
+
+    filename = None
+    index_filename = None
+    index_interval = None
+
+    def __init__(self, filename, index_interval=INDEX_INTERVAL):
+        self.filename = filename
+        self.index_filename = "{}{}".format(filename, INDEX_SUFFIX)
+        self.index_interval = index_interval
+        if not os.path.isfile(filename):
+            raise CaptureException("Unable to find the capture file supplied", filename)
+        self._index = None
+
+    def __iter__(self):
+        return self.frames()
+
+    def frames(self, since=None, until=None):
+        """
+        Returns a generator of (model, timestamp_ns, frame) tuples for frames captured within the optional
+        `since` and `until` wall-clock nanosecond timestamps (inclusive).
+        """
+        with open(self.filename, "rb") as file:
+            if file.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+                raise CaptureException("File is not a digital-multimeter capture file", self.filename)
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                offset, session = len(CAPTURE_MAGIC), None
+                if since is not None:
+                    entries = self.index(data)
+                    position = bisect.bisect_right(entries, (since,)) - 1
+                    if position >= 0:
+                        _, offset, session = entries[position]
+                for _, _, model, timestamp, frame in self._scan(data, offset, session):
+                    if since is not None and timestamp < since:
+                        continue
+                    if until is not None and timestamp > until:
+                        break
+                    yield model, timestamp, frame
+
+    def index(self, data=None):
+        """
+        Returns the sparse index as a list of (timestamp_ns, frame_offset, session_offset) tuples, one entry for
+        every `index_interval` frames.
+        """
+        if data is None:
+            with open(self.filename, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return self.index(data)
+
+        if self._index is None:
+            self._index = self._load_index()
+        entries, indexed_end, session, count = self._index
+        if indexed_end == len(data):
+            return entries
+
+        offset = indexed_end
+        for offset, session, _, timestamp, frame in self._scan(data, indexed_end, session):
+            if count % self.index_interval == 0:
+                entries.append((timestamp, offset, session))
+            count += 1
+            offset += 1 + FRAME_STRUCT.size + len(frame)
+        self._index = (entries, offset, session, count)
+        self._save_index()
+        return entries
+
+    def _scan(self, data, offset, session):
+        # yields (frame_offset, session_offset, model, timestamp_ns, frame) for each complete frame block
+        model, session_timestamp = None, 0
+        if session is not None:
+            model, session_timestamp, _ = self._session(data, session)
+        size = len(data)
+        while offset < size:
+            tag = data[offset : offset + 1]
+            if tag == BLOCK_FRAME:
+                end = offset + 1 + FRAME_STRUCT.size
+                if end > size:
+                    return
+                timestamp_monotonic, frame_size = FRAME_STRUCT.unpack_from(data, offset + 1)
+                if end + frame_size > size:
+                    return
+                yield offset, session, model, timestamp_monotonic + session_timestamp, data[end : end + frame_size]
+                offset = end + frame_size
+            elif tag == BLOCK_SESSION:
+                if offset + 1 + SESSION_STRUCT.size > size:
+                    return
+                model, session_timestamp, end = self._session(data, offset)
+                if end > size:
+                    return
+                session, offset = offset, end
+            else:
+                raise CaptureException("Corrupt capture file block", self.filename, offset)
+
+    def _session(self, data, offset):
+        # returns the model, the monotonic to wall-clock offset and the end offset of a session block
+        timestamp_wall, timestamp_monotonic, size = SESSION_STRUCT.unpack_from(data, offset + 1)
+        start = offset + 1 + SESSION_STRUCT.size
+        model = data[start : start + size].decode("utf8")
+        return model, timestamp_wall - timestamp_monotonic, start + size
+
+    def _load_index(self):
+        empty = ([], len(CAPTURE_MAGIC), None, 0)
+        if not os.path.isfile(self.index_filename):
+            return empty
+        with open(self.index_filename, "rb") as file:
+            content = file.read()
+        if content[: len(INDEX_MAGIC)] != INDEX_MAGIC:
+            return empty
+        offset = len(INDEX_MAGIC)
+        indexed_end, session, count, interval = INDEX_HEADER_STRUCT.unpack_from(content, offset)
+        if interval != self.index_interval or indexed_end > os.path.getsize(self.filename):
+            return empty
+        offset += INDEX_HEADER_STRUCT.size
+        entries = []
+        for timestamp, frame_offset, session_offset in INDEX_ENTRY_STRUCT.iter_unpack(content[offset:]):
+            entries.append((timestamp, frame_offset, None if session_offset == NO_SESSION else session_offset))
+        session = None if session == NO_SESSION else session
+        logger.debug("Capture index loaded: {}".format(self.index_filename))
+        return entries, indexed_end, session, count
+
+    def _save_index(self):
+        entries, indexed_end, session, count = self._index
+        content = [INDEX_MAGIC]
+        content.append(
+            INDEX_HEADER_STRUCT.pack(
+                indexed_end, NO_SESSION if session is None else session, count, self.index_interval
+            )
+        )
+        for timestamp, frame_offset, session_offset in entries:
+            session_offset = NO_SESSION if session_offset is None else session_offset
+            content.append(INDEX_ENTRY_STRUCT.pack(timestamp, frame_offset, session_offset))
+        try:
+            with open(self.index_filename, "wb") as file:
+                file.write(b"".join(content))
+        except OSError as e:
+            logger.debug("Unable to write capture index {}: {}".format(self.index_filename, e))
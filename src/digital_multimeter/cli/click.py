@@ -1,4 +1,7 @@
+import contextlib
+import datetime
 import logging
+import signal
 import sys
 import warnings
 
@@ -7,8 +10,24 @@ import click
 from digital_multimeter import __env_connect__ as ENV_CONNECT, __version__ as VERSION
 from digital_multimeter.cli.config import Config
 from digital_multimeter.exceptions import MultimeterException
+from digital_multimeter.exporter import DEFAULT_PORT as EXPORTER_PORT, MetricsExporter
+from digital_multimeter.fleet import FleetCollector
+from digital_multimeter.group import MultimeterGroup
 from digital_multimeter.main import DigitalMultimeter
-from digital_multimeter.utils import cli_output
+from digital_multimeter.server import CLIENT_QUEUE_SIZE, DEFAULT_PORT, ReadingServer
+from digital_multimeter.utils import OutputSink, QueuedOutputSink, SqliteOutputSink, cli_output
+from digital_multimeter.utils.aggregate import AggregateException, aggregate, parse_duration
+from digital_multimeter.utils.binary_output import CHUNK_SIZE
+from digital_multimeter.utils.deadband import DeadbandException, deadband, parse_deadband
+from digital_multimeter.utils.output_sink import OVERFLOW_POLICIES, QUEUE_SIZE, ROTATE_BOUNDARIES
+from digital_multimeter.utils.sqlite_output import SQLITE_BATCH_INTERVAL, SQLITE_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+# formats that require readings rather than aggregate summaries
+AGGREGATE_UNSUPPORTED_FORMATS = ("npy", "arrow", "sqlite")
+# formats that hold only the reading columns, which are all that --workers readings carry
+WORKERS_FORMATS = ("npy", "arrow", "sqlite")
 
 
 @click.group()
@@ -41,19 +60,368 @@ def dmm(quiet, verbose, disable_warnings):
         warnings.simplefilter("default")
 
 
+def _duration(ctx, param, value):
+    if value is None:
+        return None
+    try:
+        return parse_duration(value)
+    except AggregateException as e:
+        raise click.BadParameter(str(e))
+
+
+def _deadband(ctx, param, value):
+    if value is None:
+        return None
+    try:
+        return parse_deadband(value)
+    except DeadbandException as e:
+        raise click.BadParameter(str(e))
+
+
 @dmm.command("read")
-@click.option("-m", "--model", help="DMM model; overrides env-variable and config.", required=False, default="Default")
-@click.option("-c", "--connect", help="DMM connection; overrides env-variable and config.", required=False)
+@click.option(
+    "-m",
+    "--model",
+    "models",
+    multiple=True,
+    help="DMM model; overrides env-variable and config.  Repeat for each --connect or give once for all.",
+)
+@click.option(
+    "-c",
+    "--connect",
+    "connects",
+    multiple=True,
+    help="DMM connection; overrides env-variable and config.  Repeat to read several multimeters.",
+)
 @click.option("-C", "--config", help="Override config file; default=~/.digital-multimeter", required=False)
 @click.option(
     "-n", "--count", type=int, help="Perform <count> readings; use 0 for non-stop.", required=False, default=1
 )
+@click.option(
+    "-i",
+    "--interval",
+    callback=_duration,
+    help="Perform a reading every <duration>, e.g. 500ms or 1m; default=as fast as the multimeter",
+    required=False,
+)
+@click.option(
+    "--workers",
+    type=int,
+    help="Read several multimeters with <count> worker processes, output as npy/arrow/sqlite or --aggregate "
+    "summaries; 0 for one per CPU; default=threads",
+    required=False,
+)
 @click.option("-o", "--output", help="Output target file; default=stdout", default="stdout", required=False)
-@click.option("-f", "--format", help="Output format json/csv; default=json", default="json", required=False)
-def get_reading(model, connect, config, count, output, format):
+@click.option(
+    "-f", "--format", help="Output format json/csv/ndjson/msgpack/npy/arrow/sqlite; default=json", default="json"
+)
+@click.option("--flush-count", type=int, help="Flush output every <count> readings; 0 to disable; default=1", default=1)
+@click.option("--flush-interval", type=float, help="Flush output every <seconds>; default=disabled", required=False)
+@click.option("--fsync", is_flag=True, help="Fsync the output file on each flush.")
+@click.option("--batch", type=int, help="Write readings in batches of <count>; default=1, sqlite=500", required=False)
+@click.option(
+    "--batch-interval",
+    type=float,
+    help="Commit sqlite batches every <seconds>; default=0.25",
+    default=SQLITE_BATCH_INTERVAL,
+)
+@click.option("--chunk-size", type=int, help="Readings per npy/arrow chunk; default=1024", default=CHUNK_SIZE)
+@click.option(
+    "--queue-size",
+    type=int,
+    help="Output writer queue size; 0 to write synchronously; default=1024",
+    default=QUEUE_SIZE,
+)
+@click.option(
+    "--overflow",
+    type=click.Choice(OVERFLOW_POLICIES),
+    help="Output writer queue overflow policy; default=block",
+    default="block",
+)
+@click.option("--rotate-size", type=int, help="Rotate the output file every <bytes>; default=disabled", required=False)
+@click.option(
+    "--rotate-age", type=float, help="Rotate the output file every <seconds>; default=disabled", required=False
+)
+@click.option(
+    "--rotate-at",
+    type=click.Choice(ROTATE_BOUNDARIES),
+    help="Rotate the output file at each wall-clock minute/hour/day; default=disabled",
+    required=False,
+)
+@click.option("--compress", is_flag=True, help="Gzip compress rotated output files.")
+@click.option(
+    "--aggregate",
+    callback=_duration,
+    help="Output min/max/mean/stddev summaries of <duration> windows, e.g. 1s or 5m; default=disabled",
+    required=False,
+)
+@click.option(
+    "--slide", callback=_duration, help="Slide aggregate windows every <duration>; default=tumbling", required=False
+)
+@click.option(
+    "--deadband",
+    callback=_deadband,
+    help="Output readings only when the value changes by more than <threshold>, e.g. 0.001 or 0.5%; default=disabled",
+    required=False,
+)
+@click.option(
+    "--heartbeat",
+    callback=_duration,
+    help="Output an unchanged reading every <duration> with --deadband; default=disabled",
+    required=False,
+)
+def get_reading(
+    models,
+    connects,
+    config,
+    count,
+    interval,
+    workers,
+    output,
+    format,
+    flush_count,
+    flush_interval,
+    fsync,
+    batch,
+    batch_interval,
+    chunk_size,
+    queue_size,
+    overflow,
+    rotate_size,
+    rotate_age,
+    rotate_at,
+    compress,
+    aggregate,
+    slide,
+    deadband,
+    heartbeat,
+):
     """
     Read the digital multimeter and output data in various formats
+
+    Several multimeters, given by repeated --connect/--model options or by device sections in the
+    configuration file, are read concurrently and merged into one stream ordered by reading time, with each
+    reading tagged by its device.  With --workers the multimeters are shared out between worker processes,
+    which are restarted should they fail; their readings carry only the reading columns, so are output in a
+    columnar format or as --aggregate summaries.
     """
+    devices = _resolve_devices(models, connects, config)
+    if len(devices) > 1:
+        if interval:
+            raise click.UsageError("--interval is not supported with several multimeters")
+        if workers is not None:
+            if format.lower() not in WORKERS_FORMATS and not aggregate:
+                raise click.UsageError(
+                    "--workers readings can only be output as {} or as --aggregate summaries".format(
+                        "/".join(WORKERS_FORMATS)
+                    )
+                )
+            group = FleetCollector(devices, workers=workers or None)
+        else:
+            group = MultimeterGroup(devices)
+        readings, acquisition = group.get_readings(count), group
+        model = "+".join(sorted({device["model"] or "Default" for device in devices}))
+        connect = None
+    else:
+        model, connect = devices[0]["model"], devices[0]["connect"]
+        api = DigitalMultimeter(connect=connect, model=model)
+        # without an interval readings are taken back to back, so every frame is read rather than skipped
+        readings = api.stream(count=count, interval=interval, freshest=bool(interval))
+        acquisition = contextlib.nullcontext()
+
+    if format.lower() == "sqlite":
+        if rotate_size or rotate_age or rotate_at or compress:
+            raise MultimeterException("Output rotation is not supported for sqlite output")
+        sink = SqliteOutputSink(
+            output=output,
+            device=connect,
+            batch_size=batch or SQLITE_BATCH_SIZE,
+            batch_interval=batch_interval,
+        )
+    else:
+        sink = OutputSink(
+            output=output,
+            format=format,
+            flush_count=flush_count,
+            flush_interval=flush_interval,
+            fsync=fsync,
+            batch_size=batch or 1,
+            chunk_size=chunk_size,
+            model=model,
+            rotate_size=rotate_size,
+            rotate_age=rotate_age,
+            rotate_at=rotate_at,
+            compress=compress,
+        )
+    if queue_size:
+        sink = QueuedOutputSink(sink, queue_size=queue_size, overflow=overflow)
+    readings = _filter(readings, format, aggregate, slide, deadband, heartbeat)
+    with sink, acquisition, _exit_on_sigterm():
+        for reading in readings:
+            sink.write(reading)
+
+
+@dmm.command("record")
+@click.option("-m", "--model", help="DMM model; overrides env-variable and config.", required=False, default="Default")
+@click.option("-c", "--connect", help="DMM connection; overrides env-variable and config.", required=False)
+@click.option("-C", "--config", help="Override config file; default=~/.digital-multimeter", required=False)
+@click.option("-n", "--count", type=int, help="Record <count> frames; use 0 for non-stop.", required=False, default=0)
+@click.option("-o", "--output", help="Capture file to append raw frames to", required=True)
+def record(model, connect, config, count, output):
+    """
+    Record raw digital multimeter frames to a capture file
+    """
+    model, connect = _resolve_model_connect(model, connect, config)
+    DigitalMultimeter(connect=connect, model=model).record(output, count=count)
+
+
+@dmm.command("replay")
+@click.option("-i", "--input", "capture", help="Capture file recorded with `dmm record`", required=True)
+@click.option("-o", "--output", help="Output target file; default=stdout", default="stdout", required=False)
+@click.option("-f", "--format", help="Output format json/csv/ndjson/msgpack/npy/arrow; default=json", default="json")
+@click.option(
+    "-s", "--since", help="Replay readings captured at or after; ISO-8601 time or epoch seconds", required=False
+)
+@click.option(
+    "-u", "--until", help="Replay readings captured at or before; ISO-8601 time or epoch seconds", required=False
+)
+@click.option(
+    "--aggregate",
+    callback=_duration,
+    help="Output min/max/mean/stddev summaries of <duration> windows, e.g. 1s or 5m; default=disabled",
+    required=False,
+)
+@click.option(
+    "--slide", callback=_duration, help="Slide aggregate windows every <duration>; default=tumbling", required=False
+)
+@click.option(
+    "--deadband",
+    callback=_deadband,
+    help="Output readings only when the value changes by more than <threshold>, e.g. 0.001 or 0.5%; default=disabled",
+    required=False,
+)
+@click.option(
+    "--heartbeat",
+    callback=_duration,
+    help="Output an unchanged reading every <duration> with --deadband; default=disabled",
+    required=False,
+)
+def replay(capture, output, format, since, until, aggregate, slide, deadband, heartbeat):
+    """
+    Decode a capture file and output data in various formats
+    """
+    readings = DigitalMultimeter().replay(capture, since=_parse_time(since), until=_parse_time(until))
+    readings = _filter(readings, format, aggregate, slide, deadband, heartbeat)
+    with OutputSink(output=output, format=format, flush_count=0) as sink:
+        for reading in readings:
+            sink.write(reading)
+
+
+@dmm.command("serve")
+@click.option(
+    "-m",
+    "--model",
+    "models",
+    multiple=True,
+    help="DMM model; overrides env-variable and config.  Repeat for each --connect or give once for all.",
+)
+@click.option(
+    "-c",
+    "--connect",
+    "connects",
+    multiple=True,
+    help="DMM connection; overrides env-variable and config.  Repeat to serve several multimeters.",
+)
+@click.option("-C", "--config", help="Override config file; default=~/.digital-multimeter", required=False)
+@click.option("--host", help="Address to listen on; default=127.0.0.1", default="127.0.0.1")
+@click.option(
+    "-p", "--port", type=int, help="NDJSON over TCP port; default={}".format(DEFAULT_PORT), default=DEFAULT_PORT
+)
+@click.option("--websocket-port", type=int, help="WebSocket port; default=disabled", required=False)
+@click.option(
+    "-i",
+    "--interval",
+    callback=_duration,
+    help="Read each multimeter every <duration>, e.g. 500ms or 1m; default=as fast as the multimeter",
+    required=False,
+)
+@click.option(
+    "--queue-size",
+    type=int,
+    help="Readings queued per client before the oldest are dropped; default={}".format(CLIENT_QUEUE_SIZE),
+    default=CLIENT_QUEUE_SIZE,
+)
+def serve(models, connects, config, host, port, websocket_port, interval, queue_size):
+    """
+    Serve digital multimeter readings to any number of clients over TCP and WebSocket
+
+    Readings are broadcast as NDJSON, one reading per line over TCP and one per WebSocket message, tagged
+    with their device.  Read a server like a multimeter with --connect tcp://host:port.
+    """
+    devices = _resolve_devices(models, connects, config)
+    server = ReadingServer(
+        devices, host=host, port=port, websocket_port=websocket_port, queue_size=queue_size, interval=interval
+    )
+    with _exit_on_sigterm():
+        server.serve_forever()
+
+
+@dmm.command("exporter")
+@click.option(
+    "-m",
+    "--model",
+    "models",
+    multiple=True,
+    help="DMM model; overrides env-variable and config.  Repeat for each --connect or give once for all.",
+)
+@click.option(
+    "-c",
+    "--connect",
+    "connects",
+    multiple=True,
+    help="DMM connection; overrides env-variable and config.  Repeat to export several multimeters.",
+)
+@click.option("-C", "--config", help="Override config file; default=~/.digital-multimeter", required=False)
+@click.option("--host", help="Address to listen on; default=127.0.0.1", default="127.0.0.1")
+@click.option("-p", "--port", type=int, help="HTTP port; default={}".format(EXPORTER_PORT), default=EXPORTER_PORT)
+def exporter(models, connects, config, host, port):
+    """
+    Serve digital multimeter readings and health as Prometheus metrics on /metrics
+
+    Scrapes are answered from the latest readings held in memory, never by reading the multimeters.
+    """
+    devices = _resolve_devices(models, connects, config)
+    with _exit_on_sigterm():
+        MetricsExporter(devices, host=host, port=port).serve_forever()
+
+
+@dmm.command("models")
+@click.option("-o", "--output", help="Output target file; default=stdout", default="stdout", required=False)
+@click.option("-f", "--format", help="Output format json/csv/ndjson; default=json", default="json", required=False)
+def get_models_supported(output, format):
+    """
+    Provides a list of the supported digital multimeter models
+    """
+    cli_output(DigitalMultimeter().get_models_supported(), format=format, output=output)
+
+
+def _resolve_devices(models, connects, config):
+    if len(models) > 1 and len(models) != len(connects):
+        raise click.UsageError("Give one --model for all --connect options or one --model for each")
+    if len(connects) > 1:
+        models = models * len(connects) if len(models) == 1 else models or ("Default",) * len(connects)
+        return [{"model": model, "connect": connect} for model, connect in zip(models, connects)]
+    if not connects:
+        devices = Config(session_config_file=config).get_devices()
+        if devices:
+            return [dict(device, model=device["model"] or (models[0] if models else "Default")) for device in devices]
+    model, connect = _resolve_model_connect(
+        models[0] if models else "Default", connects[0] if connects else None, config
+    )
+    return [{"model": model, "connect": connect}]
+
+
+def _resolve_model_connect(model, connect, config):
     configuration = Config(session_config_file=config)
 
     if configuration.model and (not model or model == "Default"):
@@ -62,7 +430,6 @@ def get_reading(model, connect, config, count, output, format):
     if configuration.connect and not connect:
         connect = configuration.connect
 
-    logger = logging.getLogger(__name__)
     logger.debug("model={}".format(model))
     logger.debug("connect={}".format(connect))
 
@@ -72,21 +439,53 @@ def get_reading(model, connect, config, count, output, format):
             "alternatively set this using the {} environment variable or using a configuration "
             "file.".format(ENV_CONNECT)
         )
+    return model, connect
 
-    api = DigitalMultimeter(connect=connect, model=model)
 
-    counted = 0
-    while counted < count or count == 0:
-        cli_output(api.get_reading(), format=format, output=output, count=counted)
-        counted += 1
-        logger.debug("Readings cycle count: {}".format(counted))
+def _parse_time(value):
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise click.BadParameter("Unable to parse time value: {}".format(value))
 
 
-@dmm.command("models")
-@click.option("-o", "--output", help="Output target file; default=stdout", default="stdout", required=False)
-@click.option("-f", "--format", help="Output format json/csv; default=json", default="json", required=False)
-def get_models_supported(output, format):
-    """
-    Provides a list of the supported digital multimeter models
-    """
-    cli_output(DigitalMultimeter().get_models_supported(), format=format, output=output)
+def _filter(readings, format, window, step, threshold, heartbeat):
+    if step and not window:
+        raise click.UsageError("--slide requires --aggregate")
+    if heartbeat and not threshold:
+        raise click.UsageError("--heartbeat requires --deadband")
+    if window and threshold:
+        raise click.UsageError("--aggregate and --deadband can not be combined")
+    if threshold:
+        absolute, relative = threshold
+        return deadband(readings, absolute=absolute, relative=relative, heartbeat=heartbeat)
+    if window:
+        if format.lower() in AGGREGATE_UNSUPPORTED_FORMATS:
+            raise click.UsageError("--aggregate summaries can not be output as {}".format(format))
+        return aggregate(readings, window, step=step)
+    return readings
+
+
+@contextlib.contextmanager
+def _exit_on_sigterm():
+    # raise SystemExit on SIGTERM so that context managers, for example an OutputSink, flush and close
+    def terminate(signum, frame):
+        logger.debug("Received signal {}, exiting".format(signum))
+        sys.exit(128 + signum)
+
+    try:
+        previous = signal.signal(signal.SIGTERM, terminate)
+    except ValueError:
+        # not the main thread; signal handlers can not be installed
+        yield
+        return
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGTERM, previous)
@@ -46,19 +46,39 @@ class Config:
         # Configuration file based config setting
         return self.__get_config_from_file(item)
 
+    @functools.lru_cache()
+    def get_devices(self):
+        """
+        Returns the multimeter devices of the configuration file, one per `[digital-multimeter:<device>]`
+        section, as a list of dicts with the `device` id, `model` and `connect`.
+        """
+        config_file = self.__find_config_file()
+        if not config_file:
+            return []
+        cp = self.__parse_config_file(config_file)
+        devices = []
+        for section in cp.sections():
+            if not section.startswith(CONFIG_SECTION_NAME + ":"):
+                continue
+            device = section[len(CONFIG_SECTION_NAME) + 1 :]
+            if not cp.has_option(section, "connect"):
+                raise ConfigException('Unable to find "connect" setting for device "{}".'.format(device), config_file)
+            devices.append(
+                {
+                    "device": device,
+                    "model": cp.get(section, "model", fallback=None),
+                    "connect": cp.get(section, "connect"),
+                }
+            )
+        return devices
+
     @functools.lru_cache()
     def __get_config_from_file(self, item):
         config = None
 
-        if self.session_config_file and not os.path.isfile(os.path.expanduser(self.session_config_file)):
-            raise ConfigException("Unable to find the configuration filename supplied.", self.session_config_file)
-
-        config_files = [self.session_config_file, CONFIG_FILE_USER, CONFIG_FILE_SYSTEM]
-
-        for config_file in config_files:
-            if config_file and os.path.isfile(os.path.expanduser(config_file)):
-                config = self.__load_config_file(config_file)
-                break
+        config_file = self.__find_config_file()
+        if config_file:
+            config = self.__load_config_file(config_file)
 
         if type(config) is not dict:
             logger.debug('"{}" unset because no configuration file found.'.format(item))
@@ -72,16 +92,29 @@ class Config:
         logger.debug('"{}" returned from the configuration file.'.format(item))
         return config[_item]
 
+    def __find_config_file(self):
+        if self.session_config_file and not os.path.isfile(os.path.expanduser(self.session_config_file)):
+            raise ConfigException("Unable to find the configuration filename supplied.", self.session_config_file)
+
+        for config_file in [self.session_config_file, CONFIG_FILE_USER, CONFIG_FILE_SYSTEM]:
+            if config_file and os.path.isfile(os.path.expanduser(config_file)):
+                return config_file
+        return None
+
+    @staticmethod
+    def __parse_config_file(filename):
+        cp = configparser.ConfigParser()
+        try:
+            cp.read(os.path.expanduser(filename))
+        except Exception as e:
+            raise ConfigException("Unable to correctly parse the configuration file provided.", e)
+        return cp
+
     @functools.lru_cache()
     def __load_config_file(self, filename, section=CONFIG_SECTION_NAME):
         filename = os.path.expanduser(filename)
         if os.path.isfile(filename):
-            cp = configparser.ConfigParser()
-
-            try:
-                cp.read(filename)
-            except Exception as e:
-                raise ConfigException("Unable to correctly parse the configuration file provided.", e)
+            cp = self.__parse_config_file(filename)
 
             if section not in cp.sections():
                 raise ConfigException(
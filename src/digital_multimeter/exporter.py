@@ -0,0 +1,371 @@
+import collections
+import logging
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from digital_multimeter.exceptions import MultimeterException
+from digital_multimeter.main import DigitalMultimeter
+from digital_multimeter.utils.binary_output import (
+    FLAG_HOLD,
+    FLAG_LOW_BATTERY,
+    FLAG_OVERFLOW,
+    FLAG_RELATIVE,
+    reading_columns,
+)
+
+logger = logging.getLogger(__name__)
+
+#
+# Prometheus metrics exporter
+#
+# Metrics are served in the Prometheus text exposition format (version 0.0.4), which OpenMetrics scrapers
+# also accept, from values cached as the multimeters are read; a scrape never waits on a multimeter.
+#
+
+DEFAULT_PORT = 9417
+RECONNECT_DELAY = 5
+PARSE_ERROR_LIMIT = 3
+RATE_WINDOW = 10
+INTERVAL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+FLAG_NAMES = (
+    ("hold", FLAG_HOLD),
+    ("relative", FLAG_RELATIVE),
+    ("low_battery", FLAG_LOW_BATTERY),
+    ("overflow", FLAG_OVERFLOW),
+)
+
+# multimeter `get_stats()` counters exported as totals
+STATS_COUNTERS = (
+    ("resyncs", "dmm_resyncs_total", "Frame re-synchronisations of the multimeter byte stream."),
+    ("bytes_discarded", "dmm_bytes_discarded_total", "Bytes discarded while re-synchronising frames."),
+)
+
+
+class MetricsExporterException(MultimeterException):
+    pass
+
+
+class MetricsExporter:
+    """
+    Reads digital multimeters and serves their latest readings and acquisition health as Prometheus metrics
+    on an HTTP `/metrics` endpoint.
+
+    Each device is read by its own acquisition thread, which updates an in-memory cache of metrics as each
+    reading arrives; scrapes are rendered from that cache and never touch the multimeter.  Errors raised by
+    a multimeter implementation, such as a `MultimeterFortuneFS9721Exception` for a frame that can not be
+    decoded, are counted as parse errors by exception name and reading carries on.  Any other error, or
+    `PARSE_ERROR_LIMIT` parse errors in a row, counts as a connection error and the multimeter is reconnected
+    after `RECONNECT_DELAY` seconds.
+    """
+
+    devices = None
+    host = None
+    port = None
+
+    metrics = None
+    lock = None
+    stop_event = None
+    httpd = None
+    threads = None
+
+    def __init__(self, devices, host="127.0.0.1", port=DEFAULT_PORT):
+        """
+        :param devices: list [required]
+            the multimeters to read, each a dict with the `connect` and optional `model` and `device` id,
+            see `MultimeterGroup`
+        :param host: str [default 127.0.0.1]
+            the address to listen on
+        :param port: int [default 9417]
+            the HTTP port; 0 for any free port
+        """
+        self.devices = []
+        for device in devices:
+            connect = device["connect"]
+            model = device.get("model") or "Default"
+            self.devices.append((device.get("device") or connect, connect, model))
+        ids = [device_id for device_id, _, _ in self.devices]
+        if len(set(ids)) != len(ids):
+            raise MetricsExporterException("Multimeter device ids must be unique", ids)
+        self.host = host
+        self.port = port
+        self.lock = threading.Lock()
+        self.metrics = {device_id: _DeviceMetrics(model) for device_id, _, model in self.devices}
+        self.threads = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        """
+        Start the HTTP server and start reading the multimeters.
+        """
+        if self.threads:
+            return
+        self.stop_event = threading.Event()
+        try:
+            self.httpd = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+        except OSError as e:
+            raise MetricsExporterException("Unable to listen on {}:{}: {}".format(self.host, self.port, e))
+        self.httpd.daemon_threads = True
+        self.httpd.exporter = self
+        self._thread(self.httpd.serve_forever, name="dmm-exporter-http")
+        logger.info("Serving metrics on http://{}:{}/metrics".format(*self.address))
+        for device_id, connect, model in self.devices:
+            self._thread(self._acquire, device_id, connect, model, name="dmm-exporter-{}".format(device_id))
+
+    def stop(self):
+        """
+        Stop the HTTP server and stop reading the multimeters.
+        """
+        if not self.threads:
+            return
+        self.stop_event.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.threads = []
+
+    def serve_forever(self):
+        """
+        Serve until interrupted.
+        """
+        self.start()
+        try:
+            while not self.stop_event.wait(timeout=1):
+                pass
+        finally:
+            self.stop()
+
+    @property
+    def address(self):
+        """
+        The (host, port) of the HTTP server.
+        """
+        return self.httpd.server_address[:2]
+
+    def render(self):
+        """
+        Returns the metrics in the Prometheus text exposition format.
+        """
+        now = time.monotonic()
+        families = collections.OrderedDict()
+
+        def sample(name, kind, help, labels, value):
+            family = families.setdefault(name, ["# HELP {} {}".format(name, help), "# TYPE {} {}".format(name, kind)])
+            family.append("{}{} {}".format(name, _labels(labels), _value(value)))
+
+        def histogram(name, help, labels, buckets, total, count):
+            families.setdefault(name, ["# HELP {} {}".format(name, help), "# TYPE {} histogram".format(name)])
+            for bound, cumulative in zip(INTERVAL_BUCKETS + (math.inf,), buckets):
+                families[name].append(
+                    "{}_bucket{} {}".format(name, _labels({**labels, "le": _value(bound)}), cumulative)
+                )
+            families[name].append("{}_sum{} {}".format(name, _labels(labels), _value(total)))
+            families[name].append("{}_count{} {}".format(name, _labels(labels), count))
+
+        with self.lock:
+            for device_id, metrics in self.metrics.items():
+                device = {"device": device_id}
+                sample("dmm_up", "gauge", "Whether the multimeter is connected and reading.", device, metrics.up)
+                for unit, (mode, value) in sorted(metrics.values.items()):
+                    sample(
+                        "dmm_reading_value",
+                        "gauge",
+                        "Latest reading value, scaled to the base unit, per device and unit.",
+                        {**device, "unit": unit, "mode": mode, "model": metrics.model},
+                        value,
+                    )
+                if metrics.timestamp is not None:
+                    sample(
+                        "dmm_reading_timestamp_seconds",
+                        "gauge",
+                        "Time of the latest reading, epoch seconds.",
+                        device,
+                        metrics.timestamp,
+                    )
+                for name, bit in FLAG_NAMES:
+                    sample(
+                        "dmm_flag",
+                        "gauge",
+                        "Display flags of the latest reading; hold, relative, low_battery, overflow.",
+                        {**device, "flag": name},
+                        int(bool(metrics.flags & bit)),
+                    )
+                sample("dmm_readings_total", "counter", "Readings taken.", device, metrics.readings)
+                metrics.expire_read_times(now)
+                sample(
+                    "dmm_read_rate_hertz",
+                    "gauge",
+                    "Readings per second over the last {} seconds.".format(RATE_WINDOW),
+                    device,
+                    len(metrics.read_times) / RATE_WINDOW,
+                )
+                for error, count in sorted(metrics.parse_errors.items()):
+                    sample(
+                        "dmm_parse_errors_total",
+                        "counter",
+                        "Frames the multimeter implementation could not decode, by exception.",
+                        {**device, "error": error},
+                        count,
+                    )
+                sample(
+                    "dmm_connection_errors_total",
+                    "counter",
+                    "Multimeter connection failures, each followed by a reconnect.",
+                    device,
+                    metrics.connection_errors,
+                )
+                for key, name, help in STATS_COUNTERS:
+                    if key in metrics.stats:
+                        sample(name, "counter", help, device, metrics.stats[key])
+                histogram(
+                    "dmm_frame_interval_seconds",
+                    "Time between consecutive readings, from the reading time.interval.",
+                    device,
+                    metrics.interval_buckets,
+                    metrics.interval_sum,
+                    metrics.interval_count,
+                )
+        return "\n".join(line for family in families.values() for line in family) + "\n"
+
+    def _thread(self, target, *args, name=None):
+        thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def _acquire(self, device_id, connect, model):
+        metrics = self.metrics[device_id]
+        while not self.stop_event.is_set():
+            api = DigitalMultimeter(connect=connect, model=model)
+            first = True
+            parse_errors = 0
+            try:
+                while not self.stop_event.is_set():
+                    try:
+                        reading = api.get_reading()
+                    except MultimeterException as e:
+                        if type(e) is MultimeterException:
+                            raise
+                        with self.lock:
+                            metrics.parse_error(e, api.get_stats())
+                        parse_errors += 1
+                        if parse_errors >= PARSE_ERROR_LIMIT:
+                            raise
+                        continue
+                    with self.lock:
+                        metrics.update(reading, api.get_stats(), first)
+                    first = False
+                    parse_errors = 0
+            except Exception as e:
+                logger.warning("Multimeter {} failed, reconnecting: {}".format(device_id, e))
+                with self.lock:
+                    metrics.connection_error(api.get_stats())
+                self.stop_event.wait(RECONNECT_DELAY)
+
+
+class _DeviceMetrics:
+    """
+    The cached metrics of one device; updated by its acquisition thread and rendered by scrapes, both under
+    the exporter lock.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.up = 0
+        self.values = {}
+        self.timestamp = None
+        self.flags = 0
+        self.readings = 0
+        self.read_times = collections.deque()
+        self.parse_errors = collections.Counter()
+        self.connection_errors = 0
+        self.stats = {}
+        self.stats_base = {}
+        self.interval_buckets = [0] * (len(INTERVAL_BUCKETS) + 1)
+        self.interval_sum = 0.0
+        self.interval_count = 0
+
+    def update(self, reading, stats, first=False):
+        timestamp, _, value, flags, unit, mode = reading_columns(reading)
+        self.up = 1
+        self.values[unit] = (mode, value)
+        self.timestamp = timestamp
+        self.flags = flags
+        self.readings += 1
+        now = time.monotonic()
+        self.read_times.append(now)
+        # expired here as well as on scrape, so the read times stay bounded when nobody scrapes
+        self.expire_read_times(now)
+        self._stats(stats)
+        if first:
+            # the first interval after connecting runs from the connection, not a previous reading
+            return
+        interval = reading["time"]["interval"]
+        for index, bound in enumerate(INTERVAL_BUCKETS + (math.inf,)):
+            if interval <= bound:
+                self.interval_buckets[index] += 1
+        self.interval_sum += interval
+        self.interval_count += 1
+
+    def expire_read_times(self, now):
+        while self.read_times and now - self.read_times[0] > RATE_WINDOW:
+            self.read_times.popleft()
+
+    def parse_error(self, error, stats):
+        self.parse_errors[type(error).__name__] += 1
+        self._stats(stats)
+
+    def connection_error(self, stats):
+        self.up = 0
+        self.connection_errors += 1
+        self._stats(stats)
+        # counters of the next connection carry on from these
+        self.stats_base = dict(self.stats)
+
+    def _stats(self, stats):
+        for key, _, _ in STATS_COUNTERS:
+            if key in stats:
+                self.stats[key] = self.stats_base.get(key, 0) + stats[key]
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.exporter.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("{} {}".format(self.address_string(), format % args))
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{{{}}}".format(",".join('{}="{}"'.format(name, _escape(value)) for name, value in labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _value(value):
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
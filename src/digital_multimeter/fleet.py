@@ -0,0 +1,286 @@
+import logging
+import math
+import multiprocessing
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+
+from digital_multimeter.exceptions import MultimeterException
+from digital_multimeter.main import DigitalMultimeter
+from digital_multimeter.utils.binary_output import reading_columns
+
+logger = logging.getLogger(__name__)
+
+#
+# Fleet ring buffers
+#
+# One shared memory ring per worker process, written by the worker and read by the parent.  The ring header
+# holds the record write and read counters, the records dropped because the ring was full and the worker
+# heartbeat; the time its least recently read multimeter was last read (epoch seconds).  It is followed by
+# RING_SIZE slots of one reading record each; the timestamp, value and scaled_value (NaN where the display
+# shows no number), device index, READING_FLAGS and the unit and mode labels as UTF-8, NUL padded.
+#
+
+RING_SIZE = 4096
+RING_HEADER_STRUCT = struct.Struct("<QQQd")
+RECORD_STRUCT = struct.Struct("<dddHB16s16s5x")
+
+POLL_INTERVAL = 0.01
+HEARTBEAT_TIMEOUT = 30
+RESTART_DELAY = 1
+
+
+class FleetException(MultimeterException):
+    pass
+
+
+class FleetCollector:
+    """
+    Reads a fleet of digital multimeters with a pool of worker processes, so decoding is spread across CPUs
+    rather than limited to one by the GIL.
+
+    Devices are sharded across `workers` processes; each worker reads its devices with the usual multimeter
+    implementations, one thread per device, and publishes fixed-size binary reading records into its own
+    `multiprocessing.shared_memory` ring.  The parent merges the rings into a stream of readings ordered by
+    timestamp within each poll of the rings, tagged by device like `MultimeterGroup` readings.  Each reading
+    holds the `binary_output` reading columns; `reading.value`, `reading.scaled_value` (None where the display
+    shows no number), `reading.flags`, `reading.unit` and `reading.mode`.
+
+    The parent supervises the workers; a worker that exits, for example after a multimeter error, or with a
+    multimeter that has not been read for `heartbeat_timeout` seconds, for example a hung reader, is
+    restarted, at most once every `RESTART_DELAY` seconds.  A worker that finds its ring full drops the new
+    record; drops and restarts are reported by `get_stats()`.
+    """
+
+    devices = None
+    workers = None
+    ring_size = None
+    heartbeat_timeout = None
+
+    context = None
+    shards = None
+    rings = None
+    processes = None
+    started_at = None
+    restarts = None
+
+    def __init__(self, devices, workers=None, ring_size=RING_SIZE, heartbeat_timeout=HEARTBEAT_TIMEOUT):
+        """
+        :param devices: list [required]
+            the multimeters to read, each a dict with the `connect` and optional `model` and `device` id,
+            see `MultimeterGroup`
+        :param workers: int [default cpu count]
+            the number of worker processes; no more than the number of devices
+        :param ring_size: int [default 4096]
+            the number of reading records held by the ring of each worker
+        :param heartbeat_timeout: float [default 30]
+            the seconds after which a worker with a multimeter that has not been read is restarted
+        """
+        self.devices = []
+        for device in devices:
+            self.devices.append(
+                {
+                    "device": device.get("device") or device["connect"],
+                    "model": device.get("model") or "Default",
+                    "connect": device["connect"],
+                }
+            )
+        ids = [device["device"] for device in self.devices]
+        if len(set(ids)) != len(ids):
+            raise FleetException("Multimeter device ids must be unique", ids)
+        self.workers = max(1, min(workers or multiprocessing.cpu_count(), len(self.devices)))
+        self.ring_size = ring_size
+        self.heartbeat_timeout = heartbeat_timeout
+        self.shards = [list(enumerate(self.devices))[index :: self.workers] for index in range(self.workers)]
+        self.context = multiprocessing.get_context("spawn")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        """
+        Create the rings and start the worker processes.
+        """
+        if self.processes:
+            return
+        self.rings = []
+        for _ in self.shards:
+            ring = shared_memory.SharedMemory(
+                create=True, size=RING_HEADER_STRUCT.size + RECORD_STRUCT.size * self.ring_size
+            )
+            RING_HEADER_STRUCT.pack_into(ring.buf, 0, 0, 0, 0, time.time())
+            self.rings.append(ring)
+        self.processes = [None] * len(self.shards)
+        self.started_at = [0] * len(self.shards)
+        self.restarts = [0] * len(self.shards)
+        for index in range(len(self.shards)):
+            self._start_worker(index)
+        logger.debug("Started {} fleet workers for {} multimeters".format(len(self.shards), len(self.devices)))
+
+    def stop(self):
+        """
+        Stop the worker processes and release the rings.
+        """
+        if not self.processes:
+            return
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+        for ring in self.rings:
+            ring.close()
+            ring.unlink()
+        self.processes = None
+        self.rings = None
+
+    def get_readings(self, count=0):
+        """
+        Returns a generator of the merged readings of all devices.
+
+        :param count: int [default 0]
+            the number of readings to return; use 0 for non-stop
+        """
+        self.start()
+        counted = 0
+        while counted < count or count == 0:
+            records = []
+            for index, ring in enumerate(self.rings):
+                records.extend(_ring_read(ring, self.ring_size))
+                self._supervise(index)
+            if not records:
+                time.sleep(POLL_INTERVAL)
+                continue
+            records.sort(key=lambda record: record[0])
+            for record in records:
+                yield self._reading(record)
+                counted += 1
+                if counted == count:
+                    return
+
+    def get_stats(self):
+        """
+        Returns the counters of each worker; the records written to and dropped by its ring, records waiting
+        in its ring and the times it has been restarted.
+        """
+        stats = []
+        for index, ring in enumerate(self.rings or []):
+            written, read, dropped, heartbeat = RING_HEADER_STRUCT.unpack_from(ring.buf, 0)
+            stats.append(
+                {
+                    "devices": [device["device"] for _, device in self.shards[index]],
+                    "records_written": written,
+                    "records_queued": written - read,
+                    "records_dropped": dropped,
+                    "restarts": self.restarts[index],
+                }
+            )
+        return stats
+
+    def _start_worker(self, index):
+        process = self.context.Process(
+            target=_fleet_worker,
+            args=(self.rings[index].name, self.ring_size, self.shards[index]),
+            name="dmm-fleet-worker-{}".format(index),
+            daemon=True,
+        )
+        # a fresh heartbeat for the new worker to start within
+        header = RING_HEADER_STRUCT.unpack_from(self.rings[index].buf, 0)
+        RING_HEADER_STRUCT.pack_into(self.rings[index].buf, 0, *header[:3], time.time())
+        process.start()
+        self.processes[index] = process
+        self.started_at[index] = time.monotonic()
+
+    def _supervise(self, index):
+        process = self.processes[index]
+        heartbeat = RING_HEADER_STRUCT.unpack_from(self.rings[index].buf, 0)[3]
+        if process.is_alive() and time.time() - heartbeat < self.heartbeat_timeout:
+            return
+        if time.monotonic() - self.started_at[index] < RESTART_DELAY:
+            return
+        if process.is_alive():
+            logger.warning("Fleet worker {} heartbeat timed out, restarting".format(index))
+            process.terminate()
+        else:
+            logger.warning("Fleet worker {} exited with code {}, restarting".format(index, process.exitcode))
+        process.join()
+        self.restarts[index] += 1
+        self._start_worker(index)
+
+    def _reading(self, record):
+        timestamp, value, scaled_value, device, flags, unit, mode = record
+        return {
+            "reading": {
+                "value": None if math.isnan(value) else value,
+                "scaled_value": None if math.isnan(scaled_value) else scaled_value,
+                "flags": flags,
+                "unit": unit.rstrip(b"\0").decode("utf-8"),
+                "mode": mode.rstrip(b"\0").decode("utf-8"),
+            },
+            "time": {"timestamp": timestamp, "unit_name": "second", "unit_symbol": "s"},
+            "device": self.devices[device]["device"],
+        }
+
+
+def _ring_read(ring, ring_size):
+    written, read, dropped, heartbeat = RING_HEADER_STRUCT.unpack_from(ring.buf, 0)
+    records = [
+        RECORD_STRUCT.unpack_from(ring.buf, RING_HEADER_STRUCT.size + (position % ring_size) * RECORD_STRUCT.size)
+        for position in range(read, written)
+    ]
+    # only the read counter is written by the parent
+    struct.pack_into("<Q", ring.buf, 8, written)
+    return records
+
+
+def _fleet_worker(ring_name, ring_size, shard):
+    # spawned workers share the resource tracker of the parent, which unlinks the ring
+    ring = shared_memory.SharedMemory(name=ring_name)
+    lock = threading.Lock()
+    stop_event = threading.Event()
+    # the time each multimeter was last read; the heartbeat is the oldest, so one hung reader stalls it
+    progress = {index: time.time() for index, _ in shard}
+
+    def publish(index, data):
+        timestamp, value, scaled_value, flags, unit, mode = reading_columns(data)
+        with lock:
+            progress[index] = time.time()
+            written, read, dropped, _ = RING_HEADER_STRUCT.unpack_from(ring.buf, 0)
+            if written - read >= ring_size:
+                struct.pack_into("<Qd", ring.buf, 16, dropped + 1, min(progress.values()))
+                return
+            RECORD_STRUCT.pack_into(
+                ring.buf,
+                RING_HEADER_STRUCT.size + (written % ring_size) * RECORD_STRUCT.size,
+                timestamp,
+                value,
+                scaled_value,
+                index,
+                flags,
+                unit.encode("utf-8"),
+                mode.encode("utf-8"),
+            )
+            # the record is in place before the write counter makes it visible to the parent
+            struct.pack_into("<Q", ring.buf, 0, written + 1)
+            struct.pack_into("<d", ring.buf, 24, min(progress.values()))
+
+    def reader(index, device):
+        try:
+            api = DigitalMultimeter(connect=device["connect"], model=device["model"])
+            while not stop_event.is_set():
+                publish(index, api.get_reading())
+        except Exception as e:
+            logging.getLogger(__name__).error("Multimeter {} failed: {}".format(device["device"], e))
+        stop_event.set()
+
+    threads = [threading.Thread(target=reader, args=(index, device), daemon=True) for index, device in shard]
+    for thread in threads:
+        thread.start()
+    # any multimeter failing stops the worker, for the parent to restart it
+    stop_event.wait()
+    ring.close()
+    raise SystemExit(1)
@@ -0,0 +1,145 @@
+import heapq
+import logging
+import queue
+import threading
+import time
+
+from digital_multimeter.exceptions import MultimeterException
+from digital_multimeter.main import DigitalMultimeter
+
+logger = logging.getLogger(__name__)
+
+MERGE_DELAY = 1.0
+READINGS_QUEUE_SIZE = 1024
+
+
+class MultimeterGroup:
+    """
+    Reads several digital multimeters concurrently, one thread per multimeter, and merges their readings into a
+    single stream ordered by reading timestamp.  Each reading is tagged with the id of its device under the
+    "device" key.
+
+    A reading is emitted once every device has a later reading waiting, so the stream is in timestamp order
+    across devices; a device that has not delivered for `merge_delay` seconds, for example one that has stopped
+    responding, is not waited on any longer than that and may then deliver late, out of order, readings.
+    """
+
+    devices = None
+    merge_delay = None
+
+    readings = None
+    threads = None
+    stop_event = None
+
+    def __init__(self, devices, merge_delay=MERGE_DELAY):
+        """
+        :param devices: list [required]
+            the multimeters to read, each a dict with the `connect` and optional `model` and `device` id;
+            the device id defaults to the connect value
+        :param merge_delay: float [default 1.0]
+            the longest time in seconds to hold a reading back while waiting for the other devices
+        """
+        self.devices = []
+        for device in devices:
+            connect = device["connect"]
+            model = device.get("model") or "Default"
+            self.devices.append((device.get("device") or connect, DigitalMultimeter(connect=connect, model=model)))
+        ids = [device_id for device_id, _ in self.devices]
+        if len(set(ids)) != len(ids):
+            raise MultimeterException("Multimeter device ids must be unique", ids)
+        self.merge_delay = merge_delay
+        self.threads = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        """
+        Start a reader thread for each device.
+        """
+        if self.threads:
+            return
+        self.readings = queue.Queue(maxsize=READINGS_QUEUE_SIZE)
+        self.stop_event = threading.Event()
+        for index, (device_id, api) in enumerate(self.devices):
+            thread = threading.Thread(
+                target=self._reader, args=(index, api), name="dmm-reader-{}".format(device_id), daemon=True
+            )
+            thread.start()
+            self.threads.append(thread)
+        logger.debug("Started {} multimeter reader threads".format(len(self.threads)))
+
+    def stop(self):
+        """
+        Stop the reader threads; each stops after its current reading.
+        """
+        if not self.threads:
+            return
+        self.stop_event.set()
+        # unblock readers waiting on a full queue
+        while True:
+            try:
+                self.readings.get_nowait()
+            except queue.Empty:
+                break
+        self.threads = []
+
+    def get_readings(self, count=0):
+        """
+        Returns a generator of the merged, timestamp ordered readings of all devices.
+
+        :param count: int [default 0]
+            the number of readings to return; use 0 for non-stop
+        """
+        self.start()
+        pending = []
+        waiting = [0] * len(self.devices)
+        sequence = 0
+        counted = 0
+        while counted < count or count == 0:
+            if pending and (all(waiting) or time.monotonic() - pending[0][2] >= self.merge_delay):
+                _, _, _, index, reading = heapq.heappop(pending)
+                waiting[index] -= 1
+                counted += 1
+                yield reading
+                continue
+            timeout = None
+            if pending:
+                timeout = max(self.merge_delay - (time.monotonic() - pending[0][2]), 0)
+            try:
+                index, reading = self.readings.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            if isinstance(reading, Exception):
+                self.stop()
+                raise MultimeterException("Multimeter {} failed: {}".format(self.devices[index][0], reading))
+            reading["device"] = self.devices[index][0]
+            heapq.heappush(pending, (reading["time"]["timestamp"], sequence, time.monotonic(), index, reading))
+            waiting[index] += 1
+            sequence += 1
+
+    def get_stats(self):
+        """
+        Returns the acquisition counters of each device by device id.
+        """
+        return {device_id: api.get_stats() for device_id, api in self.devices}
+
+    def _reader(self, index, api):
+        stop_event, readings = self.stop_event, self.readings
+        while not stop_event.is_set():
+            try:
+                reading = api.get_reading()
+            except Exception as e:
+                logger.debug("Multimeter reader thread failed: {}".format(e))
+                readings.put((index, e))
+                return
+            while not stop_event.is_set():
+                try:
+                    readings.put((index, reading), timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
@@ -1,10 +1,16 @@
+import datetime
 import logging
+import time
 
+from digital_multimeter.capture import CaptureReader, CaptureWriter
 from digital_multimeter.exceptions import MultimeterException
 from digital_multimeter.multimeters import __multimeter_models__
 
 logger = logging.getLogger(__name__)
 
+# float epoch seconds only resolve to a fraction of a microsecond, replay time ranges are widened to match
+TIMESTAMP_TOLERANCE_NS = 1000
+
 
 class DigitalMultimeter:
     """
@@ -14,14 +20,20 @@ class DigitalMultimeter:
     connect = None
     model = None
     multimeter = None
+    multimeter_options = None
 
-    def __init__(self, connect=None, model="Default"):
+    def __init__(self, connect=None, model="Default", **multimeter_options):
         """
         :param connect: str [required]
-            the connection to the digital multimeter, for example `/dev/ttyUSB0`
+            the connection to the digital multimeter, for example `/dev/ttyUSB0`, or a `tcp://host:port`
+            `dmm serve` reading server to read the multimeters it serves, optionally only the readings of
+            one device with `tcp://host:port?device=<id>`
         :param model: str [default `Default`]
             the digital multimeter model to use for this connection; check models supported for a list
-            of supported.  Model names are case-sensitive.
+            of supported.  Model names are case-sensitive.  Not used for a reading server connection.
+        :param multimeter_options: [optional]
+            model specific options passed through to the multimeter implementation, for example
+            `streaming=True` for the `Voltcraft_VC870` continuous streaming reader
 
         NB: The serial/usb connection to the digital multimeter does not occur until it is first required
         in a call to `get_reading()`
@@ -30,24 +42,144 @@ class DigitalMultimeter:
         if model not in __multimeter_models__.keys():
             raise MultimeterException("Multimeter model not supported", model)
         self.model = model
+        self.multimeter_options = multimeter_options
 
-    def get_reading(self):
+    def get_reading(self, compact=False, freshest=False):
         """
         Load the digital multimeter and establish a connection if required, then get a reading of the instrument
         and return.
+
+        :param compact: bool [default False]
+            return a compact `Reading` object instead of a dict, intended for holding large numbers of
+            readings in memory; call its `to_dict()` method for the usual dict
+        :param freshest: bool [default False]
+            skip frames already buffered by the connection for the newest, see `stream()`
+        """
+        if not self.multimeter:
+            self.__load_multimeter()
+        return getattr(self.multimeter, "get_reading")(compact=compact, freshest=freshest)
+
+    def stream(self, count=None, interval=None, freshest=True, compact=False):
+        """
+        Returns a generator of readings from the digital multimeter, read as the generator is iterated.
+
+        :param count: int [optional]
+            the number of readings to yield; None or 0 for non-stop
+        :param interval: float [optional]
+            take a reading every `interval` seconds, on a schedule that does not drift with the time taken by
+            each reading; scheduled times that are missed entirely, because a reading or the consumer took
+            longer than the interval, are skipped; a reading that is late by less than the interval is taken
+            straight away.  Without an interval readings are taken back to back.
+        :param freshest: bool [default True]
+            skip frames already buffered by the connection for the newest, so that a reading reflects the
+            display when it is taken rather than a frame queued earlier, for example while the consumer was
+            busy or the scheduled interval elapsed
+        :param compact: bool [default False]
+            yield compact `Reading` objects instead of dicts, see `get_reading()`
+        """
+        scheduled = time.monotonic()
+        counted = 0
+        while not count or counted < count:
+            if interval:
+                delay = scheduled - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            yield self.get_reading(compact=compact, freshest=freshest)
+            counted += 1
+            if interval:
+                scheduled += interval
+                behind = time.monotonic() - scheduled
+                if behind >= interval:
+                    # resume at the next scheduled time still ahead
+                    missed = int(behind // interval) + 1
+                    scheduled += missed * interval
+                    logger.debug("Stream fell behind its schedule, skipped {} readings".format(missed))
+
+    def get_multimeter(self):
+        """
+        Returns the multimeter implementation for the model, establishing the connection if required.
+        """
+        if not self.multimeter:
+            self.__load_multimeter()
+        return self.multimeter
+
+    def get_stats(self):
+        """
+        Returns the acquisition counters of the connected multimeter, for example frames decoded, bytes
+        discarded and frame re-synchronisations; an empty dict if the multimeter is not yet connected.
+        """
+        if not self.multimeter or not hasattr(self.multimeter, "get_stats"):
+            return {}
+        return getattr(self.multimeter, "get_stats")()
+
+    def record(self, filename, count=1):
+        """
+        Record raw frames from the digital multimeter into a capture file without decoding them; use `replay()`
+        to decode the capture later.
+
+        :param filename: str [required]
+            the capture file to append to, created if it does not exist
+        :param count: int [default 1]
+            the number of frames to record; use 0 for non-stop
         """
         if not self.multimeter:
             self.__load_multimeter()
-        return getattr(self.multimeter, "get_reading")()
+        if not hasattr(self.multimeter, "receive_packet"):
+            raise MultimeterException("Raw frames can not be recorded from a reading server", self.connect)
+        with CaptureWriter(filename, model=self.model) as capture:
+            counted = 0
+            while counted < count or count == 0:
+                capture.write(getattr(self.multimeter, "receive_packet")())
+                counted += 1
+
+    def replay(self, filename, since=None, until=None, compact=False):
+        """
+        Returns a generator of readings decoded offline from a capture file written by `record()`, using the
+        digital multimeter model recorded in the capture file.  Reading timestamps are the capture times.
+
+        :param filename: str [required]
+            the capture file to replay
+        :param since: float|datetime [optional]
+            replay only frames captured at or after this time; epoch seconds or a datetime
+        :param until: float|datetime [optional]
+            replay only frames captured at or before this time; epoch seconds or a datetime
+        :param compact: bool [default False]
+            yield compact `Reading` objects instead of dicts, see `get_reading()`
+        """
+        multimeters = {}
+        since = None if since is None else self.__timestamp_ns(since) - TIMESTAMP_TOLERANCE_NS
+        until = None if until is None else self.__timestamp_ns(until) + TIMESTAMP_TOLERANCE_NS
+        frames = CaptureReader(filename).frames(since=since, until=until)
+        for model, timestamp, frame in frames:
+            if model not in multimeters:
+                multimeters[model] = self.__multimeter_class(model)(connect=None)
+                multimeters[model].timestamp_start = multimeters[model].timestamp_previous = timestamp
+            yield multimeters[model].parse_packet(frame, timestamp=timestamp, compact=compact)
+
+    @staticmethod
+    def __timestamp_ns(value):
+        if isinstance(value, datetime.datetime):
+            value = value.timestamp()
+        return int(value * 1e9)
 
     def __load_multimeter(self):
         if self.multimeter:
             return
-        class_name = __multimeter_models__[self.model]
-        logger.debug("Digital multimeter model: {}".format(self.model))
+        if str(self.connect).startswith("tcp://"):
+            from digital_multimeter.multimeters.MultimeterTCPClient import MultimeterTCPClient
+
+            self.multimeter = MultimeterTCPClient(connect=self.connect)
+            return
+        self.multimeter = self.__multimeter_class(self.model)(connect=self.connect, **self.multimeter_options)
+
+    def __multimeter_class(self, model):
+        if model not in __multimeter_models__.keys():
+            raise MultimeterException("Multimeter model not supported", model)
+        class_name = __multimeter_models__[model]
+        logger.debug("Digital multimeter model: {}".format(model))
         logger.debug("Loading digital multimeter class: {}".format(class_name))
         module = __import__("digital_multimeter.multimeters.{}".format(class_name), fromlist=["digital_multimeter"])
-        self.multimeter = getattr(module, class_name)(connect=self.connect)
+        return getattr(module, class_name)
 
     def get_models_supported(self):
         """
@@ -0,0 +1,46 @@
+import collections
+import logging
+
+logger = logging.getLogger(__name__)
+
+DECODE_CACHE_SIZE = 64
+
+
+class DecodeCache:
+    """
+    A bounded least-recently-used cache of decoded frame fields, keyed on the raw frame bytes.
+
+    A steady display repeats byte-identical frames, so a driver decodes each distinct frame once and rebuilds
+    only the timestamp dependent "time" block of repeated readings.  The cached fields must not depend on the
+    time of the reading.  Frames that fail to decode are not cached.
+    """
+
+    size = None
+    entries = None
+    hits = 0
+    misses = 0
+
+    def __init__(self, size=DECODE_CACHE_SIZE):
+        self.size = size
+        self.entries = collections.OrderedDict()
+
+    def get(self, packet, decode):
+        """
+        Returns the cached fields of `packet`, or decodes and caches them with `decode(packet)`.
+        """
+        key = bytes(packet)
+        fields = self.entries.get(key)
+        if fields is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return fields
+        fields = decode(packet)
+        self.misses += 1
+        if self.size:
+            self.entries[key] = fields
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return fields
+
+    def get_stats(self):
+        return {"decode_cache_hits": self.hits, "decode_cache_misses": self.misses}
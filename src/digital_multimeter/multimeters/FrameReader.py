@@ -0,0 +1,117 @@
+import abc
+import logging
+
+from ..exceptions import MultimeterException
+
+logger = logging.getLogger(__name__)
+
+
+class FrameReader(abc.ABC):
+    """
+    Buffers bytes received from a serial interface and splits them into fixed-size frames.
+
+    Bytes are read in bulk (everything the interface reports as waiting) into a reusable buffer; when the
+    buffer does not begin with a valid frame the reader re-synchronises in place by discarding only the
+    bytes ahead of the next possible frame start.  Implementations provide `synchronise()` to locate frames.
+
+    Each re-synchronisation within a single `read()` call counts as a retry; `read()` raises `exception` once
+    more than `retry_limit` retries are needed to obtain one frame.  The `resyncs` counter is a lifetime
+    statistic only and is not used as the retry budget.
+    """
+
+    frame_size = None
+    retry_limit = 3
+    exception = MultimeterException
+
+    buffer = None
+    frames_received = 0
+    bytes_discarded = 0
+    resyncs = 0
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    @abc.abstractmethod
+    def synchronise(self, buffer):
+        """
+        Returns a tuple (offset, complete) where `offset` is the number of leading bytes in `buffer` that
+        can not be part of a frame and `complete` is True when a whole frame begins at `offset`.
+        """
+
+    def feed(self, data):
+        self.buffer += data
+
+    def next_frame(self):
+        """
+        Returns the next complete frame held in the buffer, or None if more bytes are required.
+        """
+        offset, complete = self.synchronise(self.buffer)
+        if offset:
+            self._discard(offset)
+        if not complete:
+            return None
+        return self._pop_frame()
+
+    def read(self, serial, freshest=False):
+        """
+        Returns the next complete frame, reading from `serial` as required.
+
+        With `freshest=True` the bytes already waiting at `serial` are drained first and the newest complete
+        frame among them is returned, discarding older frames; without a complete frame waiting the next frame
+        is read as usual.
+        """
+        if freshest:
+            frame = self._read_freshest(serial)
+            if frame is not None:
+                return frame
+        retries = 0
+        while True:
+            offset, complete = self.synchronise(self.buffer)
+            if offset:
+                if retries >= self.retry_limit:
+                    raise self.exception("Unable to synchronise frames after {} retries".format(self.retry_limit))
+                retries += 1
+                self._discard(offset)
+            if complete:
+                return self._pop_frame()
+            size = max(serial.in_waiting, self.frame_size - len(self.buffer), 1)
+            data = serial.read(size=size)
+            if not data:
+                raise self.exception("No bytes received from the serial interface")
+            self.feed(data)
+
+    def reset(self):
+        self.buffer.clear()
+
+    def _read_freshest(self, serial):
+        waiting = serial.in_waiting
+        if waiting:
+            self.feed(serial.read(size=waiting))
+        frame, stale = None, -1
+        while True:
+            next_frame = self.next_frame()
+            if next_frame is None:
+                break
+            frame, stale = next_frame, stale + 1
+        if stale > 0:
+            logger.debug("Discarded {} stale frames".format(stale))
+        return frame
+
+    def get_stats(self):
+        return {
+            "frames_received": self.frames_received,
+            "bytes_discarded": self.bytes_discarded,
+            "resyncs": self.resyncs,
+        }
+
+    def _discard(self, size):
+        del self.buffer[:size]
+        self.bytes_discarded += size
+        self.resyncs += 1
+        logger.debug("Resynchronised frame alignment, discarded {} bytes".format(size))
+
+    def _pop_frame(self):
+        frame = bytes(self.buffer[: self.frame_size])
+        del self.buffer[: self.frame_size]
+        self.frames_received += 1
+        return frame
@@ -1,5 +1,7 @@
 import time
 
+from ..multimeters.Reading import time_dict
+
 
 class MultimeterBase:
     timestamp_start = None
@@ -8,3 +10,20 @@ class MultimeterBase:
     def __init__(self):
         self.timestamp_start = self.timestamp_previous = time.time_ns()
         self.timestamp_previous = self.timestamp_start
+
+    def parse_time(self, timestamp_this=None):
+        """
+        Returns the "time" block of a reading taken at `timestamp_this` (ns, default now).
+        """
+        return time_dict(*self.next_time(timestamp_this))
+
+    def next_time(self, timestamp_this=None):
+        """
+        Returns (timestamp_this, timestamp_start, timestamp_previous) for a reading taken at `timestamp_this`
+        (ns, default now) and advances the previous reading timestamp.
+        """
+        if timestamp_this is None:
+            timestamp_this = time.time_ns()
+        timestamp_previous = self.timestamp_previous
+        self.timestamp_previous = timestamp_this
+        return timestamp_this, self.timestamp_start, timestamp_previous
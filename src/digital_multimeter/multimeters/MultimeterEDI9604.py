@@ -1,17 +1,23 @@
 import logging
-import time
 
 import serial
 from serial import SerialException
 
 from ..exceptions import MultimeterException
+from ..multimeters.DecodeCache import DecodeCache
+from ..multimeters.FrameReader import FrameReader
 from ..multimeters.MultimeterBase import MultimeterBase
+from ..multimeters.Reading import Reading
 
 SERIAL_BAUD = 2400
 SERIAL_PARITY = "N"
 SERIAL_STOPBITS = 1
+PACKET_SIZE = 14
+PACKET_TERMINATOR = b"\r\n"
 PACKET_RETRY_LIMIT = 3
 
+MODULE_NAME = __name__.split(".")[-1]
+
 logger = logging.getLogger(__name__)
 
 
@@ -21,25 +27,18 @@ class MultimeterEDI9604Exception(MultimeterException):
 
 class MultimeterEDI9604(MultimeterBase):
     serial = None
+    frame_reader = None
+    decode_cache = None
+    frames_decoded = 0
 
     def __init__(self, connect):
         super().__init__()
+        self.frame_reader = MultimeterEDI9604FrameReader()
+        self.decode_cache = DecodeCache()
         try:
             self.serial = serial.Serial(
                 port=connect, baudrate=SERIAL_BAUD, parity=SERIAL_PARITY, stopbits=SERIAL_STOPBITS
             )
-            CRLF = False
-            iter = 0
-            last = None
-            while not CRLF and iter < 14:
-                current = self.serial.read(size=1)
-
-                if last == b"\r" and current == b"\n":
-                    CRLF = True
-
-                last = current
-                iter += 1
-
         except SerialException as e:
             raise MultimeterException(e)
         logger.debug("Serial connection okay: {}".format(connect))
@@ -49,50 +48,40 @@ class MultimeterEDI9604(MultimeterBase):
             logger.debug("Closing serial connection")
             self.serial.close()
 
-    def get_reading(self):
-        return self.parse_packet(self.receive_packet())
+    def get_reading(self, compact=False, freshest=False):
+        return self.parse_packet(self.receive_packet(freshest=freshest), compact=compact)
 
-    def parse_packet(self, packet):
-        value = self._parse_packet_value(packet)
-        scale, scale_name, scale_symbol = self._parse_packet_scale(packet)
-        if value is None or scale is None:
-            scaled_value = None
-        else:
-            scaled_value = value * scale
-        unit_name, unit_symbol = self._parse_packet_units(packet)
-        timestamp_this = time.time_ns()
-        time_interval = int(timestamp_this - self.timestamp_previous)
-        self.timestamp_previous = timestamp_this
+    def get_stats(self):
         return {
-            "reading": {
-                "value": value,
-                "unit_name": unit_name,
-                "unit_symbol": unit_symbol,
-                "scale": scale,
-                "scale_name": scale_name,
-                "scale_symbol": scale_symbol,
-                "scaled_value": scaled_value,
-                "scope": self._parse_packet_scope(packet),
-                "is_relative": self._parse_packet_relative(packet),
-                "is_autorange": self._parse_packet_autorange(packet),
-            },
-            "instrument": {
-                "module": __name__.split(".")[-1],
-                "operation_mode": self._parse_packet_operation_mode(packet),
-                "low_battery": self._parse_packet_low_battery(packet),
-                "is_hold": self._parse_packet_hold(packet),
-            },
-            "time": {
-                "elapsed": (timestamp_this - self.timestamp_start) * 1e-9,
-                "interval": time_interval * 1e-9,
-                "timestamp": timestamp_this * 1e-9,
-                "unit_name": "second",
-                "unit_symbol": "s",
-            },
+            "frames_decoded": self.frames_decoded,
+            **self.decode_cache.get_stats(),
+            **self.frame_reader.get_stats(),
         }
 
-    def receive_packet(self, retries=0):
-        return self.serial.read(size=14)
+    def parse_packet(self, packet, timestamp=None, compact=False):
+        fields = self.decode_cache.get(packet, self._decode_fields)
+        self.frames_decoded += 1
+        if compact:
+            return MultimeterEDI9604Reading(*fields, *self.next_time(timestamp))
+        reading = _reading_dict(*fields)
+        reading["time"] = self.parse_time(timestamp)
+        return reading
+
+    def receive_packet(self, freshest=False):
+        return self.frame_reader.read(self.serial, freshest=freshest)
+
+    def _decode_fields(self, packet):
+        return (
+            self._parse_packet_value(packet),
+            self._parse_packet_scale(packet),
+            self._parse_packet_units(packet),
+            self._parse_packet_operation_mode(packet),
+            self._parse_packet_scope(packet),
+            self._parse_packet_relative(packet),
+            self._parse_packet_autorange(packet),
+            self._parse_packet_low_battery(packet),
+            self._parse_packet_hold(packet),
+        )
 
     def _parse_packet_value(self, packet):
         if packet[0] == 45:
@@ -209,3 +198,107 @@ class MultimeterEDI9604(MultimeterBase):
 
     def _parse_packet_hold(self, packet):
         return False
+
+
+class MultimeterEDI9604Reading(Reading):
+    __slots__ = (
+        "value",
+        "scale",
+        "units",
+        "operation_mode",
+        "scope",
+        "is_relative",
+        "is_autorange",
+        "low_battery",
+        "is_hold",
+    )
+
+    def __init__(
+        self,
+        value,
+        scale,
+        units,
+        operation_mode,
+        scope,
+        is_relative,
+        is_autorange,
+        low_battery,
+        is_hold,
+        timestamp,
+        timestamp_start,
+        timestamp_previous,
+    ):
+        super().__init__(timestamp, timestamp_start, timestamp_previous)
+        self.value = value
+        self.scale = scale
+        self.units = units
+        self.operation_mode = operation_mode
+        self.scope = scope
+        self.is_relative = is_relative
+        self.is_autorange = is_autorange
+        self.low_battery = low_battery
+        self.is_hold = is_hold
+
+    def to_dict(self):
+        reading = _reading_dict(
+            self.value,
+            self.scale,
+            self.units,
+            self.operation_mode,
+            self.scope,
+            self.is_relative,
+            self.is_autorange,
+            self.low_battery,
+            self.is_hold,
+        )
+        reading["time"] = self.time_dict()
+        return reading
+
+
+class MultimeterEDI9604FrameReader(FrameReader):
+    """
+    Frames are 14 bytes terminated by CRLF.
+    """
+
+    frame_size = PACKET_SIZE
+    retry_limit = PACKET_RETRY_LIMIT
+    exception = MultimeterEDI9604Exception
+
+    def synchronise(self, buffer):
+        terminator_offset = PACKET_SIZE - len(PACKET_TERMINATOR)
+        if buffer[terminator_offset:PACKET_SIZE] == PACKET_TERMINATOR:
+            return 0, True
+        position = buffer.find(PACKET_TERMINATOR, terminator_offset)
+        if position >= 0:
+            return position - terminator_offset, True
+        # no complete frame available; retain the trailing bytes that may yet begin one
+        return max(0, len(buffer) - PACKET_SIZE + 1), False
+
+
+def _reading_dict(value, scale, units, operation_mode, scope, is_relative, is_autorange, low_battery, is_hold):
+    scale, scale_name, scale_symbol = scale
+    unit_name, unit_symbol = units
+    if value is None or scale is None:
+        scaled_value = None
+    else:
+        scaled_value = value * scale
+    return {
+        "reading": {
+            "value": value,
+            "unit_name": unit_name,
+            "unit_symbol": unit_symbol,
+            "scale": scale,
+            "scale_name": scale_name,
+            "scale_symbol": scale_symbol,
+            "scaled_value": scaled_value,
+            "scope": scope,
+            "is_relative": is_relative,
+            "is_autorange": is_autorange,
+        },
+        "instrument": {
+            "module": MODULE_NAME,
+            "operation_mode": operation_mode,
+            "low_battery": low_battery,
+            "is_hold": is_hold,
+        },
+    }
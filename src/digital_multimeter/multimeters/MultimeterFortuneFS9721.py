@@ -1,17 +1,50 @@
+import functools
 import logging
-import time
 
 import serial
 from serial import SerialException
 
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
 from ..exceptions import MultimeterException
+from ..multimeters.DecodeCache import DecodeCache
+from ..multimeters.FrameReader import FrameReader
 from ..multimeters.MultimeterBase import MultimeterBase
+from ..multimeters.Reading import Reading
 
 SERIAL_BAUD = 2400
 SERIAL_PARITY = "N"
 SERIAL_STOPBITS = 1
+PACKET_SIZE = 14
 PACKET_RETRY_LIMIT = 3
 
+DIGIT_BLANK = -1
+DIGIT_LOW = -2
+_DIGIT_UNKNOWN = -3
+
+# nibble bits that select the operation-mode and units; packet nibbles 0, 9, 10, 11, 12 and 13
+FUNCTION_MASK = (0b1100 << 20) | (0b0001 << 16) | (0b0101 << 12) | (0b1100 << 8) | (0b1110 << 4) | 0b0001
+
+MODULE_NAME = __name__.split(".")[-1]
+
+# code values used by the `mode` and `unit` columns of decode_array()
+OPERATION_MODES = (
+    "current_ac",
+    "current_dc",
+    "voltage_ac",
+    "voltage_dc",
+    "resistance",
+    "diode",
+    "continuity",
+    "capacitance",
+    "frequency",
+    "temperature",
+)
+UNIT_NAMES = ("amps", "volts", "ohms", "farads", "hertz", "duty-cycle", "celsius")
+
 logger = logging.getLogger(__name__)
 
 
@@ -21,9 +54,14 @@ class MultimeterFortuneFS9721Exception(MultimeterException):
 
 class MultimeterFortuneFS9721(MultimeterBase):
     serial = None
+    frame_reader = None
+    decode_cache = None
+    frames_decoded = 0
 
     def __init__(self, connect):
         super().__init__()
+        self.frame_reader = MultimeterFortuneFS9721FrameReader()
+        self.decode_cache = DecodeCache()
         try:
             self.serial = serial.Serial(
                 port=connect, baudrate=SERIAL_BAUD, parity=SERIAL_PARITY, stopbits=SERIAL_STOPBITS
@@ -37,220 +75,362 @@ class MultimeterFortuneFS9721(MultimeterBase):
             logger.debug("Closing serial connection")
             self.serial.close()
 
-    def get_reading(self):
-        return self.parse_packet(self.receive_packet())
+    def get_reading(self, compact=False, freshest=False):
+        return self.parse_packet(self.receive_packet(freshest=freshest), compact=compact)
 
-    def parse_packet(self, packet):
-        value = self._parse_packet_display_value(packet)
-        scale, scale_name, scale_symbol = self._parse_packet_scale(packet)
-        if value is None or scale is None:
-            scaled_value = None
-        else:
-            scaled_value = value * scale
-        unit_name, unit_symbol = self._parse_packet_units(packet)
-        timestamp_this = time.time_ns()
-        time_interval = int(timestamp_this - self.timestamp_previous)
-        self.timestamp_previous = timestamp_this
-        return {
-            "reading": {
-                "value": value,
-                "unit_name": unit_name,
-                "unit_symbol": unit_symbol,
-                "scale": scale,
-                "scale_name": scale_name,
-                "scale_symbol": scale_symbol,
-                "scaled_value": scaled_value,
-                "is_relative": self._parse_packet_relative(packet),
-            },
-            "instrument": {
-                "module": __name__.split(".")[-1],
-                "operation_mode": self._parse_packet_operation_mode(packet),
-                "low_battery": self._parse_packet_low_battery(packet),
-                "is_hold": self._parse_packet_hold(packet),
-            },
-            "time": {
-                "elapsed": (timestamp_this - self.timestamp_start) * 1e-9,
-                "interval": time_interval * 1e-9,
-                "timestamp": timestamp_this * 1e-9,
-                "unit_name": "second",
-                "unit_symbol": "s",
-            },
-        }
+    def parse_packet(self, packet, timestamp=None, compact=False):
+        if not isinstance(packet, (bytes, bytearray)):
+            # legacy packet format; a list of 14x nibble bit-strings
+            packet = bytes(int(nibble, 2) for nibble in packet)
+        fields = self.decode_cache.get(packet, _decode_fields)
+        self.frames_decoded += 1
+        if compact:
+            return MultimeterFortuneFS9721Reading(*fields, *self.next_time(timestamp))
+        reading = _reading_dict(*fields)
+        reading["time"] = self.parse_time(timestamp)
+        return reading
 
-    def receive_packet(self, retries=0):
-        packet = []
-        byte = None
-        byte_index = 0
-        while byte_index != 1:
-            byte = self.serial.read(size=1)
-            byte_index = self._byte_index(byte)
-        packet.append(self._byte_nibble(byte))
-
-        byte_index_expect = 2
-        while len(packet) < 14:
-            byte = self.serial.read(size=1)
-            if self._byte_index(byte) == byte_index_expect:
-                packet.append(self._byte_nibble(byte))
-            else:
-                if retries >= PACKET_RETRY_LIMIT:
-                    raise MultimeterFortuneFS9721Exception(
-                        "Received out of order bytes " "after {} retries".format(PACKET_RETRY_LIMIT)
-                    )
-                logger.debug("Received out of order packet data, retrying")
-                return self.receive_packet(retries=retries + 1)
-            byte_index_expect += 1
+    def receive_packet(self, freshest=False):
+        """
+        Returns the next raw 14 byte frame as `bytes`, each byte carrying its sequence index in the high
+        nibble; previously this was a list of 14x nibble bit-strings, which `parse_packet()` still accepts.
+        With `freshest=True` frames already buffered are skipped for the newest, see `FrameReader.read()`.
+        """
+        packet = self.frame_reader.read(self.serial, freshest=freshest)
         logger.debug("Received complete packet with 14x nibbles")
         return packet
 
-    def _byte_index(self, byte):
-        binary_string = "{:08b}".format(int(byte.hex(), 16))[0:4]
-        return int(binary_string, 2)
-
-    def _byte_nibble(self, data):
-        return "{:08b}".format(int(data.hex(), 16))[-4:]
-
-    def _parse_packet_operation_mode(self, packet):
-        if int(packet[12][0]) == 1 and int(packet[0][0]) == 1:
-            return "current_ac"
-        elif int(packet[12][0]) == 1 and int(packet[0][1]) == 1:
-            return "current_dc"
-        elif int(packet[12][1]) == 1 and int(packet[0][0]) == 1:
-            return "voltage_ac"
-        elif int(packet[12][1]) == 1 and int(packet[0][1]) == 1:
-            return "voltage_dc"
-        elif int(packet[11][1]) == 1 and int(packet[10][3]) == 0:
-            return "resistance"
-        elif int(packet[9][3]) == 1 and int(packet[12][1]) == 1:
-            return "diode"
-        elif int(packet[11][1]) == 1 and int(packet[10][3]) == 1:
-            return "continuity"
-        elif int(packet[11][0]) == 1:
-            return "capacitance"
-        elif int(packet[12][2]) == 1 or int(packet[10][1]) == 1:
-            return "frequency"
-        elif int(packet[13][3]) == 1:
-            return "temperature"
-        raise MultimeterFortuneFS9721Exception("Unsupported digital multimeter mode from packet")
+    def get_stats(self):
+        return {
+            "frames_decoded": self.frames_decoded,
+            **self.decode_cache.get_stats(),
+            **self.frame_reader.get_stats(),
+        }
 
-    def _parse_packet_display_value(self, packet):
-        if int(packet[1][0]) == 1:
-            sign = -1
-        else:
-            sign = 1
 
-        if int(packet[7][0]) == 1:
+class MultimeterFortuneFS9721FrameReader(FrameReader):
+    """
+    Frames are 14 bytes, each carrying its 1..14 sequence index in the high nibble.
+    """
+
+    frame_size = PACKET_SIZE
+    retry_limit = PACKET_RETRY_LIMIT
+    exception = MultimeterFortuneFS9721Exception
+
+    def synchronise(self, buffer):
+        if buffer[:PACKET_SIZE].translate(_INDEX_TABLE) == _INDEX_SEQUENCE:
+            return 0, True
+        indexes = buffer.translate(_INDEX_TABLE)
+        offset = indexes.find(_INDEX_SEQUENCE)
+        if offset >= 0:
+            return offset, True
+        # no complete frame available; retain the trailing bytes that may yet begin one
+        offset = max(0, len(indexes) - PACKET_SIZE + 1)
+        while True:
+            offset = indexes.find(1, offset)
+            if offset < 0:
+                return len(buffer), False
+            if _INDEX_SEQUENCE.startswith(indexes[offset:]):
+                return offset, False
+            offset += 1
+
+
+class MultimeterFortuneFS9721Reading(Reading):
+    __slots__ = ("value", "scale", "function", "flags")
+
+    def __init__(self, value, scale, function, flags, timestamp, timestamp_start, timestamp_previous):
+        super().__init__(timestamp, timestamp_start, timestamp_previous)
+        self.value = value
+        self.scale = scale
+        self.function = function
+        self.flags = flags
+
+    def to_dict(self):
+        reading = _reading_dict(self.value, self.scale, self.function, self.flags)
+        reading["time"] = self.time_dict()
+        return reading
+
+
+def decode(packet):
+    """
+    Decode a raw 14 byte FS9721 frame into its "reading" and "instrument" blocks in a single pass.
+
+    Each frame byte carries its sequence index in the high nibble and LCD segment data in the low nibble;
+    the digits, scale, units and operation-mode are resolved through the module lookup tables that are
+    built once at import time, see `_build_segment_table()` and friends below.
+    """
+    return _reading_dict(*_decode_fields(packet))
+
+
+def _decode_fields(packet):
+    # returns (value, scale table entry, function table entry, flags); the table entries are shared tuples
+    n0, n1, n2, n3, n4, n5, n6, n7, n8, n9, n10, n11, n12, n13 = packet.translate(_NIBBLE_TABLE)
+
+    digit_1 = _SEGMENT_TABLE[((n1 & 0b0111) << 4) | n2]
+    digit_2 = _SEGMENT_TABLE[((n3 & 0b0111) << 4) | n4]
+    digit_3 = _SEGMENT_TABLE[((n5 & 0b0111) << 4) | n6]
+    digit_4 = _SEGMENT_TABLE[((n7 & 0b0111) << 4) | n8]
+    if digit_1 is None or digit_2 is None or digit_3 is None or digit_4 is None:
+        raise MultimeterFortuneFS9721Exception("Unknown digit")
+
+    number = None
+    for digit in (digit_1, digit_2, digit_3, digit_4):
+        if digit == DIGIT_BLANK:
+            continue
+        if digit == DIGIT_LOW:
+            number = None
+            break
+        number = digit if number is None else number * 10 + digit
+
+    if number is None:
+        value = None
+    else:
+        sign = -1 if n1 & 0b1000 else 1
+        if n7 & 0b1000:
             multiplier = 0.1
-        elif int(packet[5][0]) == 1:
+        elif n5 & 0b1000:
             multiplier = 0.01
-        elif int(packet[3][0]) == 1:
+        elif n3 & 0b1000:
             multiplier = 0.001
         else:
             multiplier = 1
+        value = sign * number * multiplier
 
-        def parse_digit(nibble_1, nibble_2):
-            bits = "{}{}".format(nibble_1, nibble_2)[1:]
-            if bits == "0000101":
-                return "1"
-            elif bits == "1011011":
-                return "2"
-            elif bits == "0011111":
-                return "3"
-            elif bits == "0100111":
-                return "4"
-            elif bits == "0111110":
-                return "5"
-            elif bits == "1111110":
-                return "6"
-            elif bits == "0010101":
-                return "7"
-            elif bits == "1111111":
-                return "8"
-            elif bits == "0111111":
-                return "9"
-            elif bits == "1111101":
-                return "0"
-            elif bits == "1101000":
-                return "L"
-            elif bits == "0000000":
-                return ""
-            else:
-                raise MultimeterFortuneFS9721Exception("Unknown digit")
-
-        digit_1 = parse_digit(packet[1], packet[2])
-        digit_2 = parse_digit(packet[3], packet[4])
-        digit_3 = parse_digit(packet[5], packet[6])
-        digit_4 = parse_digit(packet[7], packet[8])
+    scale = _SCALE_TABLE[(n9 << 4) | n10]
 
-        try:
-            number = int("{}{}{}{}".format(digit_1, digit_2, digit_3, digit_4))
-        except ValueError:
-            return None
-        return sign * number * multiplier
-
-    def _parse_packet_scale(self, packet):
-        if int(packet[10][2]) == 1:
-            scale = 1e6
-            scale_name = "mega"
-            scale_symbol = "M"
-        elif int(packet[9][2]) == 1:
-            scale = 1e3
-            scale_name = "kilo"
-            scale_symbol = "k"
-        elif int(packet[10][0]) == 1:
-            scale = 1e-3
-            scale_name = "milli"
-            scale_symbol = "m"
-        elif int(packet[9][0]) == 1:
-            scale = 1e-6
-            scale_name = "micro"
-            scale_symbol = "\u03BC"
-        elif int(packet[9][1]) == 1:
-            scale = 1e-9
-            scale_name = "nano"
-            scale_symbol = "n"
+    function_key = ((n0 << 20) | (n9 << 16) | (n10 << 12) | (n11 << 8) | (n12 << 4) | n13) & FUNCTION_MASK
+    function = _FUNCTION_TABLE[function_key]
+    if function[1] is None:
+        raise MultimeterFortuneFS9721Exception("Unknown measurement units")
+    if function[0] is None:
+        raise MultimeterFortuneFS9721Exception("Unsupported digital multimeter mode from packet")
+
+    # hold, relative and low-battery in bits 0, 1 and 2
+    return value, scale, function, (n11 & 0b0011) | (n12 & 0b0001) << 2
+
+
+def _reading_dict(value, scale, function, flags):
+    scale, scale_name, scale_symbol = scale
+    operation_mode, unit_name, unit_symbol = function
+    return {
+        "reading": {
+            "value": value,
+            "unit_name": unit_name,
+            "unit_symbol": unit_symbol,
+            "scale": scale,
+            "scale_name": scale_name,
+            "scale_symbol": scale_symbol,
+            "scaled_value": None if value is None else value * scale,
+            "is_relative": bool(flags & 0b010),
+        },
+        "instrument": {
+            "module": MODULE_NAME,
+            "operation_mode": operation_mode,
+            "low_battery": bool(flags & 0b100),
+            "is_hold": bool(flags & 0b001),
+        },
+    }
+
+
+def decode_array(buf):
+    """
+    Decode a raw FS9721 serial capture into a NumPy structured array with one row per frame.
+
+    Frames are located through their 1..14 index nibbles, bytes outside of complete frames are skipped and
+    frames that `decode()` would reject (unknown digits, units or mode) are dropped.  Columns are `value`,
+    `scale` and `scaled_value` (NaN where the display shows no number), `unit` and `mode` as indexes into
+    UNIT_NAMES and OPERATION_MODES, and the `hold`, `relative` and `low_battery` flags.
+
+    Requires the optional `numpy` package.
+    """
+    if numpy is None:
+        raise MultimeterFortuneFS9721Exception("decode_array() requires the numpy package to be installed")
+    segment_lut, scale_lut, mode_lut, unit_lut = _build_array_tables()
+
+    data = numpy.frombuffer(buf, dtype=numpy.uint8)
+    count = len(data) - PACKET_SIZE + 1
+    if count > 0:
+        indexes = data >> 4
+        is_frame = indexes[:count] == 1
+        for position in range(1, PACKET_SIZE):
+            is_frame &= indexes[position : count + position] == position + 1
+        starts = numpy.flatnonzero(is_frame)
+    else:
+        starts = numpy.empty(0, dtype=numpy.intp)
+    # widened from uint8 so the shifts building the lookup keys below do not overflow
+    n = (data[starts[:, None] + numpy.arange(PACKET_SIZE)] & 0b1111).astype(numpy.intp)
+
+    digits = segment_lut[((n[:, 1:9:2] & 0b0111) << 4) | n[:, 2:10:2]]
+    number = numpy.zeros(len(n), dtype=numpy.int64)
+    has_digit = numpy.zeros(len(n), dtype=bool)
+    for column in range(4):
+        digit = digits[:, column]
+        number = numpy.where(digit >= 0, number * 10 + digit, number)
+        has_digit |= digit >= 0
+    is_number = has_digit & ~(digits == DIGIT_LOW).any(axis=1)
+
+    sign = numpy.where(n[:, 1] & 0b1000, -1, 1)
+    multiplier = numpy.select(
+        [n[:, 7] & 0b1000 > 0, n[:, 5] & 0b1000 > 0, n[:, 3] & 0b1000 > 0], [0.1, 0.01, 0.001], default=1.0
+    )
+    value = numpy.where(is_number, (sign * number) * multiplier, numpy.nan)
+    scale = scale_lut[(n[:, 9] << 4) | n[:, 10]]
+
+    function_key = (
+        ((n[:, 0] >> 2) << 9)
+        | ((n[:, 9] & 0b0001) << 8)
+        | ((n[:, 10] & 0b0001) << 7)
+        | (((n[:, 10] >> 2) & 0b0001) << 6)
+        | ((n[:, 11] >> 2) << 4)
+        | ((n[:, 12] >> 1) << 1)
+        | (n[:, 13] & 0b0001)
+    )
+    mode = mode_lut[function_key]
+    unit = unit_lut[function_key]
+    valid = (digits != _DIGIT_UNKNOWN).all(axis=1) & (mode >= 0) & (unit >= 0)
+
+    readings = numpy.empty(int(valid.sum()), dtype=DECODE_ARRAY_DTYPE)
+    readings["value"] = value[valid]
+    readings["scale"] = scale[valid]
+    readings["scaled_value"] = value[valid] * scale[valid]
+    readings["unit"] = unit[valid]
+    readings["mode"] = mode[valid]
+    readings["hold"] = n[valid, 11] & 0b0001 > 0
+    readings["relative"] = n[valid, 11] & 0b0010 > 0
+    readings["low_battery"] = n[valid, 12] & 0b0001 > 0
+    return readings
+
+
+@functools.lru_cache()
+def _build_array_tables():
+    segment_lut = numpy.array([_DIGIT_UNKNOWN if d is None else d for d in _SEGMENT_TABLE], dtype=numpy.int64)
+    scale_lut = numpy.array([entry[0] for entry in _SCALE_TABLE], dtype=numpy.float64)
+    mode_lut = numpy.full(2048, -1, dtype=numpy.int8)
+    unit_lut = numpy.full(2048, -1, dtype=numpy.int8)
+    for function_key, (operation_mode, unit_name, _) in _FUNCTION_TABLE.items():
+        n0, n9, n10 = (function_key >> 20) & 0b1111, (function_key >> 16) & 0b1111, (function_key >> 12) & 0b1111
+        n11, n12, n13 = (function_key >> 8) & 0b1111, (function_key >> 4) & 0b1111, function_key & 0b1111
+        # the FUNCTION_MASK bits packed into 11 bits
+        key = (n0 >> 2) << 9 | (n9 & 1) << 8 | (n10 & 1) << 7 | ((n10 >> 2) & 1) << 6
+        key |= (n11 >> 2) << 4 | (n12 >> 1) << 1 | (n13 & 1)
+        if operation_mode is not None:
+            mode_lut[key] = OPERATION_MODES.index(operation_mode)
+        if unit_name is not None:
+            unit_lut[key] = UNIT_NAMES.index(unit_name)
+    return segment_lut, scale_lut, mode_lut, unit_lut
+
+
+def _build_segment_table():
+    # 7-bit segment patterns; the low 3 bits of the first nibble followed by the 4 bits of the second nibble
+    segments = {
+        0b1111101: 0,
+        0b0000101: 1,
+        0b1011011: 2,
+        0b0011111: 3,
+        0b0100111: 4,
+        0b0111110: 5,
+        0b1111110: 6,
+        0b0010101: 7,
+        0b1111111: 8,
+        0b0111111: 9,
+        0b1101000: DIGIT_LOW,
+        0b0000000: DIGIT_BLANK,
+    }
+    return tuple(segments.get(bits) for bits in range(128))
+
+
+def _build_scale_table():
+    # keyed on the combined nibbles (packet[9] << 4) | packet[10]
+    table = []
+    for key in range(256):
+        n9, n10 = key >> 4, key & 0b1111
+        if n10 & 0b0010:
+            table.append((1e6, "mega", "M"))
+        elif n9 & 0b0010:
+            table.append((1e3, "kilo", "k"))
+        elif n10 & 0b1000:
+            table.append((1e-3, "milli", "m"))
+        elif n9 & 0b1000:
+            table.append((1e-6, "micro", "\u03BC"))
+        elif n9 & 0b0100:
+            table.append((1e-9, "nano", "n"))
         else:
-            scale = 1
-            scale_name = None
-            scale_symbol = None
-        return scale, scale_name, scale_symbol
-
-    def _parse_packet_units(self, packet):
-        if int(packet[12][0]) == 1:
-            unit_name = "amps"
-            unit_symbol = "A"
-        elif int(packet[12][1]) == 1:
-            unit_name = "volts"
-            unit_symbol = "V"
-        elif int(packet[11][1]) == 1:
-            unit_name = "ohms"
-            unit_symbol = "\u03A9"
-        elif int(packet[11][0]) == 1:
-            unit_name = "farads"
-            unit_symbol = "F"
-        elif int(packet[12][2]) == 1:
-            unit_name = "hertz"
-            unit_symbol = "Hz"
-        elif int(packet[10][1]) == 1:
-            unit_name = "duty-cycle"
-            unit_symbol = "%"
-        elif int(packet[13][3]) == 1:
-            unit_name = "celsius"
-            unit_symbol = "C"
+            table.append((1, None, None))
+    return tuple(table)
+
+
+def _build_function_table():
+    # keyed on the FUNCTION_MASK bits of packet nibbles 0, 9, 10, 11, 12 and 13
+    table = {}
+    key = FUNCTION_MASK
+    while True:
+        n0, n9, n10 = (key >> 20) & 0b1111, (key >> 16) & 0b1111, (key >> 12) & 0b1111
+        n11, n12, n13 = (key >> 8) & 0b1111, (key >> 4) & 0b1111, key & 0b1111
+
+        if n12 & 0b1000 and n0 & 0b1000:
+            operation_mode = "current_ac"
+        elif n12 & 0b1000 and n0 & 0b0100:
+            operation_mode = "current_dc"
+        elif n12 & 0b0100 and n0 & 0b1000:
+            operation_mode = "voltage_ac"
+        elif n12 & 0b0100 and n0 & 0b0100:
+            operation_mode = "voltage_dc"
+        elif n11 & 0b0100 and not n10 & 0b0001:
+            operation_mode = "resistance"
+        elif n9 & 0b0001 and n12 & 0b0100:
+            operation_mode = "diode"
+        elif n11 & 0b0100 and n10 & 0b0001:
+            operation_mode = "continuity"
+        elif n11 & 0b1000:
+            operation_mode = "capacitance"
+        elif n12 & 0b0010 or n10 & 0b0100:
+            operation_mode = "frequency"
+        elif n13 & 0b0001:
+            operation_mode = "temperature"
         else:
-            raise MultimeterFortuneFS9721Exception("Unknown measurement units")
-        return unit_name, unit_symbol
-
-    def _parse_packet_low_battery(self, packet):
-        if int(packet[12][3]) == 1:
-            return True
-        return False
-
-    def _parse_packet_hold(self, packet):
-        if int(packet[11][3]) == 1:
-            return True
-        return False
-
-    def _parse_packet_relative(self, packet):
-        if int(packet[11][2]) == 1:
-            return True
-        return False
+            operation_mode = None
+
+        if n12 & 0b1000:
+            unit_name, unit_symbol = "amps", "A"
+        elif n12 & 0b0100:
+            unit_name, unit_symbol = "volts", "V"
+        elif n11 & 0b0100:
+            unit_name, unit_symbol = "ohms", "\u03A9"
+        elif n11 & 0b1000:
+            unit_name, unit_symbol = "farads", "F"
+        elif n12 & 0b0010:
+            unit_name, unit_symbol = "hertz", "Hz"
+        elif n10 & 0b0100:
+            unit_name, unit_symbol = "duty-cycle", "%"
+        elif n13 & 0b0001:
+            unit_name, unit_symbol = "celsius", "C"
+        else:
+            unit_name, unit_symbol = None, None
+
+        table[key] = (operation_mode, unit_name, unit_symbol)
+        if key == 0:
+            break
+        key = (key - 1) & FUNCTION_MASK
+    return table
+
+
+_NIBBLE_TABLE = bytes(byte & 0b1111 for byte in range(256))
+_INDEX_TABLE = bytes(byte >> 4 for byte in range(256))
+_INDEX_SEQUENCE = bytes(range(1, PACKET_SIZE + 1))
+_SEGMENT_TABLE = _build_segment_table()
+_SCALE_TABLE = _build_scale_table()
+_FUNCTION_TABLE = _build_function_table()
+
+if numpy is not None:
+    DECODE_ARRAY_DTYPE = numpy.dtype(
+        [
+            ("value", numpy.float64),
+            ("scale", numpy.float64),
+            ("scaled_value", numpy.float64),
+            ("unit", numpy.int8),
+            ("mode", numpy.int8),
+            ("hold", numpy.bool_),
+            ("relative", numpy.bool_),
+            ("low_battery", numpy.bool_),
+        ]
+    )
@@ -0,0 +1,113 @@
+import json
+import logging
+import socket
+import urllib.parse
+
+from ..exceptions import MultimeterException
+
+CONNECT_TIMEOUT = 5
+RECEIVE_TIMEOUT = 10
+RECEIVE_SIZE = 65536
+
+logger = logging.getLogger(__name__)
+
+
+class MultimeterTCPClientException(MultimeterException):
+    pass
+
+
+class MultimeterTCPClient:
+    """
+    Reads the readings broadcast by a `dmm serve` reading server, one NDJSON reading per line, in place of a
+    multimeter connection; `connect` is `tcp://host:port`, with `?device=<id>` to take only the readings of
+    that device from a server with several.  Readings are returned as broadcast, already decoded and tagged
+    with their "device".
+    """
+
+    connect = None
+    device = None
+    socket = None
+    buffer = None
+    readings_received = 0
+    readings_skipped = 0
+    bytes_received = 0
+
+    def __init__(self, connect):
+        url = urllib.parse.urlsplit(connect)
+        if url.scheme != "tcp" or not url.hostname or not url.port:
+            raise MultimeterTCPClientException("Reading server connect must be tcp://host:port", connect)
+        self.connect = connect
+        self.device = urllib.parse.parse_qs(url.query).get("device", [None])[0]
+        self.buffer = bytearray()
+        try:
+            self.socket = socket.create_connection((url.hostname, url.port), timeout=CONNECT_TIMEOUT)
+        except OSError as e:
+            raise MultimeterTCPClientException("Unable to connect to reading server {}: {}".format(connect, e))
+        self.socket.settimeout(RECEIVE_TIMEOUT)
+        logger.debug("Reading server connection okay: {}".format(connect))
+
+    def __del__(self):
+        if self.socket:
+            logger.debug("Closing reading server connection")
+            self.socket.close()
+
+    def get_reading(self, compact=False, freshest=False):
+        """
+        Returns the next reading; with `freshest=True` readings already received are skipped for the newest.
+        """
+        if compact:
+            raise MultimeterTCPClientException("Compact readings are not available from a reading server")
+        while True:
+            lines = self._receive_lines(freshest=freshest)
+            readings = [reading for reading in map(json.loads, lines) if self._wanted(reading)]
+            self.readings_skipped += len(lines) - min(len(readings), 1)
+            if readings:
+                self.readings_received += 1
+                return readings[-1]
+
+    def get_stats(self):
+        return {
+            "readings_received": self.readings_received,
+            "readings_skipped": self.readings_skipped,
+            "bytes_received": self.bytes_received,
+        }
+
+    def _wanted(self, reading):
+        return self.device is None or reading.get("device") == self.device
+
+    def _receive_lines(self, freshest=False):
+        """
+        Returns the next complete line, or with `freshest=True` all complete lines received so far.
+        """
+        while b"\n" not in self.buffer:
+            self._receive()
+        if freshest:
+            # take anything further already waiting without blocking
+            self.socket.setblocking(False)
+            try:
+                while True:
+                    self._receive()
+            except BlockingIOError:
+                pass
+            finally:
+                self.socket.settimeout(RECEIVE_TIMEOUT)
+            end = self.buffer.rindex(b"\n")
+        else:
+            end = self.buffer.index(b"\n")
+        lines = bytes(self.buffer[:end]).split(b"\n")
+        del self.buffer[: end + 1]
+        return lines
+
+    def _receive(self):
+        try:
+            data = self.socket.recv(RECEIVE_SIZE)
+        except socket.timeout:
+            raise MultimeterTCPClientException("No readings received from reading server {}".format(self.connect))
+        except BlockingIOError:
+            raise
+        except OSError as e:
+            raise MultimeterTCPClientException("Reading server {} failed: {}".format(self.connect, e))
+        if not data:
+            raise MultimeterTCPClientException("Reading server {} closed the connection".format(self.connect))
+        self.bytes_received += len(data)
+        self.buffer.extend(data)
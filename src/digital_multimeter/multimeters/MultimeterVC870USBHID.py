@@ -15,6 +15,10 @@
     
     In order to run this use the model name  "Voltcraft_VC870" and the connect paramter "usb:1a86.e008"
     (assuming this is the correct VID.PID). "usb:" might be omitted and "1a86:e008" is also accepted.
+
+    With streaming=True a background thread continuously drains the interrupt endpoint and frames packets
+    on their CRLF terminator into a queue, so back-to-back readings never wait for a fresh packet and no
+    HID reports are lost between calls to get_reading().
     
     Using the USB HID on Linux:
     1. Ensure the permissions allow you to read the device, make a udev rule otherwise.
@@ -34,25 +38,81 @@
     - https://github.com/pklaus/ut61e_python
 """
 
+import errno
+import functools
 import logging
 import math
 import platform
+import queue
 import re
+import threading
 import time
 
 import usb.core
 import usb.util
 
 from ..exceptions import MultimeterException
+from ..multimeters.DecodeCache import DecodeCache
 from ..multimeters.MultimeterBase import MultimeterBase
+from ..multimeters.Reading import Reading
 
 UART_SPEED = 9600
 
 PACKET_RETRY_LIMIT = 3
 PACKET_SIZE = 23
-PACKET_TERMINATOR = "\r\n"
+PACKET_TERMINATOR = b"\r\n"
+PACKET_QUEUE_SIZE = 64
 ALLOWED_DATA = range(0x30, 0x40)
 
+STREAM_READ_TIMEOUT_MS = 500
+STREAM_PACKET_TIMEOUT_S = 3
+
+# The highest bit must be removed from each payload byte (might be 1 or 0)
+_PAYLOAD_TABLE = bytes(byte & ~(1 << 7) for byte in range(256))
+_ALLOWED_BYTES = bytes(ALLOWED_DATA)
+
+MODULE_NAME = __name__.split(".")[-1]
+
+# The first two bytes define the measurement mode (function code + function select code)
+# Resulting from these two bytes the following parameters can be derived:
+# 1. Operation mode
+# 2. Physical unit that is measured
+# 3. Base factor to calculate the SI value from the display value
+# In some operation modes there is an auxiliary value measured and displayed.
+# In this case the value tuple is extended by:
+# 4. Physical unit of the auxiliary measurement
+# 5. Base factor to calculate the SI value from the auxiliary value
+OPERATION_MODES = {
+    int.from_bytes(operation_id, "big"): operation_mode
+    for operation_id, operation_mode in {
+        b"00": ("DCV", "V", 1e-4),
+        b"01": ("ACV", "V", 1e-4),
+        b"10": ("DCmV", "V", 1e-5),
+        b"11": ("TEMP", "°C", 1e-1),
+        b"20": ("RES", "Ohm", 1e-2),
+        b"21": ("CTN", "Ohm", 1e-2),
+        b"30": ("CAP", "F", 1e-12),
+        b"40": ("DIO", "V", 1e-4),
+        b"50": ("FREQ", "Hz", 1),
+        b"51": ("(4~20)mA%%", "%%", 1),
+        b"60": ("DCuA", "A", 1e-8),
+        b"61": ("ACuA", "A", 1e-8),
+        b"70": ("DCmA", "A", 1e-6),
+        b"71": ("ACmA", "A", 1e-6),
+        b"80": ("DCA", "A", 1e-3),
+        b"81": ("ACA", "A", 1e-3),
+        b"90": ("Act+Apar_Power", "W", 0.1, "VA", 0.1),
+        b"91": ("PowFactor+Freq", "cos_fi", 1e-3, "Hz", 0.1),
+        b"92": ("VoltEff+CurrEff", "V", 0.1, "A", 0.1),
+    }.items()
+}
+
+# display range byte (ascii digit) to its value multiplier
+RANGE_MULTIPLIERS = {ord(str(exponent)): 10**exponent for exponent in range(10)}
+
+# status (low 2 bits) and option1..option4 (low 4 bits, option3 bits 3 and 1 only) of packet bytes 15..19
+FLAGS_MASK = 0x030F0F0A0F
+
 logger = logging.getLogger(__name__)
 
 
@@ -63,11 +123,29 @@ class MultimeterVC870USBHIDException(MultimeterException):
 class MultimeterVC870USBHID(MultimeterBase):
     dev = None
     ep = None
-    buffer = ""
-
-    def __init__(self, connect):
+    buffer = None
+    streaming = False
+    stream_packets = None
+    stream_thread = None
+    stream_stop_event = None
+    stream_error = None
+    stream_callback = None
+    packets_received = 0
+    packets_dropped = 0
+    bytes_discarded = 0
+    frames_decoded = 0
+    decode_cache = None
+
+    def __init__(self, connect, streaming=False):
         super().__init__()
+        self.buffer = bytearray()
+        self.decode_cache = DecodeCache()
+        if connect is None:
+            # offline; parse_packet() only, for example when replaying a capture file
+            return
         self.interface_open(connect)
+        if streaming:
+            self.stream_start()
 
     def __del__(self):
         self.interface_close()
@@ -123,46 +201,143 @@ class MultimeterVC870USBHID(MultimeterBase):
         )
 
     def interface_close(self):
+        self.stream_stop()
         if self.dev:
             logger.debug("Closing USB connection")
             self.dev.reset()
             usb.util.dispose_resources(self.dev)
 
     def interface_flush(self):
-        self.buffer = ""
+        self.buffer.clear()
+
+    def interface_receive(self, timeout_ms=3000):
+        """
+        Reads one HID report from the endpoint and appends its payload to the buffer; returns the number of
+        payload bytes received.
+        """
+        answer = self.dev.read(self.ep.bEndpointAddress, self.ep.wMaxPacketSize, timeout=timeout_ms)
+        if (len(answer) > 1) and (answer[0] & 0xF0 == 0xF0):
+            # get payload size
+            nbytes = answer[0] & 0x7
+            if nbytes > 0:
+                if len(answer) < nbytes + 1:
+                    raise MultimeterVC870USBHIDException("More bytes announced then sent")
+                # In this protocol all data is represented in printable ascii chars in the range 0x30 - 0x3F
+                self.buffer += bytes(answer[1 : nbytes + 1]).translate(_PAYLOAD_TABLE)
+                return nbytes
+        return 0
 
     def interface_read(self, size=1, timeout_ms=3000):
         # Always read from the endpoint even if data in the buffer is available. This ensures no packet is missed
         time_limit = time.time() + timeout_ms / 1000
         while True:
-            answer = self.dev.read(self.ep.bEndpointAddress, self.ep.wMaxPacketSize, timeout=timeout_ms)
-            if (len(answer) > 1) and (answer[0] & 0xF0 == 0xF0):
-                # get payload size
-                nbytes = answer[0] & 0x7
-                if nbytes > 0:
-                    if len(answer) < nbytes + 1:
-                        raise MultimeterVC870USBHIDException("More bytes announced then sent")
-                    payload = answer[1 : nbytes + 1]
-                    # The highest bit must be removed from each payload byte (might be 1 or 0)
-                    # In this protocol all data is represented in printable ascii chars in the range 0x30 - 0x3F
-                    data = [chr(b & (~(1 << 7))) for b in payload]
-                    data = "".join(data)
-                    self.buffer += data
-
+            self.interface_receive(timeout_ms=timeout_ms)
             if len(self.buffer) >= size:
                 break
             if time.time() > time_limit:
                 raise MultimeterVC870USBHIDException("No bytes received. Multimeter connected and set to PC mode?")
 
-        ret_val = self.buffer[:size]
-        self.buffer = self.buffer[size:]
+        ret_val = bytes(self.buffer[:size])
+        del self.buffer[:size]
         return ret_val
 
-    def get_reading(self):
-        return self.parse_packet(self.receive_packet())
+    def stream_start(self):
+        """
+        Start the background reader thread that drains the endpoint into the packet queue.
+        """
+        if self.stream_thread:
+            return
+        self.streaming = True
+        self.interface_flush()
+        self.stream_packets = queue.Queue(maxsize=PACKET_QUEUE_SIZE)
+        self.stream_stop_event = threading.Event()
+        self.stream_error = None
+        self.stream_thread = threading.Thread(target=self._stream_reader, name="dmm-vc870-reader", daemon=True)
+        self.stream_thread.start()
+        logger.debug("Started streaming reader thread")
+
+    def stream_stop(self):
+        if not self.stream_thread:
+            return
+        self.stream_stop_event.set()
+        if self.stream_thread is not threading.current_thread():
+            self.stream_thread.join(timeout=(STREAM_READ_TIMEOUT_MS / 1000) * 2)
+        self.stream_thread = None
+        self.streaming = False
+        logger.debug("Stopped streaming reader thread")
+
+    def get_stats(self):
+        return {
+            "packets_received": self.packets_received,
+            "packets_dropped": self.packets_dropped,
+            "packets_queued": self.stream_packets.qsize() if self.stream_packets else 0,
+            "bytes_discarded": self.bytes_discarded,
+            "frames_decoded": self.frames_decoded,
+            **self.decode_cache.get_stats(),
+        }
 
-    def receive_packet(self):
-        packet = ""
+    def _stream_reader(self):
+        try:
+            while not self.stream_stop_event.is_set():
+                try:
+                    received = self.interface_receive(timeout_ms=STREAM_READ_TIMEOUT_MS)
+                except usb.core.USBError as e:
+                    if e.errno == errno.ETIMEDOUT:
+                        continue
+                    raise
+                if received:
+                    self._stream_packets()
+        except Exception as e:
+            logger.debug("Streaming reader thread failed: {}".format(e))
+            self.stream_error = e
+
+    def _stream_packets(self):
+        terminator = PACKET_TERMINATOR
+        packet_data_size = PACKET_SIZE - len(terminator)
+        while True:
+            terminator_pos = self.buffer.find(terminator)
+            if terminator_pos < 0:
+                if len(self.buffer) > PACKET_SIZE - 1:
+                    # Corrupt data: too long to be a packet without a terminator - keep only a possible packet
+                    # along with a possible first terminator byte
+                    self._stream_discard(len(self.buffer) - (PACKET_SIZE - 1))
+                return
+            packet = bytes(self.buffer[:terminator_pos])
+            del self.buffer[: terminator_pos + len(terminator)]
+            if len(packet) != packet_data_size or packet.translate(None, _ALLOWED_BYTES):
+                # Corrupt or partial packet ahead of the terminator
+                self.bytes_discarded += len(packet) + len(terminator)
+                continue
+            self.packets_received += 1
+            if self.stream_callback:
+                # packets are handed to the callback rather than queued, see `digital_multimeter.aio`
+                self.stream_callback(packet)
+                continue
+            while True:
+                try:
+                    self.stream_packets.put_nowait(packet)
+                    break
+                except queue.Full:
+                    # drop the oldest queued packet in favour of the newest
+                    try:
+                        self.stream_packets.get_nowait()
+                        self.packets_dropped += 1
+                    except queue.Empty:
+                        pass
+
+    def _stream_discard(self, size):
+        del self.buffer[:size]
+        self.bytes_discarded += size
+
+    def get_reading(self, compact=False, freshest=False):
+        return self.parse_packet(self.receive_packet(freshest=freshest), compact=compact)
+
+    def receive_packet(self, freshest=False):
+        # without streaming the interface buffer is always flushed ahead of reading, so packets are always fresh
+        if self.streaming:
+            return self._receive_stream_packet(freshest=freshest)
+
+        packet = b""
         retries = 0
         bytes_to_read = PACKET_SIZE
         packet_data_size = PACKET_SIZE - len(PACKET_TERMINATOR)
@@ -177,28 +352,26 @@ class MultimeterVC870USBHID(MultimeterBase):
             # Best case: we got the complete packet
             if terminator_pos == packet_data_size:
                 packet = packet[:packet_data_size]
-                illegal_bytes = [x for x in packet if ord(x) not in ALLOWED_DATA]
-                if len(illegal_bytes) == 0:
+                if not packet.translate(None, _ALLOWED_BYTES):
                     bytes_to_read = 0
                 else:
                     # Corrupt packet: Illegal chars in data string - start over
-                    packet = ""
+                    packet = b""
                     bytes_to_read = PACKET_SIZE
                     self.interface_flush()
             elif terminator_pos < 0:
                 # Corrupt packet: No terminator found at all - start over
-                packet = ""
+                packet = b""
                 bytes_to_read = PACKET_SIZE
                 self.interface_flush()
             else:
                 packet = packet[terminator_pos + len(PACKET_TERMINATOR) :]
-                illegal_bytes = [x for x in packet if ord(x) not in ALLOWED_DATA]
-                if len(illegal_bytes) == 0:
+                if not packet.translate(None, _ALLOWED_BYTES):
                     # We got a partial packet. Try to read the rest
                     bytes_to_read = PACKET_SIZE - len(packet)
                 else:
                     # Corrupt packet: Illegal bytes found in partial string - start over
-                    packet = ""
+                    packet = b""
                     bytes_to_read = PACKET_SIZE
                     self.interface_flush()
 
@@ -210,153 +383,166 @@ class MultimeterVC870USBHID(MultimeterBase):
 
         return packet
 
-    def parse_packet(self, packet):
-        mode = self._parse_packet_operation_mode(packet)
-        value, aux_value = self._parse_packet_display_value(packet)
-        value *= mode[2]
-        flags = self._parse_packet_flags(packet)
-
-        if "overflow" in flags or "open" in flags:
-            value = math.inf
-            aux_value = math.inf
-
-        timestamp_this = time.time_ns()
-        time_interval = int(timestamp_this - self.timestamp_previous)
-        self.timestamp_previous = timestamp_this
-
-        return_dict = {
-            "reading": {
-                "operation_mode": mode[0],
-                "value": value,
-                "unit": mode[1],
-                "aux_value": None,
-                "aux_unit": None,
-            },
-            "instrument": {
-                "module": __name__.split(".")[-1],
-                "active_flags": flags,
-            },
-            "time": {
-                "elapsed": (timestamp_this - self.timestamp_start) * 1e-9,
-                "interval": time_interval * 1e-9,
-                "timestamp": timestamp_this * 1e-9,
-                "unit_name": "second",
-                "unit_symbol": "s",
-            },
-        }
-
-        # In certain modes AUX values are available
-        if len(mode) == 5:
-            aux_value *= mode[4]
-            return_dict["reading"]["aux_value"] = aux_value
-            return_dict["reading"]["aux_unit"] = mode[3]
-
-        return return_dict
-
-    def _parse_packet_operation_mode(self, packet):
-        operation_id = packet[:2]
-
-        # The first two bytes define the measurement mode (function code + function select code)
-        # Resulting from these two bytes the following parameters can be derived:
-        # 1. Operation mode
-        # 2. Physical unit that is measured
-        # 3. Base factor to calculate the SI value from the display value
-        # In some operation modes there is an auxiliary value measured and displayed.
-        # In this case the value tuple is extended by:
-        # 4. Physical unit of the auxiliary measurement
-        # 5. Base factor to calculate the SI value from the auxiliary value
-        id_to_op_mode = {
-            "00": ("DCV", "V", 1e-4),
-            "01": ("ACV", "V", 1e-4),
-            "10": ("DCmV", "V", 1e-5),
-            "11": ("TEMP", "°C", 1e-1),
-            "20": ("RES", "Ohm", 1e-2),
-            "21": ("CTN", "Ohm", 1e-2),
-            "30": ("CAP", "F", 1e-12),
-            "40": ("DIO", "V", 1e-4),
-            "50": ("FREQ", "Hz", 1),
-            "51": ("(4~20)mA%%", "%%", 1),
-            "60": ("DCuA", "A", 1e-8),
-            "61": ("ACuA", "A", 1e-8),
-            "70": ("DCmA", "A", 1e-6),
-            "71": ("ACmA", "A", 1e-6),
-            "80": ("DCA", "A", 1e-3),
-            "81": ("ACA", "A", 1e-3),
-            "90": ("Act+Apar_Power", "W", 0.1, "VA", 0.1),
-            "91": ("PowFactor+Freq", "cos_fi", 1e-3, "Hz", 0.1),
-            "92": ("VoltEff+CurrEff", "V", 0.1, "A", 0.1),
-        }
+    def _receive_stream_packet(self, freshest=False):
+        if self.stream_error and self.stream_packets.empty():
+            raise MultimeterVC870USBHIDException("Streaming reader failed: {}".format(self.stream_error))
+        if freshest:
+            # the newest queued packet, discarding those queued ahead of it
+            packet = None
+            while True:
+                try:
+                    packet = self.stream_packets.get_nowait()
+                except queue.Empty:
+                    break
+            if packet is not None:
+                return packet
+        try:
+            packet = self.stream_packets.get(timeout=STREAM_PACKET_TIMEOUT_S)
+        except queue.Empty:
+            if self.stream_error:
+                raise MultimeterVC870USBHIDException("Streaming reader failed: {}".format(self.stream_error))
+            raise MultimeterVC870USBHIDException("No packet received. Multimeter connected and set to PC mode?")
+        return packet
 
-        operation_mode = id_to_op_mode.get(operation_id)
-        if operation_mode is None:
-            raise MultimeterVC870USBHIDException("Unsupported digital multimeter mode from packet")
-
-        return operation_mode
-
-    def _parse_packet_display_value(self, packet):
-        value = int(packet[3:8])
-        aux_value = int(packet[8:13])
-
-        sign = 1
-        aux_sign = 1
-
-        status = ord(packet[15]) & 0b1111
-        if status & 0b100:
-            sign = -1
-        if status & 0b1000:
-            aux_sign = -1
-
-        multiplier = 10 ** int(packet[2])
-
-        value *= sign * multiplier
-        aux_value *= aux_sign * multiplier
-
-        return value, aux_value
-
-    def _parse_packet_flags(self, packet):
-        # rs232_dat[13] Simulate strip tens digit --> discard
-        # rs232_dat[14] Simulate strip the single digit --> discard
-        status = ord(packet[15]) & 0b1111
-        option1 = ord(packet[16]) & 0b1111
-        option2 = ord(packet[17]) & 0b1111
-        option3 = ord(packet[18]) & 0b1111
-        option4 = ord(packet[19]) & 0b1111
-
-        active_flags = []
-
-        if status & 0b10:
-            active_flags.append("battery")
-        if status & 0b1 or option2 & 0b1000:
-            active_flags.append("overflow")
-        if option1 & 0b1000:
-            active_flags.append("max")
-        if option1 & 0b100:
-            active_flags.append("min")
-        if option1 & 0b10:
-            active_flags.append("maxmin")
-        if option1 & 0b1:
-            active_flags.append("rel")
-        if option2 & 0b100 or option4 & 0b1:
-            active_flags.append("open")
-        if option2 & 0b10:
-            active_flags.append("manual")
-        if option2 & 0b1:
-            active_flags.append("hold")
-        if option3 & 0b1000:
-            active_flags.append("light")
-        if option3 & 0b10:
-            active_flags.append("warning")
-        if option4 & 0b1000:
-            active_flags.append("misplug_warn")
-        if option4 & 0b100:
-            active_flags.append("lo")
-        if option4 & 0b10:
-            active_flags.append("hi")
-
-        # They are always on and therefore not very helpful
-        # if option3 & 0b100:
-        # active_flags.append("usb")
-        # if option3 & 0b1:
-        # active_flags.append("auto_power")
-
-        return "|".join(active_flags)
+    def parse_packet(self, packet, timestamp=None, compact=False):
+        if isinstance(packet, str):
+            packet = packet.encode("ascii")
+        fields = self.decode_cache.get(packet, _decode_fields)
+        self.frames_decoded += 1
+        if compact:
+            return MultimeterVC870USBHIDReading(*fields, *self.next_time(timestamp))
+        reading = _reading_dict(*fields)
+        reading["time"] = self.parse_time(timestamp)
+        return reading
+
+
+class MultimeterVC870USBHIDReading(Reading):
+    __slots__ = ("mode", "value", "aux_value", "flags")
+
+    def __init__(self, mode, value, aux_value, flags, timestamp, timestamp_start, timestamp_previous):
+        super().__init__(timestamp, timestamp_start, timestamp_previous)
+        self.mode = mode
+        self.value = value
+        self.aux_value = aux_value
+        self.flags = flags
+
+    def to_dict(self):
+        reading = _reading_dict(self.mode, self.value, self.aux_value, self.flags)
+        reading["time"] = self.time_dict()
+        return reading
+
+
+def decode(packet):
+    """
+    Decode a 21 byte VC870 packet (without its CRLF terminator) into its "reading" and "instrument" blocks.
+    """
+    return _reading_dict(*_decode_fields(packet))
+
+
+def _decode_fields(packet):
+    # returns (operation mode table entry, value, aux value, active flags); the mode entry and flags are shared
+    if type(packet) is not bytes:
+        packet = bytes(packet)
+
+    mode = OPERATION_MODES.get((packet[0] << 8) | packet[1])
+    if mode is None:
+        raise MultimeterVC870USBHIDException("Unsupported digital multimeter mode from packet")
+
+    multiplier = RANGE_MULTIPLIERS.get(packet[2])
+    if multiplier is None:
+        raise MultimeterVC870USBHIDException("Unsupported display range from packet")
+
+    status = packet[15]
+    value = int(packet[3:8]) * (-multiplier if status & 0b100 else multiplier) * mode[2]
+    aux_value = int(packet[8:13]) * (-multiplier if status & 0b1000 else multiplier)
+
+    flags, is_overflow = _parse_flags(int.from_bytes(packet[15:20], "big") & FLAGS_MASK)
+    if is_overflow:
+        value = math.inf
+        aux_value = math.inf
+
+    return mode, value, aux_value, flags
+
+
+def _reading_dict(mode, value, aux_value, flags):
+    reading = {
+        "reading": {
+            "operation_mode": mode[0],
+            "value": value,
+            "unit": mode[1],
+            "aux_value": None,
+            "aux_unit": None,
+        },
+        "instrument": {
+            "module": MODULE_NAME,
+            "active_flags": flags,
+        },
+    }
+
+    # In certain modes AUX values are available
+    if len(mode) == 5:
+        reading["reading"]["aux_value"] = aux_value * mode[4]
+        reading["reading"]["aux_unit"] = mode[3]
+
+    return reading
+
+
+def decode_packets(packets):
+    """
+    Decode an iterable of recorded VC870 packets (bytes, bytearray or memoryview, CRLF terminator removed),
+    yielding the "reading" and "instrument" blocks for each; intended for offline processing.
+    """
+    for packet in packets:
+        yield decode(packet)
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_flags(flag_bits):
+    # flag_bits holds the FLAGS_MASK bits of packet bytes 15..19 (status, option1..option4) in big-endian order
+    # rs232_dat[13] Simulate strip tens digit --> discard
+    # rs232_dat[14] Simulate strip the single digit --> discard
+    status = (flag_bits >> 32) & 0b1111
+    option1 = (flag_bits >> 24) & 0b1111
+    option2 = (flag_bits >> 16) & 0b1111
+    option3 = (flag_bits >> 8) & 0b1111
+    option4 = flag_bits & 0b1111
+
+    active_flags = []
+
+    if status & 0b10:
+        active_flags.append("battery")
+    if status & 0b1 or option2 & 0b1000:
+        active_flags.append("overflow")
+    if option1 & 0b1000:
+        active_flags.append("max")
+    if option1 & 0b100:
+        active_flags.append("min")
+    if option1 & 0b10:
+        active_flags.append("maxmin")
+    if option1 & 0b1:
+        active_flags.append("rel")
+    if option2 & 0b100 or option4 & 0b1:
+        active_flags.append("open")
+    if option2 & 0b10:
+        active_flags.append("manual")
+    if option2 & 0b1:
+        active_flags.append("hold")
+    if option3 & 0b1000:
+        active_flags.append("light")
+    if option3 & 0b10:
+        active_flags.append("warning")
+    if option4 & 0b1000:
+        active_flags.append("misplug_warn")
+    if option4 & 0b100:
+        active_flags.append("lo")
+    if option4 & 0b10:
+        active_flags.append("hi")
+
+    # They are always on and therefore not very helpful
+    # if option3 & 0b100:
+    # active_flags.append("usb")
+    # if option3 & 0b1:
+    # active_flags.append("auto_power")
+
+    flags = "|".join(active_flags)
+    return flags, "overflow" in flags or "open" in flags
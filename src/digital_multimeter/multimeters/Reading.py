@@ -0,0 +1,51 @@
+import abc
+
+
+class Reading(abc.ABC):
+    """
+    Compact alternative to the nested reading dict, returned by `get_reading(compact=True)`.
+
+    Implementations hold only the decoded numeric fields along with references to the interned strings and
+    lookup-table entries of their driver, so a long in-memory history costs a fraction of the equivalent
+    dicts; `to_dict()` produces the usual "reading", "instrument" and "time" schema on demand.
+
+    Reading times are kept as the nanosecond timestamp of this reading plus the start and previous reading
+    timestamps of the multimeter, objects that are shared with the neighbouring readings.
+    """
+
+    __slots__ = ("timestamp", "timestamp_start", "timestamp_previous")
+
+    def __init__(self, timestamp, timestamp_start, timestamp_previous):
+        self.timestamp = timestamp
+        self.timestamp_start = timestamp_start
+        self.timestamp_previous = timestamp_previous
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, self.to_dict())
+
+    @abc.abstractmethod
+    def to_dict(self):
+        """
+        Returns the reading as the nested dict returned by `get_reading()`.
+        """
+
+    def time_dict(self):
+        return time_dict(self.timestamp, self.timestamp_start, self.timestamp_previous)
+
+
+def time_dict(timestamp, timestamp_start, timestamp_previous):
+    """
+    Returns the "time" block of a reading taken at `timestamp` (ns).
+    """
+    return {
+        "elapsed": (timestamp - timestamp_start) * 1e-9,
+        "interval": int(timestamp - timestamp_previous) * 1e-9,
+        "timestamp": timestamp * 1e-9,
+        "unit_name": "second",
+        "unit_symbol": "s",
+    }
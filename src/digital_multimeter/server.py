@@ -0,0 +1,374 @@
+import base64
+import hashlib
+import logging
+import queue
+import socket
+import struct
+import threading
+import urllib.parse
+
+from digital_multimeter.exceptions import MultimeterException
+from digital_multimeter.main import DigitalMultimeter
+from digital_multimeter.utils.cli_output import _ndjson_format
+
+logger = logging.getLogger(__name__)
+
+#
+# Reading server
+#
+# Readings are broadcast one NDJSON object per line to TCP clients and one object per WebSocket text message
+# to WebSocket clients, each tagged with the id of its device under the "device" key.  WebSocket clients may
+# subscribe to a single device with a `?device=<id>` request query.
+#
+
+DEFAULT_PORT = 7410
+CLIENT_QUEUE_SIZE = 256
+RECONNECT_DELAY = 5
+ACCEPT_TIMEOUT = 0.5
+HANDSHAKE_TIMEOUT = 5
+HANDSHAKE_SIZE = 8192
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+WEBSOCKET_TEXT = 0x81
+
+_CLOSE = object()
+
+
+class ReadingServerException(MultimeterException):
+    pass
+
+
+class ReadingServer:
+    """
+    Owns the digital multimeters and broadcasts their readings to any number of local clients over TCP and
+    WebSocket, so that several consumers can follow a multimeter whose port only one process can open.
+
+    Each device is read by its own acquisition thread, which encodes a reading once and offers it to every
+    client.  Clients are written by their own thread from a bounded queue of `queue_size` readings; a client
+    that falls behind has its oldest queued readings dropped rather than holding up the other clients or the
+    acquisition.  A multimeter that fails is reconnected after `RECONNECT_DELAY` seconds.
+
+    Use `DigitalMultimeter(connect="tcp://host:port")` to read a reading server like a multimeter.
+    """
+
+    devices = None
+    host = None
+    port = None
+    websocket_port = None
+    queue_size = None
+    interval = None
+
+    listeners = None
+    clients = None
+    lock = None
+    stop_event = None
+    threads = None
+    readings_broadcast = 0
+
+    def __init__(
+        self,
+        devices,
+        host="127.0.0.1",
+        port=DEFAULT_PORT,
+        websocket_port=None,
+        queue_size=CLIENT_QUEUE_SIZE,
+        interval=None,
+    ):
+        """
+        :param devices: list [required]
+            the multimeters to read, each a dict with the `connect` and optional `model` and `device` id,
+            see `MultimeterGroup`
+        :param host: str [default 127.0.0.1]
+            the address to listen on
+        :param port: int [default 7410]
+            the NDJSON over TCP port; 0 for any free port, None to disable
+        :param websocket_port: int [optional]
+            the WebSocket port; 0 for any free port, None to disable
+        :param queue_size: int [default 256]
+            the readings queued for each client before its oldest are dropped
+        :param interval: float [optional]
+            read each multimeter every `interval` seconds, see `DigitalMultimeter.stream()`
+        """
+        self.devices = []
+        for device in devices:
+            connect = device["connect"]
+            model = device.get("model") or "Default"
+            self.devices.append((device.get("device") or connect, connect, model))
+        ids = [device_id for device_id, _, _ in self.devices]
+        if len(set(ids)) != len(ids):
+            raise ReadingServerException("Multimeter device ids must be unique", ids)
+        if port is None and websocket_port is None:
+            raise ReadingServerException("A TCP or WebSocket port is required")
+        self.host = host
+        self.port = port
+        self.websocket_port = websocket_port
+        self.queue_size = queue_size
+        self.interval = interval
+        self.clients = set()
+        self.lock = threading.Lock()
+        self.threads = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        """
+        Listen for clients and start reading the multimeters.
+        """
+        if self.threads:
+            return
+        self.stop_event = threading.Event()
+        self.listeners = {}
+        try:
+            for websocket, port in ((False, self.port), (True, self.websocket_port)):
+                if port is not None:
+                    listener = socket.create_server((self.host, port))
+                    listener.settimeout(ACCEPT_TIMEOUT)
+                    self.listeners[websocket] = listener
+        except OSError as e:
+            self._close_listeners()
+            raise ReadingServerException("Unable to listen on {}: {}".format(self.host, e))
+        for websocket, listener in self.listeners.items():
+            self._thread(self._accept, listener, websocket, name="dmm-server-accept")
+            logger.info(
+                "Serving {} readings on {}:{}".format(
+                    "WebSocket" if websocket else "NDJSON", self.host, listener.getsockname()[1]
+                )
+            )
+        for device_id, connect, model in self.devices:
+            self._thread(self._acquire, device_id, connect, model, name="dmm-server-{}".format(device_id))
+
+    def stop(self):
+        """
+        Stop reading the multimeters and disconnect the clients.
+        """
+        if not self.threads:
+            return
+        self.stop_event.set()
+        self._close_listeners()
+        with self.lock:
+            clients, self.clients = self.clients, set()
+        for client in clients:
+            client.close()
+        self.threads = []
+
+    def serve_forever(self):
+        """
+        Serve until interrupted.
+        """
+        self.start()
+        try:
+            while not self.stop_event.wait(timeout=1):
+                pass
+        finally:
+            self.stop()
+
+    @property
+    def addresses(self):
+        """
+        The (host, port) of the TCP and WebSocket listeners, None where disabled.
+        """
+        return {
+            "tcp": self.listeners[False].getsockname()[:2] if False in self.listeners else None,
+            "websocket": self.listeners[True].getsockname()[:2] if True in self.listeners else None,
+        }
+
+    def get_stats(self):
+        """
+        Returns the readings broadcast and the readings queued for and dropped by each connected client.
+        """
+        with self.lock:
+            clients = list(self.clients)
+        return {
+            "readings_broadcast": self.readings_broadcast,
+            "clients": [client.get_stats() for client in clients],
+        }
+
+    def _thread(self, target, *args, name=None):
+        thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def _close_listeners(self):
+        for listener in self.listeners.values():
+            listener.close()
+
+    def _accept(self, listener, websocket):
+        while not self.stop_event.is_set():
+            try:
+                connection, address = listener.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            threading.Thread(
+                target=self._connect, args=(connection, address, websocket), name="dmm-server-client", daemon=True
+            ).start()
+
+    def _connect(self, connection, address, websocket):
+        device = None
+        if websocket:
+            try:
+                device = _websocket_handshake(connection)
+            except (OSError, ReadingServerException) as e:
+                logger.debug("WebSocket handshake with {} failed: {}".format(address, e))
+                connection.close()
+                return
+        client = _Client(self, connection, address, websocket=websocket, device=device)
+        with self.lock:
+            if self.stop_event.is_set():
+                connection.close()
+                return
+            self.clients.add(client)
+        logger.debug("Client connected: {}".format(client))
+        client.run()
+
+    def _disconnect(self, client):
+        with self.lock:
+            self.clients.discard(client)
+        logger.debug("Client disconnected: {}".format(client))
+
+    def _acquire(self, device_id, connect, model):
+        while not self.stop_event.is_set():
+            try:
+                api = DigitalMultimeter(connect=connect, model=model)
+                for reading in api.stream(interval=self.interval):
+                    if self.stop_event.is_set():
+                        return
+                    reading["device"] = device_id
+                    self._broadcast(device_id, _ndjson_format(reading).encode("utf-8"))
+            except Exception as e:
+                logger.warning("Multimeter {} failed, reconnecting: {}".format(device_id, e))
+                self.stop_event.wait(RECONNECT_DELAY)
+
+    def _broadcast(self, device_id, line):
+        with self.lock:
+            clients = list(self.clients)
+            self.readings_broadcast += 1
+        for client in clients:
+            client.offer(device_id, line)
+
+
+class _Client:
+    """
+    A connected client and its bounded queue of encoded readings.
+    """
+
+    def __init__(self, server, connection, address, websocket=False, device=None):
+        self.server = server
+        self.connection = connection
+        self.address = address
+        self.websocket = websocket
+        self.device = device
+        self.queue = queue.Queue(maxsize=server.queue_size)
+        self.readings_sent = 0
+        self.readings_dropped = 0
+
+    def __str__(self):
+        return "{}:{}{}".format(*self.address[:2], " (WebSocket)" if self.websocket else "")
+
+    def offer(self, device_id, line):
+        if self.device is not None and device_id != self.device:
+            return
+        while True:
+            try:
+                self.queue.put_nowait(line)
+                return
+            except queue.Full:
+                # drop the oldest queued reading for the newest
+                try:
+                    self.queue.get_nowait()
+                    self.readings_dropped += 1
+                except queue.Empty:
+                    pass
+
+    def close(self):
+        # unblock a write to a client that has stopped reading
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        while True:
+            try:
+                self.queue.put_nowait(_CLOSE)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def run(self):
+        try:
+            while True:
+                line = self.queue.get()
+                if line is _CLOSE:
+                    return
+                self.connection.sendall(_websocket_frame(line[:-1]) if self.websocket else line)
+                self.readings_sent += 1
+        except OSError as e:
+            logger.debug("Client {} failed: {}".format(self, e))
+        finally:
+            self.connection.close()
+            self.server._disconnect(self)
+
+    def get_stats(self):
+        return {
+            "client": str(self),
+            "device": self.device,
+            "readings_queued": self.queue.qsize(),
+            "readings_sent": self.readings_sent,
+            "readings_dropped": self.readings_dropped,
+        }
+
+
+def _websocket_handshake(connection):
+    """
+    Completes the server side of a WebSocket opening handshake (RFC 6455) and returns the device requested
+    by the `?device=<id>` query, if any.
+    """
+    connection.settimeout(HANDSHAKE_TIMEOUT)
+    request = b""
+    while b"\r\n\r\n" not in request:
+        data = connection.recv(HANDSHAKE_SIZE)
+        if not data or len(request) + len(data) > HANDSHAKE_SIZE:
+            raise ReadingServerException("Incomplete WebSocket handshake request")
+        request += data
+    lines = request.split(b"\r\n\r\n", 1)[0].decode("latin-1").split("\r\n")
+    target = lines[0].split(" ")[1] if len(lines[0].split(" ")) == 3 else "/"
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    key = headers.get("sec-websocket-key")
+    if not key or "websocket" not in headers.get("upgrade", "").lower():
+        connection.sendall(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+        raise ReadingServerException("Not a WebSocket upgrade request")
+    accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode("ascii")).digest()).decode("ascii")
+    connection.sendall(
+        "HTTP/1.1 101 Switching Protocols\r\n"
+        "Upgrade: websocket\r\n"
+        "Connection: Upgrade\r\n"
+        "Sec-WebSocket-Accept: {}\r\n\r\n".format(accept).encode("ascii")
+    )
+    connection.settimeout(None)
+    query = urllib.parse.parse_qs(urllib.parse.urlsplit(target).query)
+    return query.get("device", [None])[0]
+
+
+def _websocket_frame(payload):
+    """
+    Returns an unmasked, unfragmented WebSocket text frame of `payload`.
+    """
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", WEBSOCKET_TEXT, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", WEBSOCKET_TEXT, 126, length)
+    else:
+        header = struct.pack("!BBQ", WEBSOCKET_TEXT, 127, length)
+    return header + payload
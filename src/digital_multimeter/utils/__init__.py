@@ -1 +1,6 @@
+from .aggregate import Aggregator, aggregate
+from .binary_output import read_columns, read_records
 from .cli_output import cli_output
+from .deadband import Deadband, deadband
+from .output_sink import OutputSink, QueuedOutputSink
+from .sqlite_output import SqliteOutputSink
@@ -0,0 +1,156 @@
+import logging
+import math
+import re
+
+from digital_multimeter.exceptions import MultimeterException
+from digital_multimeter.utils.binary_output import FLAG_OVERFLOW, reading_columns
+
+logger = logging.getLogger(__name__)
+
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+DURATION_PATTERN = re.compile(r"^\s*(\d+(?:\.\d*)?|\.\d+)\s*(ms|s|m|h)?\s*$")
+
+
+class AggregateException(MultimeterException):
+    pass
+
+
+def parse_duration(value):
+    """
+    Returns the seconds of a duration such as "500ms", "1s", "5m", "1h" or "2.5"; plain numbers are seconds.
+    """
+    match = DURATION_PATTERN.match(str(value))
+    if not match or float(match.group(1)) <= 0:
+        raise AggregateException("Unable to parse duration: {}".format(value))
+    return float(match.group(1)) * DURATION_UNITS[match.group(2) or "s"]
+
+
+def aggregate(readings, window, step=None):
+    """
+    Returns a generator of the window summary records of an iterable of readings, see `Aggregator`.
+    """
+    aggregator = Aggregator(window, step=step)
+    for reading in readings:
+        yield from aggregator.add(reading)
+    yield from aggregator.close()
+
+
+class Aggregator:
+    """
+    Summarises readings by time window using the reading `time.timestamp`.
+
+    Windows of `window` seconds are aligned to the epoch; tumbling windows follow one another, or with a `step`
+    shorter than the window, sliding windows start every `step` seconds and overlap.  Each window keeps running
+    count, min, max, mean and variance (Welford's method) state for each device, mode and unit seen in it, and
+    is summarised once a reading at or beyond its end arrives, or on `close()`.  Summaries of readings tagged
+    by a `MultimeterGroup` carry the same "device" tag.
+
+    Readings without a finite value, for example an overload, are counted as `invalid_count` rather than
+    included in the statistics.
+    """
+
+    window = None
+    step = None
+
+    windows = None
+
+    def __init__(self, window, step=None):
+        if step is not None and not 0 < step <= window:
+            raise AggregateException("Aggregate step must be greater than zero and no longer than the window")
+        self.window = window
+        self.step = step or window
+        self.windows = {}
+
+    def add(self, data):
+        """
+        Adds a reading and returns the summary records of the windows it closes.
+        """
+        timestamp, _, value, flags, unit, mode = reading_columns(data)
+        summaries = self._close_before(timestamp)
+
+        if flags & FLAG_OVERFLOW or not math.isfinite(value):
+            value = None
+        first = math.floor((timestamp - self.window) / self.step) + 1
+        for index in range(first, math.floor(timestamp / self.step) + 1):
+            key = (index * self.step, data.get("device", ""), mode, unit)
+            statistics = self.windows.get(key)
+            if statistics is None:
+                statistics = self.windows[key] = WindowStatistics()
+            statistics.add(value)
+        return summaries
+
+    def close(self):
+        """
+        Returns the summary records of all open windows.
+        """
+        return self._close_before(math.inf)
+
+    def _close_before(self, timestamp):
+        closed = sorted(key for key in self.windows if key[0] + self.window <= timestamp)
+        return [self._summary(key, self.windows.pop(key)) for key in closed]
+
+    def _summary(self, key, statistics):
+        start, device, mode, unit = key
+        summary = {
+            "window": {
+                "start": start,
+                "end": start + self.window,
+                "duration": self.window,
+                "unit_name": "second",
+                "unit_symbol": "s",
+            },
+            "statistics": statistics.to_dict(),
+            "unit": unit,
+            "mode": mode,
+        }
+        if device:
+            summary["device"] = device
+        return summary
+
+
+class WindowStatistics:
+    """
+    Running statistics of the values in a window, with constant memory.
+    """
+
+    __slots__ = ("count", "invalid_count", "mean", "m2", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.invalid_count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        if value is None:
+            self.invalid_count += 1
+            return
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def to_dict(self):
+        if not self.count:
+            return {
+                "count": 0,
+                "invalid_count": self.invalid_count,
+                "min": None,
+                "max": None,
+                "mean": None,
+                "stddev": None,
+            }
+        return {
+            "count": self.count,
+            "invalid_count": self.invalid_count,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "stddev": math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0,
+        }
@@ -0,0 +1,306 @@
+import abc
+import logging
+import math
+import struct
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+from digital_multimeter.exceptions import MultimeterException
+
+logger = logging.getLogger(__name__)
+
+#
+# Binary output formats
+#
+#  - msgpack: each reading as a msgpack map prefixed by its uint32 little-endian length
+#  - npy:     chunks of readings as numeric columns; per chunk a structured array (COLUMNS_DTYPE) then an
+#             array of the unit and mode labels that its `unit` and `mode` code columns index, both as .npy
+#  - arrow:   chunks of readings as numeric columns in an Arrow IPC stream; one stream per writer session
+#
+# Columnar formats keep the epoch `timestamp`, `value` and `scaled_value` (NaN where the display shows no
+# number), the READING_FLAGS bitfield and the unit and operation-mode of each reading.
+#
+
+BINARY_FORMATS = ("msgpack", "npy", "arrow")
+CHUNK_SIZE = 1024
+
+MSGPACK_LENGTH_STRUCT = struct.Struct("<I")
+NPY_MAGIC = b"\x93NUMPY"
+
+FLAG_HOLD = 0b0001
+FLAG_RELATIVE = 0b0010
+FLAG_LOW_BATTERY = 0b0100
+FLAG_OVERFLOW = 0b1000
+
+# VC870 active_flags names to READING_FLAGS bits
+READING_FLAGS = {
+    "hold": FLAG_HOLD,
+    "rel": FLAG_RELATIVE,
+    "battery": FLAG_LOW_BATTERY,
+    "overflow": FLAG_OVERFLOW,
+    "open": FLAG_OVERFLOW,
+}
+
+
+class BinaryOutputException(MultimeterException):
+    pass
+
+
+def binary_writer(format, file, chunk_size=CHUNK_SIZE):
+    """
+    Returns the writer for the binary `format` on the binary `file` object.
+    """
+    if format == "msgpack":
+        return MsgpackRecordWriter(file)
+    if format == "npy":
+        return NpyChunkWriter(file, chunk_size=chunk_size)
+    if format == "arrow":
+        return ArrowChunkWriter(file, chunk_size=chunk_size)
+    raise BinaryOutputException("Unsupported binary output format", format)
+
+
+class MsgpackRecordWriter:
+    file = None
+
+    def __init__(self, file):
+        if msgpack is None:
+            raise BinaryOutputException("msgpack output requires the msgpack package to be installed")
+        self.file = file
+        self._packer = msgpack.Packer()
+
+    def write(self, data):
+        record = self._packer.pack(data)
+        self.file.write(MSGPACK_LENGTH_STRUCT.pack(len(record)) + record)
+
+    def close(self):
+        pass
+
+
+class ColumnChunkWriter(abc.ABC):
+    """
+    Buffers readings as columns and writes them a chunk of `chunk_size` readings at a time, and on close.
+    """
+
+    file = None
+    chunk_size = None
+
+    def __init__(self, file, chunk_size=CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.rows = []
+
+    def write(self, data):
+        self.rows.append(reading_columns(data))
+        if len(self.rows) >= self.chunk_size:
+            self.write_chunk()
+
+    def write_chunk(self):
+        if self.rows:
+            self._write_chunk(self.rows)
+            self.rows = []
+
+    def close(self):
+        self.write_chunk()
+
+    @abc.abstractmethod
+    def _write_chunk(self, rows):
+        """
+        Writes a chunk from a list of `reading_columns()` tuples.
+        """
+
+
+class NpyChunkWriter(ColumnChunkWriter):
+    def __init__(self, file, chunk_size=CHUNK_SIZE):
+        if numpy is None:
+            raise BinaryOutputException("npy output requires the numpy package to be installed")
+        super().__init__(file, chunk_size=chunk_size)
+
+    def _write_chunk(self, rows):
+        labels = {}
+        chunk = numpy.empty(len(rows), dtype=COLUMNS_DTYPE)
+        timestamp, value, scaled_value, flags, unit, mode = zip(*rows)
+        chunk["timestamp"] = timestamp
+        chunk["value"] = value
+        chunk["scaled_value"] = scaled_value
+        chunk["flags"] = flags
+        chunk["unit"] = [labels.setdefault(label, len(labels)) for label in unit]
+        chunk["mode"] = [labels.setdefault(label, len(labels)) for label in mode]
+        numpy.save(self.file, chunk, allow_pickle=False)
+        numpy.save(self.file, numpy.array(list(labels), dtype=str), allow_pickle=False)
+
+
+class ArrowChunkWriter(ColumnChunkWriter):
+    def __init__(self, file, chunk_size=CHUNK_SIZE):
+        if pyarrow is None:
+            raise BinaryOutputException("arrow output requires the pyarrow package to be installed")
+        super().__init__(file, chunk_size=chunk_size)
+        self._writer = None
+
+    def _write_chunk(self, rows):
+        timestamp, value, scaled_value, flags, unit, mode = zip(*rows)
+        batch = pyarrow.record_batch(
+            [
+                pyarrow.array(timestamp, type=pyarrow.float64()),
+                pyarrow.array(value, type=pyarrow.float64()),
+                pyarrow.array(scaled_value, type=pyarrow.float64()),
+                pyarrow.array(flags, type=pyarrow.uint8()),
+                pyarrow.array(unit, type=pyarrow.string()).dictionary_encode(),
+                pyarrow.array(mode, type=pyarrow.string()).dictionary_encode(),
+            ],
+            names=COLUMNS,
+        )
+        if self._writer is None:
+            self._writer = pyarrow.ipc.new_stream(self.file, batch.schema)
+        self._writer.write_batch(batch)
+
+    def close(self):
+        super().close()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def reading_columns(data):
+    """
+    Returns the (timestamp, value, scaled_value, flags, unit, mode) columns of a reading dict.
+    """
+    reading = data["reading"]
+    if "flags" in reading:
+        # a `FleetCollector` reading, already in columns
+        value, scaled_value = reading["value"], reading["scaled_value"]
+        return (
+            data["time"]["timestamp"],
+            math.nan if value is None else value,
+            math.nan if scaled_value is None else scaled_value,
+            reading["flags"],
+            reading["unit"],
+            reading["mode"],
+        )
+    instrument = data["instrument"]
+    value = reading["value"]
+    if value is None:
+        value = math.nan
+    scaled_value = reading.get("scaled_value", value)
+    if scaled_value is None:
+        scaled_value = math.nan
+
+    if "active_flags" in instrument:
+        flags = 0
+        for flag in instrument["active_flags"].split("|"):
+            flags |= READING_FLAGS.get(flag, 0)
+        return data["time"]["timestamp"], value, scaled_value, flags, reading["unit"], reading["operation_mode"]
+
+    flags = FLAG_HOLD if instrument["is_hold"] else 0
+    if reading["is_relative"]:
+        flags |= FLAG_RELATIVE
+    if instrument["low_battery"]:
+        flags |= FLAG_LOW_BATTERY
+    return (
+        data["time"]["timestamp"],
+        value,
+        scaled_value,
+        flags,
+        reading["unit_name"],
+        instrument["operation_mode"],
+    )
+
+
+def read_records(filename):
+    """
+    Returns a generator of the reading dicts in a msgpack output file; a truncated final record ends the
+    iteration.
+    """
+    if msgpack is None:
+        raise BinaryOutputException("msgpack input requires the msgpack package to be installed")
+    with open(filename, "rb") as file:
+        data = file.read()
+    offset, size = 0, len(data)
+    while offset + MSGPACK_LENGTH_STRUCT.size <= size:
+        (length,) = MSGPACK_LENGTH_STRUCT.unpack_from(data, offset)
+        offset += MSGPACK_LENGTH_STRUCT.size
+        if offset + length > size:
+            return
+        yield msgpack.unpackb(data[offset : offset + length])
+        offset += length
+
+
+def read_columns(filename):
+    """
+    Loads a whole npy or arrow output file as a dict of NumPy column arrays; `timestamp`, `value`,
+    `scaled_value`, `flags`, `unit` and `mode`.
+    """
+    if numpy is None:
+        raise BinaryOutputException("Reading columns requires the numpy package to be installed")
+    with open(filename, "rb") as file:
+        magic = file.read(len(NPY_MAGIC))
+        file.seek(0)
+        if magic == NPY_MAGIC:
+            return _read_npy_columns(file)
+        return _read_arrow_columns(file)
+
+
+def _read_npy_columns(file):
+    chunks, units, modes = [], [], []
+    while file.read(1):
+        file.seek(-1, 1)
+        chunk = numpy.load(file, allow_pickle=False)
+        labels = numpy.load(file, allow_pickle=False)
+        chunks.append(chunk)
+        units.append(labels[chunk["unit"]])
+        modes.append(labels[chunk["mode"]])
+    chunk = numpy.concatenate(chunks)
+    columns = {name: chunk[name] for name in COLUMNS if name not in ("unit", "mode")}
+    columns["unit"] = numpy.concatenate(units)
+    columns["mode"] = numpy.concatenate(modes)
+    return columns
+
+
+def _read_arrow_columns(file):
+    if pyarrow is None:
+        raise BinaryOutputException("Reading arrow columns requires the pyarrow package to be installed")
+    tables = []
+    while True:
+        # one Arrow IPC stream per writer session appended to the file
+        try:
+            reader = pyarrow.ipc.open_stream(file)
+        except pyarrow.ArrowInvalid:
+            break
+        tables.append(reader.read_all())
+    if not tables:
+        raise BinaryOutputException("File is not an npy or arrow output file", file.name)
+    columns = {}
+    for name in COLUMNS:
+        column = pyarrow.chunked_array([chunk for table in tables for chunk in table.column(name).chunks])
+        if name in ("unit", "mode"):
+            column = column.cast(pyarrow.string())
+        columns[name] = column.to_numpy()
+    return columns
+
+
+COLUMNS = ("timestamp", "value", "scaled_value", "flags", "unit", "mode")
+
+if numpy is not None:
+    COLUMNS_DTYPE = numpy.dtype(
+        [
+            ("timestamp", numpy.float64),
+            ("value", numpy.float64),
+            ("scaled_value", numpy.float64),
+            ("flags", numpy.uint8),
+            ("unit", numpy.uint8),
+            ("mode", numpy.uint8),
+        ]
+    )
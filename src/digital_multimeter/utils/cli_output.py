@@ -1,16 +1,22 @@
+import itertools
 import json
+import operator
 import sys
 
 from digital_multimeter.exceptions import MultimeterException
 
+TEXT_FORMATS = ("json", "csv", "ndjson")
+
 
 def cli_output(data, format="json", output="stdout", count=0):
     if format.lower() == "json":
         out = _json_format(data)
     elif format.lower() == "csv":
         out = _csv_format(data, delimiter="_", row=count)
+    elif format.lower() == "ndjson":
+        out = _ndjson_format(data)
     else:
-        raise MultimeterException("Unsupported output format, permitted formats; json, csv")
+        raise MultimeterException(UNSUPPORTED_FORMAT_MESSAGE.format(", ".join(TEXT_FORMATS)))
 
     if output.lower() == "stdout":
         print(out, file=sys.stdout, flush=True, end="")
@@ -29,35 +35,137 @@ def _json_format(data, indent="  "):
     return "{}\n".format(json.dumps(data, indent=indent))
 
 
+def _ndjson_format(data):
+    # one compact object per line; floats are written with their shortest round-trip repr as for json
+    return _NDJSON_ENCODER.encode(data) + "\n"
+
+
 def _csv_format(data, delimiter=".", row=0):
-    flat_data = __flatten_data(data=data, delimiter=delimiter)
-    output = ""
+    plan = _csv_plan(data, delimiter=delimiter)
     if row == 0:
-        output = "{}{}".format(output, __csv_row(list(flat_data.keys())))
-    output = "{}{}".format(output, __csv_row(list(flat_data.values())))
-    return output
+        return plan.header + plan.format_row(data)
+    return plan.format_row(data)
+
+
+def _csv_plan(data, delimiter="."):
+    """
+    Returns the compiled CsvPlan for the schema of `data`; plans are compiled once per schema and delimiter.
+    """
+    key = (_csv_shape(data), delimiter)
+    plan = _CSV_PLANS.get(key)
+    if plan is None:
+        if len(_CSV_PLANS) >= CSV_PLAN_CACHE_SIZE:
+            _CSV_PLANS.clear()
+        plan = _CSV_PLANS[key] = CsvPlan(data, delimiter=delimiter)
+    return plan
+
+
+class CsvPlan:
+    """
+    A flat column accessor plan compiled from the nested structure of a reading.
+
+    The column names are the delimiter joined key paths of the leaf values, as previously produced by
+    flattening each reading; rows are then built by the compiled accessors alone, one `operator.itemgetter`
+    per nested dict, without walking the structure or formatting keys again.
+    """
 
+    header = None
+    columns = None
 
-def __csv_row(list_items, char="", end="\n"):
-    return char + "{char},{char}".format(char=char).join(str(x) for x in list_items) + char + end
+    def __init__(self, data, delimiter="."):
+        paths = _csv_paths(data)
+        self.columns = [delimiter.join(str(key) for key in path) for path in paths]
+        self.header = _csv_row(self.columns)
+        self._accessor = _csv_accessor(paths)
+        # str() of every value joined by commas, as a single format operation
+        self._row_format = ",".join(["%s"] * len(paths)) + "\n"
 
+    def values(self, data):
+        values = []
+        self._accessor(data, values)
+        return values
 
-def __flatten_data(data, parent_key="", delimiter="."):
-    items = []
+    def format_row(self, data):
+        values = []
+        self._accessor(data, values)
+        return self._row_format % tuple(values)
+
+
+def _csv_row(list_items, end="\n"):
+    return ",".join(map(str, list_items)) + end
+
+
+def _csv_shape(data):
+    # the keys of the top level and of each nested container; a cheap schema signature evaluated per reading
+    if type(data) is dict:
+        return tuple(data), tuple(map(_csv_shape_child, data.values()))
     if type(data) is list:
-        for list_index, value in enumerate(data):
-            new_key = "{}{}{}".format(parent_key, delimiter, str(list_index)) if parent_key else str(list_index)
-            if type(value) in (str, int, float, bool):
-                items.append((new_key, value))
-            else:
-                items.extend(__flatten_data(value, new_key, delimiter=delimiter).items())
+        return len(data), tuple(map(_csv_shape_child, data))
+    raise MultimeterException("Unsupported data type encountered while attempting to compile csv columns")
+
+
+def _csv_shape_child(value):
+    if type(value) is dict:
+        return tuple(value)
+    if type(value) is list:
+        return len(value)
+    return None
+
+
+def _csv_paths(data, parent=()):
+    paths = []
+    if type(data) is list:
+        items = enumerate(data)
     elif type(data) is dict:
-        for key, value in data.items():
-            new_key = "{}{}{}".format(parent_key, delimiter, key) if parent_key else key
-            if type(value) in (str, int, float, bool) or value is None:
-                items.append((new_key, value))
-            else:
-                items.extend(__flatten_data(value, new_key, delimiter=delimiter).items())
+        items = data.items()
     else:
-        raise MultimeterException("Unsupported data type encountered while attempting to __flatten_data()")
-    return dict(items)
+        raise MultimeterException("Unsupported data type encountered while attempting to compile csv columns")
+    for key, value in items:
+        if type(value) in (dict, list):
+            paths.extend(_csv_paths(value, parent + (key,)))
+        else:
+            paths.append(parent + (key,))
+    return paths
+
+
+def _csv_accessor(paths):
+    # returns a function that appends the values at `paths` to a row; consecutive paths sharing a first key are
+    # grouped so each nested container is looked up once and its leaf values taken by a single itemgetter
+    steps = []
+    for key, group in itertools.groupby(paths, key=lambda path: path[0]):
+        group = list(group)
+        if len(group[0]) == 1:
+            if steps and steps[-1][0] is None:
+                steps[-1][1].append(key)
+            else:
+                steps.append((None, [key]))
+        else:
+            steps.append((key, _csv_accessor([path[1:] for path in group])))
+
+    compiled = []
+    for key, step in steps:
+        if key is None:
+            # leaf values of this container; itemgetter of a single key returns the value rather than a tuple
+            getter = operator.itemgetter(*step)
+            compiled.append((None, getter, len(step) == 1))
+        else:
+            compiled.append((key, step, False))
+
+    def accessor(data, row):
+        for key, step, single in compiled:
+            if key is None:
+                if single:
+                    row.append(step(data))
+                else:
+                    row.extend(step(data))
+            else:
+                step(data[key], row)
+
+    return accessor
+
+
+UNSUPPORTED_FORMAT_MESSAGE = "Unsupported output format, permitted formats; {}"
+_NDJSON_ENCODER = json.JSONEncoder(separators=(",", ":"))
+
+CSV_PLAN_CACHE_SIZE = 64
+_CSV_PLANS = {}
@@ -0,0 +1,94 @@
+import logging
+import math
+
+from digital_multimeter.exceptions import MultimeterException
+from digital_multimeter.utils.binary_output import reading_columns
+
+logger = logging.getLogger(__name__)
+
+
+class DeadbandException(MultimeterException):
+    pass
+
+
+def parse_deadband(value):
+    """
+    Returns the (absolute, relative) thresholds of a deadband such as "0.001", an absolute change in the reading
+    value, or "0.5%", a change relative to the previously emitted value.
+    """
+    text = str(value).strip()
+    try:
+        if text.endswith("%"):
+            threshold = float(text[:-1]) / 100
+            if threshold >= 0:
+                return None, threshold
+        else:
+            threshold = float(text)
+            if threshold >= 0:
+                return threshold, None
+    except ValueError:
+        pass
+    raise DeadbandException("Unable to parse deadband: {}".format(value))
+
+
+def deadband(readings, absolute=None, relative=None, heartbeat=None):
+    """
+    Returns a generator of the readings of an iterable that pass a `Deadband` filter.
+    """
+    band = Deadband(absolute=absolute, relative=relative, heartbeat=heartbeat)
+    return (reading for reading in readings if band.accept(reading))
+
+
+class Deadband:
+    """
+    Filters a stream of readings down to those that change.
+
+    A reading is emitted when its value (`scaled_value`, or the VC870 `value`) differs from the previously
+    emitted value by more than the `absolute` threshold, or by more than the `relative` fraction of the
+    previously emitted value, or when the mode, unit or flags change, or when the value becomes or stops being
+    a number.  With a `heartbeat` of seconds, a reading is also emitted once that long has passed since the
+    previously emitted reading, by the reading `time.timestamp`, so an unchanging meter is not mistaken for
+    a stopped one.  Readings tagged by a `MultimeterGroup` are compared with the previous reading of their own
+    device.
+    """
+
+    absolute = None
+    relative = None
+    heartbeat = None
+
+    emitted = None
+    count = 0
+    suppressed = 0
+
+    def __init__(self, absolute=None, relative=None, heartbeat=None):
+        self.absolute = absolute or 0.0
+        self.relative = relative
+        self.heartbeat = heartbeat
+        self.emitted = {}
+
+    def accept(self, data):
+        """
+        Returns True when the reading should be emitted.
+        """
+        timestamp, _, value, flags, unit, mode = reading_columns(data)
+        self.count += 1
+        device = data.get("device")
+        emitted = self.emitted.get(device)
+        if emitted is not None and not self._changed(emitted, timestamp, value, flags, unit, mode):
+            self.suppressed += 1
+            return False
+        self.emitted[device] = (timestamp, value, flags, unit, mode)
+        return True
+
+    def _changed(self, emitted, timestamp, value, flags, unit, mode):
+        emitted_timestamp, emitted_value, emitted_flags, emitted_unit, emitted_mode = emitted
+        if (flags, unit, mode) != (emitted_flags, emitted_unit, emitted_mode):
+            return True
+        if self.heartbeat is not None and timestamp - emitted_timestamp >= self.heartbeat:
+            return True
+        if not (math.isfinite(value) and math.isfinite(emitted_value)):
+            return value != emitted_value and not (math.isnan(value) and math.isnan(emitted_value))
+        threshold = self.absolute
+        if self.relative is not None:
+            threshold = max(threshold, self.relative * abs(emitted_value))
+        return abs(value - emitted_value) > threshold
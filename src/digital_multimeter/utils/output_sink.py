@@ -0,0 +1,441 @@
+import datetime
+import gzip
+import logging
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+
+from digital_multimeter.exceptions import MultimeterException
+from digital_multimeter.utils.binary_output import BINARY_FORMATS, CHUNK_SIZE, binary_writer
+from digital_multimeter.utils.cli_output import (
+    TEXT_FORMATS,
+    UNSUPPORTED_FORMAT_MESSAGE,
+    _csv_plan,
+    _json_format,
+    _ndjson_format,
+)
+
+OUTPUT_FORMATS = TEXT_FORMATS + BINARY_FORMATS
+
+QUEUE_SIZE = 1024
+OVERFLOW_POLICIES = ("block", "drop-oldest", "drop-newest")
+STATS_LOG_INTERVAL = 10
+ROTATE_BOUNDARIES = ("minute", "hour", "day")
+
+# QueuedOutputSink writer and SegmentCompressor thread shutdown marker
+_CLOSE = object()
+
+logger = logging.getLogger(__name__)
+
+
+class OutputSink:
+    """
+    Writes a stream of readings to stdout, stderr or a file in one of the text formats json, csv or ndjson,
+    or the binary formats msgpack, npy or arrow, see `binary_output`.
+
+    Unlike `cli_output()`, which opens and closes the output file for every reading, the output is opened once
+    for the lifetime of the sink and flushed according to its flush policy; after every `flush_count` readings
+    (0 to disable), once `flush_interval` seconds have passed since the previous flush (checked as each reading
+    is written) and always on `close()`.  With `fsync=True` each flush of a file output is also fsync'd to
+    the storage device.  With `batch_size` greater than 1, formatted readings are gathered and written with a
+    single write call per batch, or sooner when flushed.
+
+    The columnar npy and arrow formats write a chunk every `chunk_size` readings, and on close; the flush
+    policy applies to the chunks written so far.
+
+    CSV output writes a header row ahead of the first reading and again whenever the reading schema changes,
+    for example when the multimeter is switched to a mode that reports different fields.
+
+    File output can be rotated into segments once a segment reaches `rotate_size` bytes (characters for the
+    text formats), `rotate_age` seconds or crosses a `rotate_at` wall-clock boundary (minute, hour or day).
+    The output filename is then a template formatted for each segment with the fields `timestamp` (the
+    segment start as a datetime), `model` and `segment` (a sequence number); an output without fields gets
+    "-{timestamp:%Y%m%dT%H%M%S}" ahead of its extension.  Each segment is a complete file in its own right,
+    with a CSV header and a new chunk or stream for the columnar formats.  With `compress=True` closed
+    segments are gzip compressed by a background thread.
+
+    The sink is a context manager; use `with OutputSink(...) as sink:` so buffered readings are flushed when
+    the command exits, including by exception or SystemExit.
+    """
+
+    output = None
+    format = None
+    flush_count = None
+    flush_interval = None
+    fsync = False
+    batch_size = None
+    chunk_size = None
+    model = None
+    rotate_size = None
+    rotate_age = None
+    rotate_at = None
+    compress = False
+
+    file = None
+    filename = None
+    is_file = False
+    batch = None
+    binary_writer = None
+    compressor = None
+    count = 0
+    pending = 0
+    flushed_at = None
+    csv_plan = None
+    segment = 0
+    segment_size = 0
+    segment_opened_at = None
+    segment_boundary = None
+
+    def __init__(
+        self,
+        output="stdout",
+        format="json",
+        flush_count=1,
+        flush_interval=None,
+        fsync=False,
+        batch_size=1,
+        chunk_size=CHUNK_SIZE,
+        model=None,
+        rotate_size=None,
+        rotate_age=None,
+        rotate_at=None,
+        compress=False,
+    ):
+        self.output = output
+        self.format = format.lower()
+        if self.format not in OUTPUT_FORMATS:
+            raise MultimeterException(UNSUPPORTED_FORMAT_MESSAGE.format(", ".join(OUTPUT_FORMATS)))
+        if rotate_at is not None and rotate_at not in ROTATE_BOUNDARIES:
+            raise MultimeterException(
+                "Unsupported rotation boundary, permitted boundaries; {}".format(", ".join(ROTATE_BOUNDARIES))
+            )
+        self.flush_count = flush_count
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.model = model
+        self.rotate_size = rotate_size
+        self.rotate_age = rotate_age
+        self.rotate_at = rotate_at
+        self.compress = compress
+        self.batch = []
+
+        is_binary = self.format in BINARY_FORMATS
+        if output.lower() == "stdout":
+            self.file = sys.stdout.buffer if is_binary else sys.stdout
+        elif output.lower() == "stderr":
+            self.file = sys.stderr.buffer if is_binary else sys.stderr
+        else:
+            self.is_file = True
+        if (self.is_rotating or compress) and not self.is_file:
+            raise MultimeterException("Output rotation and compression require a file output")
+        if compress and not self.is_rotating:
+            raise MultimeterException("Output compression requires output rotation")
+        if compress:
+            self.compressor = SegmentCompressor()
+        self._open()
+        self.flushed_at = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def is_rotating(self):
+        return bool(self.rotate_size or self.rotate_age or self.rotate_at)
+
+    def write(self, data):
+        if self.is_rotating and self._rotation_due():
+            self.rotate()
+        if self.binary_writer:
+            self.binary_writer.write(data)
+            if self.rotate_size:
+                self.segment_size = self.file.tell()
+            self._written()
+            return
+        if self.format == "ndjson":
+            out = _ndjson_format(data)
+        elif self.format == "json":
+            out = _json_format(data)
+        else:
+            plan = _csv_plan(data, delimiter="_")
+            if plan is self.csv_plan:
+                out = plan.format_row(data)
+            elif self.csv_plan is not None and plan.columns == self.csv_plan.columns:
+                self.csv_plan = plan
+                out = plan.format_row(data)
+            else:
+                if self.csv_plan is not None:
+                    logger.debug("Reading schema changed, writing a new csv header")
+                self.csv_plan = plan
+                out = plan.header + plan.format_row(data)
+        if self.batch_size > 1:
+            self.batch.append(out)
+            if len(self.batch) >= self.batch_size:
+                self._write_batch()
+        else:
+            self.file.write(out)
+        self.segment_size += len(out)
+        self._written()
+
+    def _written(self):
+        self.count += 1
+        self.pending += 1
+
+        if self.flush_count and self.pending >= self.flush_count:
+            self.flush()
+        elif self.flush_interval is not None and time.monotonic() - self.flushed_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if not self.file:
+            return
+        if self.batch:
+            self._write_batch()
+        self.file.flush()
+        if self.fsync and self.is_file:
+            os.fsync(self.file.fileno())
+        self.pending = 0
+        self.flushed_at = time.monotonic()
+
+    def rotate(self):
+        """
+        Closes the current segment, queueing it for compression if enabled, and opens the next.
+        """
+        self._close_file()
+        self.segment += 1
+        self._open()
+
+    def close(self):
+        if not self.file:
+            return
+        self._close_file()
+        if self.compressor:
+            self.compressor.close()
+
+    def _open(self):
+        if self.is_file:
+            self.filename = self._segment_filename() if self.is_rotating else self.output
+            try:
+                self.file = open(self.filename, "ab" if self.format in BINARY_FORMATS else "a")
+            except Exception as e:
+                raise MultimeterException(e)
+            logger.debug("Output file opened for append: {}".format(self.filename))
+        if self.format in BINARY_FORMATS:
+            try:
+                self.binary_writer = binary_writer(self.format, self.file, chunk_size=self.chunk_size)
+            except MultimeterException:
+                self.close()
+                raise
+        self.csv_plan = None
+        self.segment_size = 0
+        self.segment_opened_at = time.monotonic()
+        if self.rotate_at:
+            self.segment_boundary = _next_boundary(datetime.datetime.now(), self.rotate_at).timestamp()
+
+    def _close_file(self):
+        if self.binary_writer:
+            self.binary_writer.close()
+            self.binary_writer = None
+        self.flush()
+        if self.is_file:
+            self.file.close()
+            if self.compressor:
+                self.compressor.compress(self.filename)
+        self.file = None
+
+    def _rotation_due(self):
+        if self.rotate_size and self.segment_size >= self.rotate_size:
+            return True
+        if self.rotate_age and time.monotonic() - self.segment_opened_at >= self.rotate_age:
+            return True
+        if self.rotate_at and time.time() >= self.segment_boundary:
+            return True
+        return False
+
+    def _segment_filename(self):
+        template = self.output
+        if "{" not in template:
+            root, extension = os.path.splitext(template)
+            template = root + "-{timestamp:%Y%m%dT%H%M%S}" + extension
+        filename = template.format(timestamp=datetime.datetime.now(), model=self.model, segment=self.segment)
+        if self.segment and (os.path.exists(filename) or os.path.exists(filename + ".gz")):
+            # a segment opened within the timestamp resolution of the template gets its sequence number
+            root, extension = os.path.splitext(filename)
+            filename = "{}.{}{}".format(root, self.segment, extension)
+        return filename
+
+    def _write_batch(self):
+        self.file.write("".join(self.batch))
+        self.batch.clear()
+
+
+class SegmentCompressor:
+    """
+    Gzip compresses closed output segments on a background thread, removing each original once compressed.
+    """
+
+    queue = None
+    thread = None
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._compressor, name="dmm-output-compressor", daemon=True)
+        self.thread.start()
+
+    def compress(self, filename):
+        self.queue.put(filename)
+
+    def close(self):
+        """
+        Waits for the queued segments to be compressed.
+        """
+        if not self.thread:
+            return
+        self.queue.put(_CLOSE)
+        self.thread.join()
+        self.thread = None
+
+    def _compressor(self):
+        while True:
+            filename = self.queue.get()
+            if filename is _CLOSE:
+                return
+            try:
+                with open(filename, "rb") as source, gzip.open(filename + ".gz", "ab") as target:
+                    shutil.copyfileobj(source, target)
+                os.remove(filename)
+                logger.debug("Output segment compressed: {}.gz".format(filename))
+            except OSError as e:
+                logger.warning("Unable to compress output segment {}: {}".format(filename, e))
+
+
+def _next_boundary(now, rotate_at):
+    if rotate_at == "minute":
+        return now.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+    if rotate_at == "hour":
+        return now.replace(minute=0, second=0, microsecond=0) + datetime.timedelta(hours=1)
+    return now.replace(hour=0, minute=0, second=0, microsecond=0) + datetime.timedelta(days=1)
+
+
+class QueuedOutputSink:
+    """
+    Decouples reading acquisition from output; readings are passed to `sink` by a dedicated writer thread
+    through a bounded queue of `queue_size` readings, so a slow pipe or a stalled disk does not hold up
+    the multimeter interface.
+
+    When the queue is full the `overflow` policy applies; "block" waits for the writer, "drop-oldest"
+    discards the oldest queued reading in favour of the new one and "drop-newest" discards the new reading.
+    Queue depth and drop counters are available from `get_stats()` and logged at debug level every
+    `STATS_LOG_INTERVAL` seconds and on close.  An exception in the writer thread stops the writer, readings
+    still queued are discarded and the exception is raised by every later call to `write()` or `close()`.
+    """
+
+    sink = None
+    overflow = None
+    queue = None
+    thread = None
+    error = None
+    stats_logged_at = None
+
+    readings_queued = 0
+    readings_written = 0
+    readings_dropped = 0
+    queue_depth_max = 0
+
+    def __init__(self, sink, queue_size=QUEUE_SIZE, overflow="block"):
+        if overflow not in OVERFLOW_POLICIES:
+            raise MultimeterException(
+                "Unsupported queue overflow policy, permitted policies; {}".format(", ".join(OVERFLOW_POLICIES))
+            )
+        self.sink = sink
+        self.overflow = overflow
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stats_logged_at = time.monotonic()
+        self.thread = threading.Thread(target=self._writer, name="dmm-output-writer", daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, data):
+        self._raise_writer_error()
+        if self.overflow == "block":
+            self.queue.put(data)
+        elif self.overflow == "drop-newest":
+            try:
+                self.queue.put_nowait(data)
+            except queue.Full:
+                self.readings_dropped += 1
+                return
+        else:
+            while True:
+                try:
+                    self.queue.put_nowait(data)
+                    break
+                except queue.Full:
+                    try:
+                        self.queue.get_nowait()
+                        self.readings_dropped += 1
+                    except queue.Empty:
+                        pass
+        self.readings_queued += 1
+        self.queue_depth_max = max(self.queue_depth_max, self.queue.qsize())
+
+    def close(self):
+        if not self.thread:
+            self._raise_writer_error()
+            return
+        if not self.error:
+            self.queue.put(_CLOSE)
+        self.thread.join()
+        self.thread = None
+        self._log_stats()
+        self.sink.close()
+        self._raise_writer_error()
+
+    def get_stats(self):
+        return {
+            "queue_depth": self.queue.qsize(),
+            "queue_depth_max": self.queue_depth_max,
+            "readings_queued": self.readings_queued,
+            "readings_written": self.readings_written,
+            "readings_dropped": self.readings_dropped,
+        }
+
+    def _writer(self):
+        while True:
+            data = self.queue.get()
+            if data is _CLOSE:
+                return
+            try:
+                self.sink.write(data)
+                self.readings_written += 1
+            except Exception as e:
+                logger.debug("Output writer thread failed: {}".format(e))
+                self.error = e
+                # stop writing to the failed sink; discard the queue so a blocked producer is released
+                while True:
+                    try:
+                        self.queue.get_nowait()
+                    except queue.Empty:
+                        return
+            if time.monotonic() - self.stats_logged_at >= STATS_LOG_INTERVAL:
+                self._log_stats()
+
+    def _log_stats(self):
+        self.stats_logged_at = time.monotonic()
+        logger.debug("Output queue stats: {}".format(self.get_stats()))
+
+    def _raise_writer_error(self):
+        if self.error:
+            raise MultimeterException("Output writer failed: {}".format(self.error))
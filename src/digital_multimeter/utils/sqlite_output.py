@@ -0,0 +1,130 @@
+import logging
+import math
+import sqlite3
+import time
+
+from digital_multimeter.exceptions import MultimeterException
+from digital_multimeter.utils.binary_output import reading_columns
+
+logger = logging.getLogger(__name__)
+
+#
+# SQLite output
+#
+# Readings are stored as rows of the `readings` table, the `binary_output` reading columns with the device
+# that took them; `value` and `scaled_value` are NULL where the display shows no number.
+#
+
+SQLITE_BATCH_SIZE = 500
+SQLITE_BATCH_INTERVAL = 0.25
+
+SQLITE_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS readings ("
+    "timestamp REAL NOT NULL, "
+    "device TEXT NOT NULL, "
+    "value REAL, "
+    "scaled_value REAL, "
+    "flags INTEGER NOT NULL, "
+    "unit TEXT NOT NULL, "
+    "mode TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS readings_timestamp ON readings (timestamp)",
+    "CREATE INDEX IF NOT EXISTS readings_device_timestamp ON readings (device, timestamp)",
+)
+SQLITE_INSERT = (
+    "INSERT INTO readings (timestamp, device, value, scaled_value, flags, unit, mode) VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+class SqliteOutputSink:
+    """
+    Writes a stream of readings to the `readings` table of a SQLite database file, creating it if required.
+
+    The `device` column is the "device" tag of readings from a `MultimeterGroup`, otherwise `device`.
+
+    The database is opened in WAL mode, so it can be queried while readings are logged, and several sinks,
+    for example one per multimeter, can log into the same file.  Rows are inserted with a single `executemany`
+    and committed as one transaction every `batch_size` readings, once `batch_interval` seconds have passed
+    since the previous commit (checked as each reading is written) and always on `close()`.
+
+    The sink is a context manager with the same interface as `OutputSink`.
+    """
+
+    output = None
+    device = None
+    batch_size = None
+    batch_interval = None
+
+    connection = None
+    batch = None
+    count = 0
+    committed_at = None
+
+    def __init__(self, output, device="", batch_size=SQLITE_BATCH_SIZE, batch_interval=SQLITE_BATCH_INTERVAL):
+        if output.lower() in ("stdout", "stderr"):
+            raise MultimeterException("sqlite output requires a database file output")
+        self.output = output
+        self.device = device
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.batch = []
+
+        try:
+            self.connection = sqlite3.connect(output, isolation_level=None, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            for statement in SQLITE_SCHEMA:
+                self.connection.execute(statement)
+        except sqlite3.Error as e:
+            raise MultimeterException(e)
+        logger.debug("Output database opened: {}".format(output))
+        self.committed_at = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, data):
+        timestamp, value, scaled_value, flags, unit, mode = reading_columns(data)
+        self.batch.append(
+            (
+                timestamp,
+                data.get("device", self.device),
+                None if math.isnan(value) else value,
+                None if math.isnan(scaled_value) else scaled_value,
+                flags,
+                unit,
+                mode,
+            )
+        )
+        self.count += 1
+
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+        elif self.batch_interval is not None and time.monotonic() - self.committed_at >= self.batch_interval:
+            self.flush()
+
+    def flush(self):
+        if not self.connection:
+            return
+        if self.batch:
+            try:
+                self.connection.execute("BEGIN")
+                self.connection.executemany(SQLITE_INSERT, self.batch)
+                self.connection.execute("COMMIT")
+            except sqlite3.Error as e:
+                if self.connection.in_transaction:
+                    self.connection.execute("ROLLBACK")
+                raise MultimeterException("Unable to write readings to {}: {}".format(self.output, e))
+            self.batch.clear()
+        self.committed_at = time.monotonic()
+
+    def close(self):
+        if not self.connection:
+            return
+        try:
+            self.flush()
+        finally:
+            self.connection.close()
+            self.connection = None
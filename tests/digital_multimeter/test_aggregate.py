@@ -0,0 +1,118 @@
+import json
+import math
+import statistics
+
+import pytest
+from click.testing import CliRunner
+
+from digital_multimeter.cli import click
+from digital_multimeter.main import DigitalMultimeter
+from digital_multimeter.multimeters.MultimeterFortuneFS9721 import MultimeterFortuneFS9721
+from digital_multimeter.multimeters.MultimeterVC870USBHID import MultimeterVC870USBHID
+from digital_multimeter.utils import Aggregator, aggregate
+from digital_multimeter.utils.aggregate import AggregateException, parse_duration
+
+FRAME_VOLTAGE_DC = bytes.fromhex("162035435e677e8995a0b8c0d4e0")
+FRAME_VOLTAGE_AC = bytes.fromhex("1a2f3d4d5b617f879da0b0c1d5e0")
+FRAME_RESISTANCE_OVERLOAD = bytes.fromhex("122030475d6e788090a2b0c4d0e0")
+
+
+def reading(frame, seconds):
+    dmm = MultimeterFortuneFS9721(connect=None)
+    return dmm.parse_packet(frame, int(seconds * 1e9))
+
+
+def test_parse_duration():
+    assert parse_duration("500ms") == 0.5
+    assert parse_duration("1s") == parse_duration("1") == 1
+    assert parse_duration("5m") == 300
+    assert parse_duration("1.5h") == 5400
+    for value in ("0s", "1d", "s", "-1"):
+        with pytest.raises(AggregateException):
+            parse_duration(value)
+
+
+def test_aggregate_tumbling():
+    readings = [reading(FRAME_VOLTAGE_DC, 100.1 + index * 0.25) for index in range(8)]
+    readings.insert(3, reading(FRAME_VOLTAGE_AC, 100.8))
+    readings.insert(4, reading(FRAME_RESISTANCE_OVERLOAD, 100.85))
+    summaries = list(aggregate(readings, 1))
+
+    assert [(summary["window"]["start"], summary["mode"]) for summary in summaries] == [
+        (100, "resistance"),
+        (100, "voltage_ac"),
+        (100, "voltage_dc"),
+        (101, "voltage_dc"),
+    ]
+    assert summaries[0]["statistics"] == {
+        "count": 0,
+        "invalid_count": 1,
+        "min": None,
+        "max": None,
+        "mean": None,
+        "stddev": None,
+    }
+    dc = summaries[2]["statistics"]
+    assert dc["count"] == 4 and dc["invalid_count"] == 0
+    assert dc["mean"] == pytest.approx(0.1567)
+    assert dc["stddev"] == pytest.approx(0, abs=1e-12)
+    assert summaries[3]["window"] == {
+        "start": 101,
+        "end": 102,
+        "duration": 1,
+        "unit_name": "second",
+        "unit_symbol": "s",
+    }
+    assert summaries[3]["statistics"]["count"] == 4
+
+
+def test_aggregate_welford():
+    values = [0.125, 1.5, -3.25, 7.0, 2.5]
+    aggregator = Aggregator(10)
+    summaries = []
+    for index, value in enumerate(values + [math.inf]):
+        data = MultimeterVC870USBHID(connect=None).parse_packet(b"000123450000000000000", int((index + 1) * 1e9))
+        data["reading"]["value"] = value
+        summaries.extend(aggregator.add(data))
+    assert summaries == []
+    (summary,) = aggregator.close()
+    assert summary["unit"] == "V" and summary["mode"] == "DCV"
+    assert summary["statistics"]["count"] == 5 and summary["statistics"]["invalid_count"] == 1
+    assert summary["statistics"]["mean"] == pytest.approx(statistics.mean(values))
+    assert summary["statistics"]["stddev"] == pytest.approx(statistics.stdev(values))
+    assert (summary["statistics"]["min"], summary["statistics"]["max"]) == (-3.25, 7.0)
+
+
+def test_aggregate_sliding():
+    readings = [reading(FRAME_VOLTAGE_DC, 10 + index) for index in range(4)]
+    summaries = list(aggregate(readings, 2, step=1))
+    assert [(summary["window"]["start"], summary["statistics"]["count"]) for summary in summaries] == [
+        (9, 1),
+        (10, 2),
+        (11, 2),
+        (12, 2),
+        (13, 1),
+    ]
+    with pytest.raises(AggregateException):
+        Aggregator(1, step=2)
+
+
+def test_read_aggregate(monkeypatch):
+    timestamps = iter(range(20))
+    monkeypatch.setattr(
+        DigitalMultimeter,
+        "get_reading",
+        lambda self, **kwargs: reading(FRAME_VOLTAGE_DC, 1000 + next(timestamps) * 0.1),
+    )
+    runner = CliRunner()
+    result = runner.invoke(
+        click.get_reading, ["--connect", "/dev/null", "-n", "20", "-f", "ndjson", "--aggregate", "1s"]
+    )
+    assert result.exit_code == 0
+    lines = [json.loads(line) for line in result.output.splitlines()]
+    assert [line["statistics"]["count"] for line in lines] == [10, 10]
+
+    result = runner.invoke(click.get_reading, ["--connect", "/dev/null", "-f", "npy", "--aggregate", "1s"])
+    assert result.exit_code != 0
+    result = runner.invoke(click.get_reading, ["--connect", "/dev/null", "--aggregate", "1x"])
+    assert "Unable to parse duration" in result.output
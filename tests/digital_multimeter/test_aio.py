@@ -0,0 +1,134 @@
+import asyncio
+import errno
+import os
+import time
+
+import pytest
+import usb.core
+
+from digital_multimeter.aio import AsyncDigitalMultimeter
+from digital_multimeter.exceptions import MultimeterException
+from digital_multimeter.multimeters.MultimeterVC870USBHID import MultimeterVC870USBHID
+
+FRAME_VOLTAGE_DC = bytes.fromhex("162035435e677e8995a0b8c0d4e0")
+FRAME_VOLTAGE_AC = bytes.fromhex("1a2f3d4d5b617f879da0b0c1d5e0")
+PACKET_DCV = b"000123450000000000000"
+PACKET_ACA = b"811001230000000000100"
+
+
+@pytest.fixture
+def pty():
+    master, slave = os.openpty()
+    yield master, os.ttyname(slave)
+    os.close(master)
+    os.close(slave)
+
+
+def test_stream_serial(pty):
+    master, port = pty
+
+    async def main():
+        async with AsyncDigitalMultimeter(connect=port) as dmm:
+            os.write(master, FRAME_VOLTAGE_DC[5:] + FRAME_VOLTAGE_DC + FRAME_VOLTAGE_AC[:7])
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.05, os.write, master, FRAME_VOLTAGE_AC[7:])
+            readings = [reading async for reading in dmm.stream(count=2)]
+            assert dmm.readings is None
+        return readings
+
+    readings = asyncio.run(asyncio.wait_for(main(), 5))
+    assert [reading["instrument"]["operation_mode"] for reading in readings] == ["voltage_dc", "voltage_ac"]
+    assert readings[0]["time"]["timestamp"] < readings[1]["time"]["timestamp"]
+
+
+def test_stream_serial_backpressure(pty):
+    master, port = pty
+
+    async def main():
+        dmm = AsyncDigitalMultimeter(connect=port, queue_size=2)
+        dmm.start()
+        os.write(master, FRAME_VOLTAGE_DC * 5)
+        while not dmm.paused:
+            await asyncio.sleep(0.01)
+        assert dmm.readings.qsize() == 2
+        readings = [reading async for reading in dmm.stream(count=5)]
+        assert dmm.get_stats()["frames_received"] == 5
+        return readings
+
+    assert len(asyncio.run(asyncio.wait_for(main(), 5))) == 5
+
+
+def test_stream_cancellation(pty):
+    master, port = pty
+
+    async def main():
+        dmm = AsyncDigitalMultimeter(connect=port)
+
+        async def consume():
+            async for _ in dmm.stream():
+                pass
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.05)
+        assert dmm.fileno is not None
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert dmm.readings is None and dmm.fileno is None
+
+    asyncio.run(asyncio.wait_for(main(), 5))
+
+
+class FakeDevice:
+    def __init__(self, data, fail=False):
+        self.reports = [[0xF0 | len(data[i : i + 7])] + list(data[i : i + 7]) for i in range(0, len(data), 7)]
+        self.fail = fail
+
+    def read(self, address, size, timeout=None):
+        if not self.reports:
+            time.sleep(timeout / 1000)
+            if self.fail:
+                raise usb.core.USBError("No such device", errno=errno.ENODEV)
+            raise usb.core.USBError("Operation timed out", errno=errno.ETIMEDOUT)
+        return self.reports.pop(0)
+
+
+class FakeEndpoint:
+    bEndpointAddress = 0x82
+    wMaxPacketSize = 8
+
+
+class FakeMultimeterVC870USBHID(MultimeterVC870USBHID):
+    def interface_close(self):
+        self.stream_stop()
+
+
+def fake_vc870(data, fail=False):
+    dmm = AsyncDigitalMultimeter(connect="1a86:e008", model="Voltcraft_VC870")
+    dmm.api.multimeter = FakeMultimeterVC870USBHID(connect=None)
+    dmm.api.multimeter.dev = FakeDevice(data, fail=fail)
+    dmm.api.multimeter.ep = FakeEndpoint()
+    return dmm
+
+
+def test_stream_hid_shared_reader():
+    async def main():
+        first = fake_vc870((PACKET_DCV + b"\r\n") * 3)
+        second = fake_vc870(b"12\r\n" + (PACKET_ACA + b"\r\n") * 3)
+
+        async def modes(dmm):
+            return [reading["reading"]["operation_mode"] async for reading in dmm.stream(count=3)]
+
+        return await asyncio.gather(modes(first), modes(second))
+
+    assert asyncio.run(asyncio.wait_for(main(), 5)) == [["DCV"] * 3, ["ACA"] * 3]
+
+
+def test_stream_hid_error():
+    async def main():
+        dmm = fake_vc870(PACKET_DCV + b"\r\n", fail=True)
+        assert (await dmm.get_reading())["reading"]["operation_mode"] == "DCV"
+        with pytest.raises(MultimeterException, match="USB HID reader failed"):
+            await dmm.get_reading()
+
+    asyncio.run(asyncio.wait_for(main(), 5))
@@ -0,0 +1,94 @@
+import math
+
+import pytest
+
+from digital_multimeter.multimeters.MultimeterFortuneFS9721 import MultimeterFortuneFS9721
+from digital_multimeter.multimeters.MultimeterVC870USBHID import MultimeterVC870USBHID
+from digital_multimeter.utils import OutputSink, read_columns, read_records
+from digital_multimeter.utils.binary_output import (
+    FLAG_HOLD,
+    FLAG_LOW_BATTERY,
+    FLAG_OVERFLOW,
+    BinaryOutputException,
+    reading_columns,
+)
+
+FRAME_VOLTAGE_DC = bytes.fromhex("162035435e677e8995a0b8c0d4e0")
+FRAME_VOLTAGE_AC = bytes.fromhex("1a2f3d4d5b617f879da0b0c1d5e0")
+FRAME_RESISTANCE_OVERLOAD = bytes.fromhex("122030475d6e788090a2b0c4d0e0")
+
+
+def readings(count):
+    dmm = MultimeterFortuneFS9721(connect=None)
+    frames = [FRAME_VOLTAGE_DC, FRAME_VOLTAGE_AC, FRAME_RESISTANCE_OVERLOAD]
+    return [dmm.parse_packet(frames[index % len(frames)]) for index in range(count)]
+
+
+def test_reading_columns():
+    dc, ac, overload = readings(3)
+    assert reading_columns(dc) == (
+        dc["time"]["timestamp"],
+        156.70000000000002,
+        0.15670000000000003,
+        0,
+        "volts",
+        "voltage_dc",
+    )
+    assert reading_columns(ac)[3:] == (FLAG_HOLD | FLAG_LOW_BATTERY, "volts", "voltage_ac")
+    assert math.isnan(reading_columns(overload)[1]) and math.isnan(reading_columns(overload)[2])
+
+    vc870 = MultimeterVC870USBHID(connect=None).parse_packet(b"811001230000000001000")
+    assert reading_columns(vc870)[1:] == (1.23, 1.23, FLAG_HOLD, "A", "ACA")
+    vc870 = MultimeterVC870USBHID(connect=None).parse_packet(b"000123450000000100000")
+    assert reading_columns(vc870)[1] == math.inf
+    assert reading_columns(vc870)[3] == FLAG_OVERFLOW
+
+
+def test_msgpack_roundtrip(tmp_path):
+    pytest.importorskip("msgpack")
+    output = str(tmp_path / "readings.msgpack")
+    for _ in range(2):
+        with OutputSink(output=output, format="msgpack") as sink:
+            for reading in readings(3):
+                sink.write(reading)
+    with open(output, "ab") as file:
+        file.write(b"\x40\x00\x00\x00\x81")
+    records = list(read_records(output))
+    assert len(records) == 6
+    assert records[0]["reading"] == readings(1)[0]["reading"]
+    assert records[2]["reading"]["value"] is None
+
+
+@pytest.mark.parametrize("format", ["npy", "arrow"])
+def test_columns_roundtrip(tmp_path, format):
+    numpy = pytest.importorskip("numpy")
+    if format == "arrow":
+        pytest.importorskip("pyarrow")
+    output = str(tmp_path / "readings.{}".format(format))
+    expected = readings(10) + readings(5)
+    with OutputSink(output=output, format=format, chunk_size=4) as sink:
+        for reading in expected[:10]:
+            sink.write(reading)
+    # a second session appended to the same file
+    with OutputSink(output=output, format=format, chunk_size=4) as sink:
+        for reading in expected[10:]:
+            sink.write(reading)
+
+    columns = read_columns(output)
+    assert set(columns) == {"timestamp", "value", "scaled_value", "flags", "unit", "mode"}
+    assert len(columns["value"]) == 15
+    rows = [reading_columns(reading) for reading in expected]
+    assert columns["timestamp"].tolist() == [row[0] for row in rows]
+    numpy.testing.assert_array_equal(columns["value"], [row[1] for row in rows])
+    numpy.testing.assert_array_equal(columns["scaled_value"], [row[2] for row in rows])
+    assert columns["flags"].tolist() == [row[3] for row in rows]
+    assert columns["unit"].tolist() == [row[4] for row in rows]
+    assert columns["mode"].tolist() == [row[5] for row in rows]
+
+
+def test_read_columns_not_columnar(tmp_path):
+    pytest.importorskip("pyarrow")
+    output = tmp_path / "readings.csv"
+    output.write_text("reading_value\n")
+    with pytest.raises(BinaryOutputException):
+        read_columns(str(output))
@@ -0,0 +1,135 @@
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from digital_multimeter.capture import CaptureException, CaptureReader, CaptureWriter
+from digital_multimeter.cli import click
+from digital_multimeter.main import DigitalMultimeter
+from digital_multimeter.multimeters.MultimeterFortuneFS9721 import MultimeterFortuneFS9721, decode
+
+FRAME_VOLTAGE_DC = bytes.fromhex("162035435e677e8995a0b8c0d4e0")
+FRAME_FREQUENCY = bytes.fromhex("122035475d677d879da0b0c0d2e0")
+
+
+class FakeSerial:
+    def __init__(self, data=b""):
+        self.data = bytearray(data)
+
+    @property
+    def in_waiting(self):
+        return len(self.data)
+
+    def read(self, size=1):
+        chunk = bytes(self.data[:size])
+        del self.data[:size]
+        return chunk
+
+    def close(self):
+        pass
+
+
+def test_capture_roundtrip(tmp_path):
+    filename = str(tmp_path / "capture.dmm")
+    with CaptureWriter(filename, model="Default") as capture:
+        capture.write(FRAME_VOLTAGE_DC, timestamp_monotonic=1000)
+        capture.write(FRAME_FREQUENCY, timestamp_monotonic=2000)
+    with CaptureWriter(filename, model="Editronic_EDI9604") as capture:
+        capture.write(b"+1234 2\x10\x00\x00\x80\x00\r\n")
+
+    frames = list(CaptureReader(filename))
+    assert [(model, frame) for model, _, frame in frames] == [
+        ("Default", FRAME_VOLTAGE_DC),
+        ("Default", FRAME_FREQUENCY),
+        ("Editronic_EDI9604", b"+1234 2\x10\x00\x00\x80\x00\r\n"),
+    ]
+    assert frames[1][1] - frames[0][1] == 1000
+
+
+def test_capture_truncated(tmp_path):
+    filename = str(tmp_path / "capture.dmm")
+    with CaptureWriter(filename, model="Default") as capture:
+        capture.write(FRAME_VOLTAGE_DC)
+        capture.write(FRAME_FREQUENCY)
+    with open(filename, "r+b") as file:
+        file.truncate(file.seek(0, 2) - 3)
+    assert [frame for _, _, frame in CaptureReader(filename)] == [FRAME_VOLTAGE_DC]
+
+
+def test_capture_not_a_capture_file(tmp_path):
+    filename = tmp_path / "data.csv"
+    filename.write_text("reading_value\n")
+    with pytest.raises(CaptureException):
+        CaptureWriter(str(filename), model="Default")
+    with pytest.raises(CaptureException):
+        list(CaptureReader(str(filename)))
+
+
+def test_record_and_replay(tmp_path):
+    filename = str(tmp_path / "capture.dmm")
+    api = DigitalMultimeter(connect="/dev/null", model="Tecpel_DMM8062")
+    api.multimeter = MultimeterFortuneFS9721(connect=None)
+    api.multimeter.serial = FakeSerial(FRAME_VOLTAGE_DC + FRAME_FREQUENCY + FRAME_VOLTAGE_DC)
+    api.record(filename, count=3)
+
+    readings = list(DigitalMultimeter().replay(filename))
+    assert len(readings) == 3
+    assert readings[0]["reading"] == decode(FRAME_VOLTAGE_DC)["reading"]
+    assert readings[1]["instrument"] == decode(FRAME_FREQUENCY)["instrument"]
+    assert readings[0]["time"]["elapsed"] == 0
+    assert readings[2]["time"]["timestamp"] >= readings[1]["time"]["timestamp"]
+
+    runner = CliRunner()
+    result = runner.invoke(click.replay, ["--input", filename, "--format", "csv"])
+    assert result.exit_code == 0
+    assert result.output.splitlines()[0].startswith("reading_value,reading_unit_name")
+    assert len(result.output.splitlines()) == 4
+
+    result = runner.invoke(click.replay, ["--input", filename])
+    reading, _ = json.JSONDecoder().raw_decode(result.output)
+    assert reading["reading"]["unit_name"] == "volts"
+
+
+def test_capture_time_range(tmp_path):
+    filename = str(tmp_path / "capture.dmm")
+    with CaptureWriter(filename, model="Default") as capture:
+        for index in range(100):
+            capture.write(FRAME_VOLTAGE_DC if index % 2 else FRAME_FREQUENCY, timestamp_monotonic=index * 1000)
+    with CaptureWriter(filename, model="Editronic_EDI9604") as capture:
+        capture.write(b"+1234 2\x10\x00\x00\x80\x00\r\n")
+
+    reader = CaptureReader(filename, index_interval=8)
+    frames = list(reader)
+    since, until = frames[37][1], frames[52][1]
+    assert list(reader.frames(since=since, until=until)) == frames[37:53]
+    assert list(reader.frames(since=frames[-1][1])) == frames[-1:]
+    assert list(reader.frames(until=frames[3][1])) == frames[:4]
+    assert len(reader.index()) == 13
+    assert (tmp_path / "capture.dmm.idx").exists()
+
+    # the cached sidecar index is loaded and extended when the capture grows
+    with CaptureWriter(filename, model="Default") as capture:
+        capture.write(FRAME_VOLTAGE_DC)
+    reader = CaptureReader(filename, index_interval=8)
+    assert list(reader.frames(since=since, until=until)) == frames[37:53]
+    assert reader.frames(since=since).__next__() == frames[37]
+    assert len(list(reader.frames(since=since))) == 65
+    assert len(reader.index()) == 13
+
+
+def test_replay_since_until(tmp_path):
+    filename = str(tmp_path / "capture.dmm")
+    with CaptureWriter(filename, model="Default") as capture:
+        for index in range(10):
+            capture.write(FRAME_VOLTAGE_DC, timestamp_monotonic=index * 1000000000)
+    timestamps = [timestamp for _, timestamp, _ in CaptureReader(filename)]
+
+    readings = list(DigitalMultimeter().replay(filename, since=timestamps[2] / 1e9, until=timestamps[5] / 1e9))
+    assert len(readings) == 4
+
+    runner = CliRunner()
+    result = runner.invoke(click.replay, ["--input", filename, "-f", "csv", "--since", str(timestamps[7] / 1e9)])
+    assert result.exit_code == 0
+    assert len(result.output.splitlines()) == 4
+    result = runner.invoke(click.replay, ["--input", filename, "--until", "not-a-time"])
+    assert result.exit_code != 0
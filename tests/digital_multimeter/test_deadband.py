@@ -0,0 +1,68 @@
+import math
+
+import pytest
+from click.testing import CliRunner
+
+from digital_multimeter.cli import click
+from digital_multimeter.main import DigitalMultimeter
+from digital_multimeter.multimeters.MultimeterVC870USBHID import MultimeterVC870USBHID
+from digital_multimeter.utils import Deadband, deadband
+from digital_multimeter.utils.deadband import DeadbandException, parse_deadband
+
+
+def reading(value, seconds=0, packet=b"000123450000000000000"):
+    data = MultimeterVC870USBHID(connect=None).parse_packet(packet, int(seconds * 1e9))
+    data["reading"]["value"] = value
+    return data
+
+
+def test_parse_deadband():
+    assert parse_deadband("0.001") == (0.001, None)
+    assert parse_deadband(" 0.5% ") == (None, 0.005)
+    for value in ("-1", "x%", "", "%"):
+        with pytest.raises(DeadbandException):
+            parse_deadband(value)
+
+
+def test_deadband_absolute():
+    values = [1.0, 1.0005, 1.0009, 1.002, 1.0015, 0.9, math.inf, math.inf, 0.9]
+    emitted = [data["reading"]["value"] for data in deadband([reading(value) for value in values], absolute=0.001)]
+    assert emitted == [1.0, 1.002, 0.9, math.inf, 0.9]
+
+
+def test_deadband_relative_heartbeat():
+    band = Deadband(relative=0.01, heartbeat=10)
+    accepted = [
+        band.accept(reading(100.0, 0)),
+        band.accept(reading(100.9, 1)),
+        band.accept(reading(101.1, 2)),
+        band.accept(reading(101.1, 11)),
+        band.accept(reading(101.1, 12)),
+    ]
+    assert accepted == [True, False, True, False, True]
+    assert (band.count, band.suppressed) == (5, 2)
+
+
+def test_deadband_mode_and_flags():
+    band = Deadband(absolute=1)
+    assert band.accept(reading(1.0))
+    assert not band.accept(reading(1.0))
+    assert band.accept(reading(1.0, packet=b"811001230000000000000"))
+    assert band.accept(reading(1.0, packet=b"811001230000000001000"))
+    assert not band.accept(reading(1.5, packet=b"811001230000000001000"))
+
+
+def test_read_deadband(monkeypatch):
+    values = iter([1.0, 1.0, 1.0, 2.0, 2.0])
+    monkeypatch.setattr(DigitalMultimeter, "get_reading", lambda self, **kwargs: reading(next(values)))
+    runner = CliRunner()
+    result = runner.invoke(
+        click.get_reading, ["--connect", "/dev/null", "-n", "5", "-f", "ndjson", "--deadband", "0.1"]
+    )
+    assert result.exit_code == 0
+    assert len(result.output.splitlines()) == 2
+
+    result = runner.invoke(click.get_reading, ["--connect", "/dev/null", "--heartbeat", "1s"])
+    assert "--heartbeat requires --deadband" in result.output
+    result = runner.invoke(click.get_reading, ["--connect", "/dev/null", "--deadband", "1", "--aggregate", "1s"])
+    assert "can not be combined" in result.output
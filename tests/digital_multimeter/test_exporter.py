@@ -0,0 +1,141 @@
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from digital_multimeter import exporter as exporter_module
+from digital_multimeter.exceptions import MultimeterException
+from digital_multimeter.exporter import MetricsExporter, MetricsExporterException
+from digital_multimeter.multimeters.MultimeterFortuneFS9721 import (
+    MultimeterFortuneFS9721,
+    MultimeterFortuneFS9721Exception,
+)
+
+FRAME_VOLTAGE_DC = bytes.fromhex("162035435e677e8995a0b8c0d4e0")
+FRAME_VOLTAGE_AC = bytes.fromhex("1a2f3d4d5b617f879da0b0c1d5e0")
+
+
+class FakeDigitalMultimeter:
+    """
+    Delivers the `script` of frames, timestamped 0.3 seconds apart, and exceptions, then blocks; each
+    instance is a connection and counts a resync per frame.
+    """
+
+    script = []
+    connections = 0
+
+    def __init__(self, connect=None, model="Default"):
+        self.multimeter = MultimeterFortuneFS9721(connect=None)
+        self.resyncs = 0
+        FakeDigitalMultimeter.connections += 1
+
+    def get_reading(self):
+        if not FakeDigitalMultimeter.script:
+            threading.Event().wait()
+        item = FakeDigitalMultimeter.script.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        self.resyncs += 1
+        return self.multimeter.parse_packet(item, timestamp=self.multimeter.timestamp_previous + int(0.3e9))
+
+    def get_stats(self):
+        return {"resyncs": self.resyncs, "bytes_discarded": 0}
+
+
+@pytest.fixture
+def export(monkeypatch):
+    monkeypatch.setattr(exporter_module, "DigitalMultimeter", FakeDigitalMultimeter)
+    monkeypatch.setattr(exporter_module, "RECONNECT_DELAY", 0.01)
+    FakeDigitalMultimeter.connections = 0
+    exporters = []
+
+    def start(script):
+        FakeDigitalMultimeter.script = list(script)
+        exporter = MetricsExporter([{"connect": "/dev/ttyUSB0", "device": "bench"}], port=0)
+        exporter.start()
+        exporters.append(exporter)
+        deadline = time.monotonic() + 5
+        while FakeDigitalMultimeter.script and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        return exporter
+
+    yield start
+    for exporter in exporters:
+        exporter.stop()
+
+
+def scrape(exporter):
+    with urllib.request.urlopen("http://{}:{}/metrics".format(*exporter.address)) as response:
+        assert response.headers["Content-Type"] == exporter_module.CONTENT_TYPE
+        return response.read().decode("utf-8")
+
+
+def test_exporter_metrics(export):
+    exporter = export([FRAME_VOLTAGE_DC, FRAME_VOLTAGE_DC, FRAME_VOLTAGE_DC, FRAME_VOLTAGE_AC])
+    metrics = scrape(exporter)
+    assert "# TYPE dmm_reading_value gauge\n" in metrics
+    assert 'dmm_reading_value{device="bench",unit="volts",mode="voltage_ac",model="Default"} -0.23\n' in metrics
+    assert 'dmm_up{device="bench"} 1\n' in metrics
+    assert 'dmm_readings_total{device="bench"} 4\n' in metrics
+    assert 'dmm_read_rate_hertz{device="bench"} 0.4\n' in metrics
+    assert 'dmm_flag{device="bench",flag="hold"} 1\n' in metrics
+    assert 'dmm_flag{device="bench",flag="low_battery"} 1\n' in metrics
+    assert 'dmm_flag{device="bench",flag="overflow"} 0\n' in metrics
+    assert 'dmm_resyncs_total{device="bench"} 4\n' in metrics
+    assert "# TYPE dmm_frame_interval_seconds histogram\n" in metrics
+    assert 'dmm_frame_interval_seconds_bucket{device="bench",le="0.25"} 0\n' in metrics
+    assert 'dmm_frame_interval_seconds_bucket{device="bench",le="0.5"} 3\n' in metrics
+    assert 'dmm_frame_interval_seconds_bucket{device="bench",le="+Inf"} 3\n' in metrics
+    assert 'dmm_frame_interval_seconds_count{device="bench"} 3\n' in metrics
+
+
+def test_exporter_errors(export):
+    exporter = export(
+        [
+            FRAME_VOLTAGE_DC,
+            MultimeterFortuneFS9721Exception("Unknown digit"),
+            FRAME_VOLTAGE_DC,
+            MultimeterException("No such device"),
+            FRAME_VOLTAGE_DC,
+        ]
+    )
+    metrics = scrape(exporter)
+    assert FakeDigitalMultimeter.connections == 2
+    assert 'dmm_parse_errors_total{device="bench",error="MultimeterFortuneFS9721Exception"} 1\n' in metrics
+    assert 'dmm_connection_errors_total{device="bench"} 1\n' in metrics
+    # resync counts carry on across connections
+    assert 'dmm_resyncs_total{device="bench"} 3\n' in metrics
+    assert 'dmm_readings_total{device="bench"} 3\n' in metrics
+
+
+def test_exporter_parse_error_limit(export):
+    errors = [MultimeterFortuneFS9721Exception("No bytes received from the serial interface")] * 3
+    exporter = export([FRAME_VOLTAGE_DC] + errors)
+    metrics = scrape(exporter)
+    assert FakeDigitalMultimeter.connections == 2
+    assert 'dmm_connection_errors_total{device="bench"} 1\n' in metrics
+    assert 'dmm_up{device="bench"} 0\n' in metrics
+
+
+def test_exporter_not_found(export):
+    exporter = export([])
+    with pytest.raises(urllib.error.HTTPError, match="404"):
+        urllib.request.urlopen("http://{}:{}/".format(*exporter.address))
+    with pytest.raises(MetricsExporterException, match="unique"):
+        MetricsExporter([{"connect": "/dev/ttyUSB0"}, {"connect": "/dev/ttyUSB0"}])
+
+
+def test_exporter_read_times_bounded(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(exporter_module.time, "monotonic", lambda: clock[0])
+    metrics = exporter_module._DeviceMetrics("Default")
+    multimeter = MultimeterFortuneFS9721(connect=None)
+    for _ in range(1000):
+        clock[0] += 0.1
+        metrics.update(multimeter.parse_packet(FRAME_VOLTAGE_DC), {}, first=True)
+    # only the reads within the rate window are kept, without any scrape
+    assert len(metrics.read_times) == pytest.approx(exporter_module.RATE_WINDOW / 0.1, abs=1)
+    assert metrics.readings == 1000
@@ -0,0 +1,121 @@
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from digital_multimeter.cli import click
+from digital_multimeter.exceptions import MultimeterException
+from digital_multimeter.fleet import FleetCollector, _ring_read
+
+FRAME_VOLTAGE_DC = bytes.fromhex("162035435e677e8995a0b8c0d4e0")
+
+
+@pytest.fixture
+def ptys():
+    """
+    Serial ports fed a FS9721 frame every 10ms.
+    """
+    masters, ports = [], []
+    for _ in range(3):
+        master, slave = os.openpty()
+        os.set_blocking(master, False)
+        masters.append(master)
+        ports.append(os.ttyname(slave))
+    stop = threading.Event()
+
+    def feed():
+        while not stop.wait(0.01):
+            for master in masters:
+                try:
+                    os.write(master, FRAME_VOLTAGE_DC)
+                except BlockingIOError:
+                    pass
+
+    thread = threading.Thread(target=feed, daemon=True)
+    thread.start()
+    yield ports
+    stop.set()
+    thread.join()
+
+
+def test_fleet_readings(ptys):
+    devices = [{"connect": ptys[0], "device": "bench"}, {"connect": ptys[1]}, {"connect": ptys[2]}]
+    with FleetCollector(devices, workers=2) as fleet:
+        assert [stats["devices"] for stats in fleet.get_stats()] == [["bench", ptys[2]], [ptys[1]]]
+        readings = list(fleet.get_readings(count=60))
+        rings = fleet.rings
+    assert fleet.processes is None
+    assert {reading["device"] for reading in readings} == {"bench", ptys[1], ptys[2]}
+    assert readings[0]["reading"] == {
+        "value": pytest.approx(156.7),
+        "scaled_value": pytest.approx(0.1567),
+        "flags": 0,
+        "unit": "volts",
+        "mode": "voltage_dc",
+    }
+    # the rings are released on stop
+    with pytest.raises(FileNotFoundError):
+        type(rings[0])(name=rings[0].name)
+
+
+def test_fleet_restarts_worker(ptys):
+    with FleetCollector([{"connect": ptys[0]}, {"connect": ptys[1]}], workers=2) as fleet:
+        list(fleet.get_readings(count=10))
+        time.sleep(1)
+        fleet.processes[0].kill()
+        readings = list(fleet.get_readings(count=300))
+        assert [stats["restarts"] for stats in fleet.get_stats()] == [1, 0]
+        assert fleet.processes[0].is_alive()
+    assert {reading["device"] for reading in readings[-20:]} == {ptys[0], ptys[1]}
+
+
+def test_fleet_restarts_hung_worker(ptys):
+    # a serial port that is never written hangs its reader
+    master, slave = os.openpty()
+    hung = os.ttyname(slave)
+    try:
+        with FleetCollector([{"connect": ptys[0]}, {"connect": hung}], workers=1, heartbeat_timeout=1) as fleet:
+            deadline = time.monotonic() + 10
+            for reading in fleet.get_readings():
+                if fleet.get_stats()[0]["restarts"] or time.monotonic() > deadline:
+                    break
+            assert fleet.get_stats()[0]["restarts"] > 0
+            assert reading["device"] == ptys[0]
+    finally:
+        os.close(master)
+        os.close(slave)
+
+
+def test_fleet_ring_overflow(ptys):
+    with FleetCollector([{"connect": ptys[0]}], ring_size=4) as fleet:
+        time.sleep(1.5)
+        stats = fleet.get_stats()[0]
+        assert stats["records_queued"] == 4
+        assert stats["records_dropped"] > 0
+        assert len(_ring_read(fleet.rings[0], 4)) == 4
+        assert fleet.get_stats()[0]["records_queued"] == 0
+
+
+def test_fleet_errors():
+    with pytest.raises(MultimeterException, match="unique"):
+        FleetCollector([{"connect": "/dev/ttyUSB0"}, {"connect": "/dev/ttyUSB0"}])
+    assert FleetCollector([{"connect": "/dev/ttyUSB0"}, {"connect": "/dev/ttyUSB1"}], workers=8).workers == 2
+
+
+def test_read_workers(ptys, tmp_path):
+    output = str(tmp_path / "readings.db")
+    args = ["read", "-c", ptys[0], "-c", ptys[1], "--workers", "2", "-n", "10"]
+    result = CliRunner().invoke(click.dmm, args + ["-f", "sqlite", "-o", output])
+    assert result.exit_code == 0, result.output
+    rows = sqlite3.connect(output).execute("SELECT device, unit, mode FROM readings").fetchall()
+    assert len(rows) == 10
+    assert {row[0] for row in rows} <= {ptys[0], ptys[1]}
+    assert {row[1:] for row in rows} == {("volts", "voltage_dc")}
+
+    # the readings of worker processes lack the instrument and time details of a json reading
+    result = CliRunner().invoke(click.dmm, args + ["-f", "ndjson"])
+    assert result.exit_code != 0
+    assert "--workers readings can only be output as npy/arrow/sqlite" in result.output
@@ -0,0 +1,108 @@
+import json
+import threading
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from digital_multimeter.cli import click
+from digital_multimeter.cli.config import Config
+from digital_multimeter.exceptions import MultimeterException
+from digital_multimeter.group import MultimeterGroup
+from digital_multimeter.main import DigitalMultimeter
+from digital_multimeter.multimeters.MultimeterFortuneFS9721 import MultimeterFortuneFS9721
+
+FRAME_VOLTAGE_DC = bytes.fromhex("162035435e677e8995a0b8c0d4e0")
+
+
+class FakeMeters:
+    """
+    Readings at a per-connect period from a per-connect start, 1000 seconds by default, delivered after a
+    per-connect delay.
+    """
+
+    def __init__(self, periods, delays=None, fail=None, starts=None):
+        self.periods = periods
+        self.delays = delays or {}
+        self.starts = starts or {}
+        self.fail = fail
+        self.counts = {connect: 0 for connect in periods}
+        self.lock = threading.Lock()
+
+    def get_reading(self, api):
+        with self.lock:
+            index = self.counts[api.connect]
+            self.counts[api.connect] += 1
+        if api.connect == self.fail and index == 2:
+            raise MultimeterException("No bytes received from the serial interface")
+        time.sleep(self.delays.get(api.connect, 0))
+        timestamp = int((self.starts.get(api.connect, 1000) + index * self.periods[api.connect]) * 1e9)
+        return MultimeterFortuneFS9721(connect=None).parse_packet(FRAME_VOLTAGE_DC, timestamp)
+
+
+@pytest.fixture
+def meters(monkeypatch):
+    def install(*args, **kwargs):
+        fake = FakeMeters(*args, **kwargs)
+        monkeypatch.setattr(DigitalMultimeter, "get_reading", lambda self, **kwargs: fake.get_reading(self))
+        return fake
+
+    return install
+
+
+def test_group_merges_by_timestamp(meters):
+    meters({"/dev/ttyUSB0": 0.3, "/dev/ttyUSB1": 0.5, "/dev/ttyUSB2": 0.7}, delays={"/dev/ttyUSB1": 0.002})
+    devices = [{"connect": "/dev/ttyUSB0"}, {"connect": "/dev/ttyUSB1", "device": "bench"}, {"connect": "/dev/ttyUSB2"}]
+    with MultimeterGroup(devices) as group:
+        readings = list(group.get_readings(count=30))
+    timestamps = [reading["time"]["timestamp"] for reading in readings]
+    assert timestamps == sorted(timestamps)
+    assert {reading["device"] for reading in readings} == {"/dev/ttyUSB0", "bench", "/dev/ttyUSB2"}
+    assert not group.threads
+
+
+def test_group_stalled_device(meters):
+    meters({"/dev/ttyUSB0": 1, "/dev/ttyUSB1": 1}, delays={"/dev/ttyUSB1": 10})
+    with MultimeterGroup([{"connect": "/dev/ttyUSB0"}, {"connect": "/dev/ttyUSB1"}], merge_delay=0.05) as group:
+        readings = list(group.get_readings(count=3))
+    assert [reading["device"] for reading in readings] == ["/dev/ttyUSB0"] * 3
+
+
+def test_group_errors(meters):
+    meters({"/dev/ttyUSB0": 1, "/dev/ttyUSB1": 1}, fail="/dev/ttyUSB1")
+    with MultimeterGroup([{"connect": "/dev/ttyUSB0"}, {"connect": "/dev/ttyUSB1"}]) as group:
+        with pytest.raises(MultimeterException, match="Multimeter /dev/ttyUSB1 failed: No bytes received"):
+            list(group.get_readings())
+    with pytest.raises(MultimeterException, match="unique"):
+        MultimeterGroup([{"connect": "/dev/ttyUSB0"}, {"connect": "/dev/ttyUSB0"}])
+
+
+def test_config_devices(tmp_path):
+    config = tmp_path / "config"
+    config.write_text(
+        "[digital-multimeter:bench]\nconnect = /dev/ttyUSB0\n\n"
+        "[digital-multimeter:supply]\nmodel = Voltcraft_VC870\nconnect = 1a86:e008\n"
+    )
+    assert Config(session_config_file=str(config)).get_devices() == [
+        {"device": "bench", "model": None, "connect": "/dev/ttyUSB0"},
+        {"device": "supply", "model": "Voltcraft_VC870", "connect": "1a86:e008"},
+    ]
+
+
+def test_read_multiple_devices(meters):
+    # distinct starts so that no two readings share a timestamp and the merge order is deterministic
+    meters({"/dev/ttyUSB0": 0.2, "/dev/ttyUSB1": 0.3}, starts={"/dev/ttyUSB1": 1000.05})
+    runner = CliRunner()
+    args = ["-c", "/dev/ttyUSB0", "-c", "/dev/ttyUSB1", "-m", "Default", "-n", "10", "-f", "ndjson"]
+    result = runner.invoke(click.get_reading, args)
+    assert result.exit_code == 0
+    readings = [json.loads(line) for line in result.output.splitlines()]
+    assert [reading["device"] for reading in readings[:4]] == [
+        "/dev/ttyUSB0",
+        "/dev/ttyUSB1",
+        "/dev/ttyUSB0",
+        "/dev/ttyUSB1",
+    ]
+
+    result = runner.invoke(click.get_reading, args + ["-m", "Default", "-m", "Default"])
+    assert "one --model for each" in result.output
@@ -0,0 +1,91 @@
+import pytest
+
+from digital_multimeter.multimeters.MultimeterEDI9604 import (
+    MultimeterEDI9604,
+    MultimeterEDI9604Exception,
+    MultimeterEDI9604FrameReader,
+    MultimeterEDI9604Reading,
+)
+
+FRAME_VOLTS = b"+1234 2" + bytes([0b10000, 0, 0, 0b10000000, 0]) + b"\r\n"
+FRAME_OHMS = b"-0056 1" + bytes([0b100000, 0, 0b100000, 0b100000, 0]) + b"\r\n"
+
+
+class FakeSerial:
+    def __init__(self, data=b"", chunk_size=None):
+        self.data = bytearray(data)
+        self.chunk_size = chunk_size
+
+    @property
+    def in_waiting(self):
+        return len(self.data)
+
+    def read(self, size=1):
+        if self.chunk_size:
+            size = min(size, self.chunk_size)
+        chunk = bytes(self.data[:size])
+        del self.data[:size]
+        return chunk
+
+    def close(self):
+        pass
+
+
+def test_get_reading():
+    dmm = MultimeterEDI9604(connect=None)
+    dmm.serial = FakeSerial(FRAME_VOLTS[5:] + FRAME_VOLTS + FRAME_OHMS)
+    reading = dmm.get_reading()
+    assert reading["reading"]["value"] == 12.34
+    assert reading["reading"]["unit_name"] == "volts"
+    reading = dmm.get_reading()
+    assert reading["reading"]["value"] == -0.056
+    assert reading["reading"]["scale_name"] == "kilo"
+    assert reading["reading"]["is_autorange"] == "AUTO"
+    assert dmm.get_stats() == {
+        "frames_decoded": 2,
+        "decode_cache_hits": 0,
+        "decode_cache_misses": 2,
+        "frames_received": 2,
+        "bytes_discarded": 9,
+        "resyncs": 1,
+    }
+
+
+def test_get_reading_compact():
+    dmm = MultimeterEDI9604(connect=None)
+    dmm.serial = FakeSerial(FRAME_VOLTS + FRAME_OHMS)
+    expected = MultimeterEDI9604(connect=None)
+    expected.timestamp_start = expected.timestamp_previous = dmm.timestamp_start
+    reading = dmm.get_reading(compact=True)
+    assert isinstance(reading, MultimeterEDI9604Reading)
+    assert reading.to_dict() == expected.parse_packet(FRAME_VOLTS, timestamp=reading.timestamp)
+    reading = dmm.get_reading(compact=True)
+    assert reading.to_dict() == expected.parse_packet(FRAME_OHMS, timestamp=reading.timestamp)
+
+
+def test_receive_packet_realigns_after_dropped_byte():
+    dmm = MultimeterEDI9604(connect=None)
+    dropped = FRAME_VOLTS[:3] + FRAME_VOLTS[4:]
+    dmm.serial = FakeSerial(FRAME_VOLTS + dropped + FRAME_OHMS + FRAME_VOLTS, chunk_size=14)
+    assert dmm.receive_packet() == FRAME_VOLTS
+    assert dmm.receive_packet() == FRAME_OHMS
+    assert dmm.receive_packet() == FRAME_VOLTS
+    assert dmm.get_stats()["bytes_discarded"] == 13
+
+
+def test_receive_packet_extra_byte():
+    reader = MultimeterEDI9604FrameReader()
+    reader.feed(FRAME_OHMS + b"\x00" + FRAME_VOLTS + FRAME_OHMS[:8])
+    assert reader.next_frame() == FRAME_OHMS
+    assert reader.next_frame() == FRAME_VOLTS
+    assert reader.next_frame() is None
+    reader.feed(FRAME_OHMS[8:])
+    assert reader.next_frame() == FRAME_OHMS
+    assert reader.get_stats() == {"frames_received": 3, "bytes_discarded": 1, "resyncs": 1}
+
+
+def test_receive_packet_retry_limit():
+    dmm = MultimeterEDI9604(connect=None)
+    dmm.serial = FakeSerial(b"\x00" * 100, chunk_size=15)
+    with pytest.raises(MultimeterEDI9604Exception, match="Unable to synchronise"):
+        dmm.receive_packet()
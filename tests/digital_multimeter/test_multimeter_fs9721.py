@@ -0,0 +1,317 @@
+import importlib.util
+import os
+import random
+
+import pytest
+
+from digital_multimeter.exceptions import MultimeterException
+from digital_multimeter.multimeters.DecodeCache import DecodeCache
+from digital_multimeter.multimeters.MultimeterFortuneFS9721 import (
+    OPERATION_MODES,
+    UNIT_NAMES,
+    MultimeterFortuneFS9721,
+    MultimeterFortuneFS9721Exception,
+    MultimeterFortuneFS9721FrameReader,
+    MultimeterFortuneFS9721Reading,
+    decode,
+    decode_array,
+)
+
+FRAME_VOLTAGE_DC = bytes.fromhex("162035435e677e8995a0b8c0d4e0")
+FRAME_VOLTAGE_AC = bytes.fromhex("1a2f3d4d5b617f879da0b0c1d5e0")
+FRAME_RESISTANCE_OVERLOAD = bytes.fromhex("122030475d6e788090a2b0c4d0e0")
+FRAME_FREQUENCY = bytes.fromhex("122035475d677d879da0b0c0d2e0")
+FRAME_TEMPERATURE = bytes.fromhex("12273d475d657b839ea0b0c0d0e1")
+
+
+class FakeSerial:
+    def __init__(self, data=b"", chunk_size=None):
+        self.data = bytearray(data)
+        self.chunk_size = chunk_size
+
+    @property
+    def in_waiting(self):
+        return len(self.data)
+
+    def read(self, size=1):
+        if self.chunk_size:
+            size = min(size, self.chunk_size)
+        chunk = bytes(self.data[:size])
+        del self.data[:size]
+        return chunk
+
+    def close(self):
+        pass
+
+
+def test_decode_voltage_dc():
+    assert decode(FRAME_VOLTAGE_DC) == {
+        "reading": {
+            "value": 156.70000000000002,
+            "unit_name": "volts",
+            "unit_symbol": "V",
+            "scale": 0.001,
+            "scale_name": "milli",
+            "scale_symbol": "m",
+            "scaled_value": 0.15670000000000003,
+            "is_relative": False,
+        },
+        "instrument": {
+            "module": "MultimeterFortuneFS9721",
+            "operation_mode": "voltage_dc",
+            "low_battery": False,
+            "is_hold": False,
+        },
+    }
+
+
+def test_decode_voltage_ac_flags():
+    reading = decode(FRAME_VOLTAGE_AC)
+    assert reading["reading"]["value"] == -0.23
+    assert reading["reading"]["scale"] == 1
+    assert reading["reading"]["scale_name"] is None
+    assert reading["instrument"]["operation_mode"] == "voltage_ac"
+    assert reading["instrument"]["low_battery"] is True
+    assert reading["instrument"]["is_hold"] is True
+
+
+def test_decode_overload():
+    reading = decode(FRAME_RESISTANCE_OVERLOAD)
+    assert reading["reading"]["value"] is None
+    assert reading["reading"]["scaled_value"] is None
+    assert reading["reading"]["unit_symbol"] == "Ω"
+    assert reading["reading"]["scale_name"] == "kilo"
+    assert reading["instrument"]["operation_mode"] == "resistance"
+
+
+def test_decode_integer_values():
+    assert decode(FRAME_FREQUENCY)["reading"]["value"] == 1000
+    assert decode(FRAME_FREQUENCY)["instrument"]["operation_mode"] == "frequency"
+    assert decode(FRAME_TEMPERATURE)["reading"]["value"] == 25
+    assert decode(FRAME_TEMPERATURE)["reading"]["unit_name"] == "celsius"
+
+
+def test_decode_unknown_digit():
+    frame = bytearray(FRAME_VOLTAGE_DC)
+    frame[2] = 0x33
+    with pytest.raises(MultimeterFortuneFS9721Exception, match="Unknown digit"):
+        decode(bytes(frame))
+
+
+def test_decode_unknown_units():
+    frame = bytearray(FRAME_VOLTAGE_DC)
+    frame[12] = 0xD0
+    with pytest.raises(MultimeterFortuneFS9721Exception, match="Unknown measurement units"):
+        decode(bytes(frame))
+
+
+def test_parse_packet_legacy_nibbles():
+    dmm = MultimeterFortuneFS9721(connect=None)
+    nibbles = ["{:04b}".format(byte & 0b1111) for byte in FRAME_VOLTAGE_DC]
+    reading = dmm.parse_packet(nibbles)
+    assert reading["reading"] == decode(FRAME_VOLTAGE_DC)["reading"]
+    assert list(reading["time"].keys()) == ["elapsed", "interval", "timestamp", "unit_name", "unit_symbol"]
+
+
+def test_receive_packet():
+    dmm = MultimeterFortuneFS9721(connect=None)
+    dmm.serial = FakeSerial(FRAME_VOLTAGE_DC[9:] + FRAME_VOLTAGE_DC)
+    assert dmm.receive_packet() == FRAME_VOLTAGE_DC
+
+
+def test_receive_packet_bulk_reads():
+    dmm = MultimeterFortuneFS9721(connect=None)
+    dmm.serial = FakeSerial(FRAME_VOLTAGE_DC + FRAME_FREQUENCY + FRAME_TEMPERATURE)
+    assert dmm.receive_packet() == FRAME_VOLTAGE_DC
+    assert dmm.serial.in_waiting == 0
+    assert dmm.receive_packet() == FRAME_FREQUENCY
+    assert dmm.receive_packet() == FRAME_TEMPERATURE
+    assert dmm.get_stats() == {
+        "frames_decoded": 0,
+        "decode_cache_hits": 0,
+        "decode_cache_misses": 0,
+        "frames_received": 3,
+        "bytes_discarded": 0,
+        "resyncs": 0,
+    }
+
+
+def test_receive_packet_resync_in_place():
+    dmm = MultimeterFortuneFS9721(connect=None)
+    # a truncated frame immediately followed by a complete frame; only the truncated bytes are dropped
+    dmm.serial = FakeSerial(FRAME_VOLTAGE_DC[:6] + FRAME_FREQUENCY + FRAME_VOLTAGE_DC[5:] + FRAME_TEMPERATURE)
+    assert dmm.receive_packet() == FRAME_FREQUENCY
+    assert dmm.receive_packet() == FRAME_TEMPERATURE
+    assert dmm.get_stats() == {
+        "frames_decoded": 0,
+        "decode_cache_hits": 0,
+        "decode_cache_misses": 0,
+        "frames_received": 2,
+        "bytes_discarded": 15,
+        "resyncs": 2,
+    }
+
+
+def test_receive_packet_partial_frame():
+    reader = MultimeterFortuneFS9721FrameReader()
+    reader.feed(b"\x00\xff" + FRAME_VOLTAGE_DC[:9])
+    assert reader.next_frame() is None
+    assert len(reader.buffer) == 9
+    reader.feed(FRAME_VOLTAGE_DC[9:])
+    assert reader.next_frame() == FRAME_VOLTAGE_DC
+    assert reader.get_stats() == {"frames_received": 1, "bytes_discarded": 2, "resyncs": 1}
+
+
+def test_receive_packet_noisy_stream():
+    dmm = MultimeterFortuneFS9721(connect=None)
+    dmm.serial = FakeSerial((b"\x00" + FRAME_VOLTAGE_DC) * 20, chunk_size=15)
+    for _ in range(20):
+        assert dmm.get_reading()["reading"]["value"] == 156.70000000000002
+    assert dmm.get_stats() == {
+        "frames_decoded": 20,
+        "decode_cache_hits": 19,
+        "decode_cache_misses": 1,
+        "frames_received": 20,
+        "bytes_discarded": 20,
+        "resyncs": 20,
+    }
+
+
+def test_get_stats_counts_decoded_frames_only():
+    dmm = MultimeterFortuneFS9721(connect=None)
+    frame = bytearray(FRAME_VOLTAGE_DC)
+    frame[2] = 0x33
+    dmm.serial = FakeSerial(bytes(frame) + FRAME_FREQUENCY)
+    with pytest.raises(MultimeterFortuneFS9721Exception, match="Unknown digit"):
+        dmm.get_reading()
+    dmm.get_reading()
+    assert dmm.get_stats()["frames_received"] == 2
+    assert dmm.get_stats()["frames_decoded"] == 1
+
+
+def test_receive_packet_retry_limit():
+    dmm = MultimeterFortuneFS9721(connect=None)
+    dmm.serial = FakeSerial(FRAME_VOLTAGE_DC[:5] * 8, chunk_size=5)
+    with pytest.raises(MultimeterFortuneFS9721Exception, match="Unable to synchronise"):
+        dmm.receive_packet()
+
+
+def test_receive_packet_no_data():
+    dmm = MultimeterFortuneFS9721(connect=None)
+    dmm.serial = FakeSerial(FRAME_VOLTAGE_DC[:9])
+    with pytest.raises(MultimeterFortuneFS9721Exception, match="No bytes received"):
+        dmm.receive_packet()
+
+
+def test_get_reading():
+    dmm = MultimeterFortuneFS9721(connect=None)
+    dmm.serial = FakeSerial(FRAME_VOLTAGE_DC[4:] + FRAME_VOLTAGE_AC)
+    reading = dmm.get_reading()
+    assert reading["reading"] == decode(FRAME_VOLTAGE_AC)["reading"]
+    assert reading["instrument"] == decode(FRAME_VOLTAGE_AC)["instrument"]
+    assert reading["time"]["unit_symbol"] == "s"
+    assert dmm.get_stats()["frames_decoded"] == 1
+
+
+def test_get_reading_compact():
+    frames = [FRAME_VOLTAGE_DC, FRAME_VOLTAGE_AC, FRAME_RESISTANCE_OVERLOAD, FRAME_FREQUENCY, FRAME_TEMPERATURE]
+    dmm = MultimeterFortuneFS9721(connect=None)
+    dmm_compact = MultimeterFortuneFS9721(connect=None)
+    dmm_compact.timestamp_start = dmm_compact.timestamp_previous = dmm.timestamp_start
+    dmm_compact.serial = FakeSerial(b"".join(frames))
+    for timestamp, frame in enumerate(frames, start=dmm.timestamp_start + 1000):
+        reading = dmm_compact.parse_packet(frame, timestamp=timestamp, compact=True)
+        assert isinstance(reading, MultimeterFortuneFS9721Reading)
+        assert reading.to_dict() == dmm.parse_packet(frame, timestamp=timestamp)
+    assert not hasattr(reading, "__dict__")
+    assert dmm_compact.get_reading(compact=True).to_dict()["reading"] == decode(FRAME_VOLTAGE_DC)["reading"]
+    assert dmm_compact.get_stats()["frames_decoded"] == 6
+
+
+def test_decode_matches_legacy_parser():
+    # differential test against the previous bit-string parser retained in benchmarks/fs9721_decode.py
+    path = os.path.join(os.path.dirname(__file__), "..", "..", "benchmarks", "fs9721_decode.py")
+    spec = importlib.util.spec_from_file_location("fs9721_decode_benchmark", path)
+    benchmark = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(benchmark)
+    legacy = benchmark.LegacyFS9721()
+
+    segments = [0b1111101, 0b0000101, 0b1011011, 0b0011111, 0b0100111, 0b0111110]
+    segments += [0b1111110, 0b0010101, 0b1111111, 0b0111111, 0b1101000, 0b0000000]
+    rand = random.Random(9721)
+    for _ in range(5000):
+        nibbles = [rand.randrange(16) for _ in range(14)]
+        for position in (1, 3, 5, 7):
+            bits = rand.choice(segments) if rand.random() < 0.98 else rand.randrange(128)
+            nibbles[position] = (nibbles[position] & 0b1000) | (bits >> 4)
+            nibbles[position + 1] = bits & 0b1111
+        frame = bytes(((index + 1) << 4) | nibble for index, nibble in enumerate(nibbles))
+        try:
+            expected = legacy.parse_packet(["{:04b}".format(nibble) for nibble in nibbles])
+        except MultimeterException as e:
+            with pytest.raises(MultimeterFortuneFS9721Exception) as excinfo:
+                decode(frame)
+            assert excinfo.value.args == e.args
+        else:
+            assert decode(frame) == expected
+
+
+def test_decode_array_matches_decode():
+    # randomised differential test against decode(); random function nibbles cover every mode, diode included
+    numpy = pytest.importorskip("numpy")
+    segments = [0b1111101, 0b0000101, 0b1011011, 0b0011111, 0b0100111, 0b0111110]
+    segments += [0b1111110, 0b0010101, 0b1111111, 0b0111111, 0b1101000, 0b0000000]
+    rand = random.Random(3)
+    capture, expected = b"\x21\x13", []
+    for _ in range(20000):
+        nibbles = [rand.randrange(16) for _ in range(14)]
+        for position in (1, 3, 5, 7):
+            bits = rand.choice(segments) if rand.random() < 0.98 else rand.randrange(128)
+            nibbles[position] = (nibbles[position] & 0b1000) | (bits >> 4)
+            nibbles[position + 1] = bits & 0b1111
+        frame = bytes(((index + 1) << 4) | nibble for index, nibble in enumerate(nibbles))
+        capture += frame + rand.choice([b"", b"", b"\x00", FRAME_FREQUENCY[:5]])
+        try:
+            expected.append(decode(frame))
+        except MultimeterFortuneFS9721Exception:
+            pass
+    capture += FRAME_TEMPERATURE[:10]
+
+    readings = decode_array(capture)
+    assert len(readings) == len(expected)
+    modes = {reading["instrument"]["operation_mode"] for reading in expected}
+    assert {"diode", "continuity", "capacitance"} <= modes
+    for row, reading in zip(readings, expected):
+        value = reading["reading"]["value"]
+        assert numpy.isnan(row["value"]) if value is None else row["value"] == pytest.approx(value)
+        assert row["scale"] == reading["reading"]["scale"]
+        assert UNIT_NAMES[row["unit"]] == reading["reading"]["unit_name"]
+        assert OPERATION_MODES[row["mode"]] == reading["instrument"]["operation_mode"]
+        assert row["hold"] == reading["instrument"]["is_hold"]
+        assert row["relative"] == reading["reading"]["is_relative"]
+        assert row["low_battery"] == reading["instrument"]["low_battery"]
+
+
+def test_decode_array_empty():
+    pytest.importorskip("numpy")
+    assert len(decode_array(b"")) == 0
+    assert len(decode_array(FRAME_VOLTAGE_DC[:13])) == 0
+
+
+def test_decode_cache():
+    dmm = MultimeterFortuneFS9721(connect=None)
+    dmm.decode_cache = DecodeCache(size=2)
+    first = dmm.parse_packet(FRAME_VOLTAGE_DC, 1000)
+    first["reading"]["value"] = 0
+    second = dmm.parse_packet(bytearray(FRAME_VOLTAGE_DC), 2000)
+    assert second["reading"]["value"] == 156.70000000000002
+    assert second["time"]["timestamp"] == 2000 * 1e-9
+    assert dmm.parse_packet(FRAME_VOLTAGE_DC, 3000, compact=True).value == 156.70000000000002
+    assert dmm.decode_cache.get_stats() == {"decode_cache_hits": 2, "decode_cache_misses": 1}
+
+    dmm.parse_packet(FRAME_FREQUENCY)
+    dmm.parse_packet(FRAME_TEMPERATURE)
+    assert list(dmm.decode_cache.entries) == [FRAME_FREQUENCY, FRAME_TEMPERATURE]
+    with pytest.raises(MultimeterFortuneFS9721Exception):
+        dmm.parse_packet(bytes.fromhex("163335435e677e8995a0b8c0d4e0"))
+    assert len(dmm.decode_cache.entries) == 2
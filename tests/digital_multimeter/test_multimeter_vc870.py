@@ -0,0 +1,152 @@
+import errno
+import importlib.util
+import os
+import random
+import time
+
+import pytest
+import usb.core
+
+from digital_multimeter.exceptions import MultimeterException
+from digital_multimeter.multimeters.MultimeterVC870USBHID import (
+    MultimeterVC870USBHID,
+    MultimeterVC870USBHIDException,
+    MultimeterVC870USBHIDReading,
+    decode,
+    decode_packets,
+)
+
+PACKET_DCV = b"000123450000000000000"
+PACKET_ACA = b"811001230000000000100"
+
+
+def hid_reports(data, size=7):
+    # HID-UART bridge reports; payload length in the low bits of the first byte, payload high bit set at random
+    reports = []
+    for offset in range(0, len(data), size):
+        payload = data[offset : offset + size]
+        reports.append([0xF0 | len(payload)] + [byte | 0x80 for byte in payload])
+    return reports
+
+
+class FakeEndpoint:
+    bEndpointAddress = 0x82
+    wMaxPacketSize = 8
+
+
+class FakeDevice:
+    def __init__(self, reports):
+        self.reports = list(reports)
+
+    def read(self, address, size, timeout=None):
+        if not self.reports:
+            time.sleep(0.001)
+            raise usb.core.USBError("Operation timed out", errno=errno.ETIMEDOUT)
+        return self.reports.pop(0)
+
+
+class FakeMultimeterVC870USBHID(MultimeterVC870USBHID):
+    def interface_open(self, connect):
+        self.dev = FakeDevice(connect)
+        self.ep = FakeEndpoint()
+
+    def interface_close(self):
+        self.stream_stop()
+
+
+def wait_for(condition, timeout=2):
+    time_limit = time.time() + timeout
+    while not condition() and time.time() < time_limit:
+        time.sleep(0.001)
+
+
+def test_get_reading():
+    dmm = FakeMultimeterVC870USBHID(hid_reports(b"345\r\n" + (PACKET_DCV + b"\r\n") * 3))
+    reading = dmm.get_reading()
+    assert reading["reading"]["operation_mode"] == "DCV"
+    assert reading["reading"]["value"] == pytest.approx(1.2345)
+    assert reading["reading"]["unit"] == "V"
+
+
+def test_streaming_readings_back_to_back():
+    data = b"0\r\n" + (PACKET_DCV + b"\r\n" + PACKET_ACA + b"\r\n") * 3
+    dmm = FakeMultimeterVC870USBHID(hid_reports(data), streaming=True)
+    wait_for(lambda: dmm.get_stats()["packets_received"] == 6)
+    modes = [dmm.get_reading()["reading"]["operation_mode"] for _ in range(6)]
+    assert modes == ["DCV", "ACA"] * 3
+    assert dmm.get_stats() == {
+        "packets_received": 6,
+        "packets_dropped": 0,
+        "packets_queued": 0,
+        "bytes_discarded": 3,
+        "frames_decoded": 6,
+        "decode_cache_hits": 4,
+        "decode_cache_misses": 2,
+    }
+    dmm.stream_stop()
+
+
+def test_streaming_discards_corrupt_packets():
+    data = PACKET_DCV[:10] + b"\r\n" + PACKET_DCV[:5] + b"\x01" + PACKET_DCV[6:] + b"\r\n" + PACKET_ACA + b"\r\n"
+    dmm = FakeMultimeterVC870USBHID(hid_reports(data), streaming=True)
+    assert dmm.get_reading()["reading"]["operation_mode"] == "ACA"
+    assert dmm.get_stats()["bytes_discarded"] == 35
+    dmm.stream_stop()
+
+
+def test_streaming_no_packets():
+    dmm = FakeMultimeterVC870USBHID([], streaming=True)
+    dmm.stream_packets.put(PACKET_DCV)
+    assert dmm.get_reading()["reading"]["operation_mode"] == "DCV"
+    dmm.stream_error = MultimeterVC870USBHIDException("device gone")
+    with pytest.raises(MultimeterVC870USBHIDException, match="Streaming reader failed"):
+        dmm.get_reading()
+    dmm.stream_stop()
+
+
+def test_decode_packets():
+    readings = list(decode_packets([PACKET_DCV, bytearray(PACKET_ACA), memoryview(b"x" + PACKET_DCV)[1:]]))
+    assert [reading["reading"]["operation_mode"] for reading in readings] == ["DCV", "ACA", "DCV"]
+    assert readings[1]["reading"]["value"] == pytest.approx(1.23)
+    assert readings[1]["instrument"] == {"module": "MultimeterVC870USBHID", "active_flags": ""}
+
+
+def test_parse_packet_compact():
+    dmm = MultimeterVC870USBHID(connect=None)
+    expected = MultimeterVC870USBHID(connect=None)
+    expected.timestamp_start = expected.timestamp_previous = dmm.timestamp_start
+    for timestamp, packet in enumerate([PACKET_DCV, PACKET_ACA, b"92" + PACKET_DCV[2:]], start=dmm.timestamp_start):
+        reading = dmm.parse_packet(packet, timestamp=timestamp, compact=True)
+        assert isinstance(reading, MultimeterVC870USBHIDReading)
+        assert reading.to_dict() == expected.parse_packet(packet, timestamp=timestamp)
+    assert reading.to_dict()["reading"]["aux_unit"] == "A"
+
+
+def test_decode_unsupported_mode():
+    with pytest.raises(MultimeterVC870USBHIDException, match="Unsupported digital multimeter mode"):
+        decode(b"99" + PACKET_DCV[2:])
+
+
+def test_decode_matches_legacy_parser():
+    # differential test against the previous str parser retained in benchmarks/vc870_decode.py
+    path = os.path.join(os.path.dirname(__file__), "..", "..", "benchmarks", "vc870_decode.py")
+    spec = importlib.util.spec_from_file_location("vc870_decode_benchmark", path)
+    benchmark = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(benchmark)
+    legacy = benchmark.LegacyVC870()
+
+    operation_ids = ["00", "01", "10", "11", "20", "21", "30", "40", "50", "51"]
+    operation_ids += ["60", "61", "70", "71", "80", "81", "90", "91", "92", "93"]
+    rand = random.Random(870)
+    for _ in range(5000):
+        packet = rand.choice(operation_ids) + str(rand.randrange(10))
+        packet += "".join(str(rand.randrange(10)) for _ in range(12))
+        packet += "".join(chr(rand.randrange(0x30, 0x40)) for _ in range(6))
+        try:
+            expected = legacy.parse_packet(packet)
+        except MultimeterException as e:
+            with pytest.raises(MultimeterVC870USBHIDException) as excinfo:
+                decode(packet.encode("ascii"))
+            assert excinfo.value.args == e.args
+        else:
+            assert decode(packet.encode("ascii")) == expected
@@ -0,0 +1,281 @@
+import datetime
+import gzip
+import json
+import threading
+
+import pytest
+from click.testing import CliRunner
+
+from digital_multimeter.cli import click
+from digital_multimeter.exceptions import MultimeterException
+from digital_multimeter.main import DigitalMultimeter
+from digital_multimeter.multimeters.MultimeterFortuneFS9721 import MultimeterFortuneFS9721
+from digital_multimeter.multimeters.MultimeterVC870USBHID import MultimeterVC870USBHID
+from digital_multimeter.utils import OutputSink, QueuedOutputSink, cli_output
+from digital_multimeter.utils.cli_output import _csv_plan
+from digital_multimeter.utils.output_sink import _next_boundary
+
+FRAMES = [
+    bytes.fromhex("162035435e677e8995a0b8c0d4e0"),
+    bytes.fromhex("1a2f3d4d5b617f879da0b0c1d5e0"),
+    bytes.fromhex("122035475d677d879da0b0c0d2e0"),
+]
+
+
+def readings(count):
+    dmm = MultimeterFortuneFS9721(connect=None)
+    dmm.timestamp_start = dmm.timestamp_previous = 1600000000000000000
+    return [dmm.parse_packet(FRAMES[index % len(FRAMES)], 1600000000000000000 + index) for index in range(count)]
+
+
+@pytest.mark.parametrize("format", ["json", "csv", "ndjson"])
+def test_output_sink_matches_cli_output(tmp_path, format):
+    expected = tmp_path / "expected.out"
+    for count, reading in enumerate(readings(5)):
+        cli_output(reading, format=format, output=str(expected), count=count)
+    with OutputSink(output=str(tmp_path / "sink.out"), format=format) as sink:
+        for reading in readings(5):
+            sink.write(reading)
+    assert (tmp_path / "sink.out").read_text() == expected.read_text()
+
+
+def test_output_sink_flush_count(tmp_path):
+    output = tmp_path / "readings.csv"
+    sink = OutputSink(output=str(output), format="csv", flush_count=3)
+    for reading in readings(2):
+        sink.write(reading)
+    assert output.read_text() == ""
+    sink.write(readings(1)[0])
+    assert len(output.read_text().splitlines()) == 4
+    sink.write(readings(1)[0])
+    assert sink.pending == 1
+    sink.close()
+    assert len(output.read_text().splitlines()) == 5
+    sink.close()
+
+
+def test_output_sink_flush_interval(tmp_path):
+    output = tmp_path / "readings.csv"
+    with OutputSink(output=str(output), format="csv", flush_count=0, flush_interval=3600, fsync=True) as sink:
+        sink.write(readings(1)[0])
+        assert output.read_text() == ""
+        sink.flush_interval = 0
+        sink.write(readings(1)[0])
+        assert len(output.read_text().splitlines()) == 3
+
+
+def test_csv_plan():
+    data = {"reading": {"value": 1.5, "flags": [True, None]}, "count": 3, "time": {"unit_name": "second"}}
+    plan = _csv_plan(data, delimiter="_")
+    assert plan.columns == ["reading_value", "reading_flags_0", "reading_flags_1", "count", "time_unit_name"]
+    assert plan.format_row(data) == "1.5,True,None,3,second\n"
+    assert _csv_plan(dict(data, count=4), delimiter="_") is plan
+    assert _csv_plan(dict(data, count={"a": 1}), delimiter="_") is not plan
+    with pytest.raises(MultimeterException, match="Unsupported data type"):
+        _csv_plan("value")
+
+
+def test_output_sink_csv_schema_change(tmp_path):
+    output = tmp_path / "readings.csv"
+    vc870 = MultimeterVC870USBHID(connect=None)
+    with OutputSink(output=str(output), format="csv") as sink:
+        sink.write(readings(1)[0])
+        sink.write(readings(1)[0])
+        sink.write(vc870.parse_packet(b"000123450000000000000"))
+        sink.write(vc870.parse_packet(b"811001230000000000100"))
+        sink.write(readings(1)[0])
+    lines = output.read_text().splitlines()
+    assert [index for index, line in enumerate(lines) if line.startswith("reading_")] == [0, 3, 6]
+    assert lines[3].startswith("reading_operation_mode,reading_value,reading_unit,")
+    assert lines[5].startswith("ACA,")
+
+
+def test_output_sink_ndjson_batches(tmp_path):
+    output = tmp_path / "readings.ndjson"
+    with OutputSink(output=str(output), format="ndjson", flush_count=0, batch_size=3) as sink:
+        for reading in readings(4):
+            sink.write(reading)
+        assert len(sink.batch) == 1
+    lines = output.read_text().splitlines()
+    assert [json.loads(line) for line in lines] == readings(4)
+    assert lines[0].startswith('{"reading":{"value":156.70000000000002,"unit_name":"volts",')
+
+
+def test_output_sink_rotate_size(tmp_path):
+    output = str(tmp_path / "{model}-{segment}.csv")
+    with OutputSink(output=output, format="csv", model="FS9721", rotate_size=1000, compress=True) as sink:
+        for reading in readings(10):
+            sink.write(reading)
+        assert sink.segment > 0
+    segments = sorted(tmp_path.iterdir())
+    assert [path.name for path in segments] == ["FS9721-{}.csv.gz".format(index) for index in range(sink.segment + 1)]
+    rows = []
+    for path in segments:
+        lines = gzip.decompress(path.read_bytes()).decode().splitlines()
+        assert lines[0].startswith("reading_value,")
+        rows.extend(lines[1:])
+    assert len(rows) == 10
+
+
+def test_output_sink_rotate_age(tmp_path, monkeypatch):
+    with OutputSink(output=str(tmp_path / "readings.ndjson"), format="ndjson", rotate_age=3600) as sink:
+        sink.write(readings(1)[0])
+        sink.segment_opened_at -= 3600
+        sink.write(readings(1)[0])
+        sink.rotate_at = "day"
+        sink.segment_boundary = 0
+        sink.write(readings(1)[0])
+    segments = sorted(tmp_path.iterdir())
+    assert len(segments) == 3
+    assert segments[0].name.startswith("readings-") and segments[0].name.endswith(".ndjson")
+    assert all(len(path.read_text().splitlines()) == 1 for path in segments)
+
+
+def test_output_sink_rotate_errors():
+    with pytest.raises(MultimeterException, match="require a file output"):
+        OutputSink(rotate_size=1000)
+    with pytest.raises(MultimeterException, match="requires output rotation"):
+        OutputSink(output="readings.csv", compress=True)
+    with pytest.raises(MultimeterException, match="rotation boundary"):
+        OutputSink(output="readings.csv", rotate_at="week")
+
+
+def test_next_boundary():
+    now = datetime.datetime(2024, 2, 29, 23, 59, 30, 5)
+    assert _next_boundary(now, "minute") == datetime.datetime(2024, 3, 1, 0, 0)
+    assert _next_boundary(now, "hour") == datetime.datetime(2024, 3, 1, 0, 0)
+    assert _next_boundary(now.replace(hour=12), "day") == datetime.datetime(2024, 3, 1, 0, 0)
+    assert _next_boundary(now.replace(minute=10), "minute") == datetime.datetime(2024, 2, 29, 23, 11)
+
+
+def test_output_sink_unsupported_format():
+    with pytest.raises(MultimeterException, match="Unsupported output format"):
+        OutputSink(format="xml")
+
+
+def test_cli_output_ndjson(capsys):
+    cli_output({"value": 0.1, "unit": "\u03A9", "flags": [True, None]}, format="ndjson")
+    assert capsys.readouterr().out == '{"value":0.1,"unit":"\\u03a9","flags":[true,null]}\n'
+
+
+def test_read_writes_through_sink(tmp_path, monkeypatch):
+    monkeypatch.setattr(DigitalMultimeter, "get_reading", lambda self, **kwargs: readings(1)[0])
+    output = tmp_path / "readings.csv"
+    runner = CliRunner()
+    args = ["--connect", "/dev/null", "-n", "4", "-f", "csv", "-o", str(output), "--flush-count", "0", "--fsync"]
+    result = runner.invoke(click.get_reading, args)
+    assert result.exit_code == 0
+    lines = output.read_text().splitlines()
+    assert len(lines) == 5
+    assert lines[0].startswith("reading_value,")
+
+
+def test_read_sink_options(monkeypatch):
+    sinks = []
+
+    class RecordingOutputSink(OutputSink):
+        def __init__(self, **kwargs):
+            sinks.append(kwargs)
+            super().__init__(**kwargs)
+
+    monkeypatch.setattr(DigitalMultimeter, "get_reading", lambda self, **kwargs: readings(1)[0])
+    monkeypatch.setattr(click, "OutputSink", RecordingOutputSink)
+    runner = CliRunner()
+    args = ["--connect", "/dev/null", "-f", "ndjson", "--batch", "5", "--flush-count", "10", "--flush-interval", "2"]
+    result = runner.invoke(click.get_reading, args)
+    assert result.exit_code == 0
+    assert sinks[0]["batch_size"] == 5
+    assert sinks[0]["flush_count"] == 10
+    assert sinks[0]["flush_interval"] == 2
+
+
+class GatedSink:
+    def __init__(self, fail=False):
+        self.written = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.closed = False
+        self.fail = fail
+
+    def write(self, data):
+        self.entered.set()
+        self.release.wait(timeout=5)
+        if self.fail:
+            raise OSError("disk full")
+        self.written.append(data)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.mark.parametrize(
+    "overflow, expected", [("drop-newest", [0, 1, 2]), ("drop-oldest", [0, 3, 4]), ("block", [0, 1, 2, 3, 4])]
+)
+def test_queued_output_sink_overflow(overflow, expected):
+    sink = GatedSink()
+    queued = QueuedOutputSink(sink, queue_size=2, overflow=overflow)
+    queued.write(0)
+    assert sink.entered.wait(timeout=5)
+    if overflow == "block":
+        sink.release.set()
+    for data in range(1, 5):
+        queued.write(data)
+    sink.release.set()
+    queued.close()
+    assert sink.written == expected
+    assert sink.closed
+    stats = queued.get_stats()
+    assert stats["readings_dropped"] == 5 - len(expected)
+    assert stats["readings_written"] == len(expected)
+    assert stats["queue_depth"] == 0
+    if overflow != "block":
+        assert stats["queue_depth_max"] == 2
+
+
+def test_queued_output_sink_writer_error():
+    sink = GatedSink(fail=True)
+    sink.release.set()
+    queued = QueuedOutputSink(sink, queue_size=2)
+    queued.write(0)
+    with pytest.raises(MultimeterException, match="Output writer failed: disk full"):
+        queued.close()
+    assert sink.closed
+    # the sink stays failed
+    with pytest.raises(MultimeterException, match="Output writer failed: disk full"):
+        queued.write(1)
+    with pytest.raises(MultimeterException, match="Output writer failed: disk full"):
+        queued.close()
+
+
+def test_queued_output_sink_writer_stops():
+    sink = GatedSink(fail=True)
+    queued = QueuedOutputSink(sink, queue_size=2)
+    queued.write(0)
+    assert sink.entered.wait(timeout=5)
+    queued.write(1)
+    queued.write(2)
+    sink.release.set()
+    queued.thread.join(timeout=5)
+    assert not queued.thread.is_alive()
+    # nothing further reaches the failed sink
+    sink.fail = False
+    for _ in range(2):
+        with pytest.raises(MultimeterException, match="Output writer failed: disk full"):
+            queued.write(3)
+    with pytest.raises(MultimeterException, match="Output writer failed: disk full"):
+        queued.close()
+    assert sink.written == []
+    assert sink.closed
+
+    with pytest.raises(MultimeterException, match="overflow policy"):
+        QueuedOutputSink(sink, overflow="drop-all")
+
+
+def test_read_queued_output(tmp_path, monkeypatch):
+    monkeypatch.setattr(DigitalMultimeter, "get_reading", lambda self, **kwargs: readings(1)[0])
+    output = tmp_path / "readings.ndjson"
+    runner = CliRunner()
+    args = ["--connect", "/dev/null", "-n", "50", "-f", "ndjson", "-o", str(output), "--overflow", "drop-oldest"]
+    result = runner.invoke(click.get_reading, args)
+    assert result.exit_code == 0
+    assert len(output.read_text().splitlines()) == 50
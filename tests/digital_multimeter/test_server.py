@@ -0,0 +1,161 @@
+import json
+import socket
+import time
+
+import pytest
+
+from digital_multimeter import server as server_module
+from digital_multimeter.exceptions import MultimeterException
+from digital_multimeter.main import DigitalMultimeter
+from digital_multimeter.multimeters.MultimeterFortuneFS9721 import MultimeterFortuneFS9721
+from digital_multimeter.server import ReadingServer, _websocket_frame
+
+FRAME_VOLTAGE_DC = bytes.fromhex("162035435e677e8995a0b8c0d4e0")
+
+
+class FakeDigitalMultimeter:
+    """
+    Readings every `period` seconds; the multimeter fails after `fail_after` readings, once.
+    """
+
+    period = 0.001
+    fail_after = None
+    failed = False
+
+    def __init__(self, connect=None, model="Default"):
+        self.connect = connect
+        self.multimeter = MultimeterFortuneFS9721(connect=None)
+
+    def stream(self, interval=None):
+        counted = 0
+        while True:
+            time.sleep(self.period)
+            if counted == FakeDigitalMultimeter.fail_after and not FakeDigitalMultimeter.failed:
+                FakeDigitalMultimeter.failed = True
+                raise MultimeterException("No bytes received from the serial interface")
+            yield self.multimeter.parse_packet(FRAME_VOLTAGE_DC)
+            counted += 1
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    monkeypatch.setattr(server_module, "DigitalMultimeter", FakeDigitalMultimeter)
+    monkeypatch.setattr(server_module, "RECONNECT_DELAY", 0.01)
+    servers = []
+
+    def start(devices=({"connect": "/dev/ttyUSB0", "device": "bench"}, {"connect": "/dev/ttyUSB1"}), **kwargs):
+        server = ReadingServer(list(devices), port=0, **kwargs)
+        server.start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+    FakeDigitalMultimeter.fail_after, FakeDigitalMultimeter.failed = None, False
+
+
+def read_lines(connection, count):
+    buffer = b""
+    while buffer.count(b"\n") < count:
+        buffer += connection.recv(65536)
+    return [json.loads(line) for line in buffer.split(b"\n")[:count]]
+
+
+def test_serve_tcp_clients(serve):
+    server = serve()
+    clients = [socket.create_connection(server.addresses["tcp"], timeout=5) for _ in range(3)]
+    for client in clients:
+        readings = read_lines(client, 50)
+        assert {reading["device"] for reading in readings} == {"bench", "/dev/ttyUSB1"}
+        assert readings[0]["reading"]["unit_name"] == "volts"
+        client.close()
+    assert server.get_stats()["readings_broadcast"] >= 50
+
+
+def test_serve_slow_client(serve):
+    server = serve(queue_size=4)
+    slow = socket.socket()
+    slow.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    slow.connect(server.addresses["tcp"])
+    fast = socket.create_connection(server.addresses["tcp"], timeout=5)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        read_lines(fast, 100)
+        if any(client["readings_dropped"] for client in server.get_stats()["clients"]):
+            break
+    stats = {client["readings_dropped"] > 0 for client in server.get_stats()["clients"]}
+    assert stats == {True, False}
+    slow.close()
+    fast.close()
+
+
+def test_serve_client_mode(serve):
+    server = serve()
+    host, port = server.addresses["tcp"]
+    api = DigitalMultimeter(connect="tcp://{}:{}?device=bench".format(host, port))
+    readings = list(api.stream(count=5, freshest=False))
+    assert [reading["device"] for reading in readings] == ["bench"] * 5
+    assert readings[0]["reading"]["value"] == pytest.approx(156.7)
+    assert api.get_reading(freshest=True)["device"] == "bench"
+    stats = api.get_stats()
+    assert stats["readings_received"] == 6
+    assert stats["readings_skipped"] > 0
+    with pytest.raises(MultimeterException, match="Compact readings"):
+        api.get_reading(compact=True)
+    with pytest.raises(MultimeterException, match="recorded"):
+        api.record("capture.dmm")
+
+
+def test_serve_client_mode_errors(serve):
+    server = serve()
+    with pytest.raises(MultimeterException, match="tcp://host:port"):
+        DigitalMultimeter(connect="tcp://localhost").get_reading()
+    api = DigitalMultimeter(connect="tcp://{}:{}".format(*server.addresses["tcp"]))
+    api.get_reading()
+    server.stop()
+    with pytest.raises(MultimeterException, match="closed the connection"):
+        while True:
+            api.get_reading()
+
+
+def test_serve_websocket(serve):
+    server = serve(websocket_port=0)
+    client = socket.create_connection(server.addresses["websocket"], timeout=5)
+    client.sendall(
+        b"GET /?device=bench HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+        b"Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\nSec-WebSocket-Version: 13\r\n\r\n"
+    )
+    response = b""
+    while b"\r\n\r\n" not in response:
+        response += client.recv(1)
+    assert response.startswith(b"HTTP/1.1 101 ")
+    assert b"Sec-WebSocket-Accept: s3pPLMBiTxaQ9kYGzzhZRbK+xOo=\r\n" in response
+    file = client.makefile("rb")
+    for _ in range(10):
+        opcode, length = file.read(2)
+        assert opcode == 0x81
+        if length == 126:
+            length = int.from_bytes(file.read(2), "big")
+        assert json.loads(file.read(length))["device"] == "bench"
+    client.close()
+
+    client = socket.create_connection(server.addresses["websocket"], timeout=5)
+    client.sendall(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    assert client.recv(1024).startswith(b"HTTP/1.1 400 ")
+    client.close()
+
+
+def test_serve_reconnects(serve):
+    FakeDigitalMultimeter.fail_after = 3
+    server = serve(devices=[{"connect": "/dev/ttyUSB0"}])
+    client = socket.create_connection(server.addresses["tcp"], timeout=5)
+    assert len(read_lines(client, 20)) == 20
+    assert FakeDigitalMultimeter.failed
+    client.close()
+
+
+def test_websocket_frame():
+    assert _websocket_frame(b"{}") == b"\x81\x02{}"
+    assert _websocket_frame(b"x" * 200)[:4] == b"\x81\x7e\x00\xc8"
+    assert _websocket_frame(b"x" * 70000)[:10] == b"\x81\x7f" + (70000).to_bytes(8, "big")
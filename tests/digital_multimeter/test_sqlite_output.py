@@ -0,0 +1,61 @@
+import sqlite3
+
+import pytest
+from click.testing import CliRunner
+
+from digital_multimeter.cli import click
+from digital_multimeter.exceptions import MultimeterException
+from digital_multimeter.main import DigitalMultimeter
+from digital_multimeter.multimeters.MultimeterFortuneFS9721 import MultimeterFortuneFS9721
+from digital_multimeter.utils import SqliteOutputSink
+
+FRAMES = [
+    bytes.fromhex("162035435e677e8995a0b8c0d4e0"),
+    bytes.fromhex("1a2f3d4d5b617f879da0b0c1d5e0"),
+    bytes.fromhex("122030475d6e788090a2b0c4d0e0"),
+]
+
+
+def readings(count):
+    dmm = MultimeterFortuneFS9721(connect=None)
+    return [dmm.parse_packet(FRAMES[index % len(FRAMES)]) for index in range(count)]
+
+
+def test_sqlite_output_sink(tmp_path):
+    output = str(tmp_path / "readings.db")
+    with SqliteOutputSink(output, device="/dev/ttyUSB0", batch_size=2, batch_interval=None) as sink:
+        sink.write(readings(1)[0])
+        assert sqlite3.connect(output).execute("SELECT count(*) FROM readings").fetchone() == (0,)
+        for reading in readings(3):
+            sink.write(reading)
+        assert sqlite3.connect(output).execute("SELECT count(*) FROM readings").fetchone() == (4,)
+        assert len(sink.batch) == 0
+    with SqliteOutputSink(output, device="/dev/ttyUSB1") as sink:
+        sink.write(readings(1)[0])
+
+    connection = sqlite3.connect(output)
+    assert connection.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    rows = connection.execute("SELECT device, value, flags, unit, mode FROM readings ORDER BY rowid").fetchall()
+    assert rows[:4] == [
+        ("/dev/ttyUSB0", 156.70000000000002, 0, "volts", "voltage_dc"),
+        ("/dev/ttyUSB0", 156.70000000000002, 0, "volts", "voltage_dc"),
+        ("/dev/ttyUSB0", -0.23, 5, "volts", "voltage_ac"),
+        ("/dev/ttyUSB0", None, 0, "ohms", "resistance"),
+    ]
+    assert rows[4][0] == "/dev/ttyUSB1"
+    indexes = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert indexes == {"readings_timestamp", "readings_device_timestamp"}
+
+
+def test_sqlite_output_sink_stdout():
+    with pytest.raises(MultimeterException, match="database file"):
+        SqliteOutputSink("stdout")
+
+
+def test_read_sqlite_output(tmp_path, monkeypatch):
+    monkeypatch.setattr(DigitalMultimeter, "get_reading", lambda self, **kwargs: readings(1)[0])
+    output = str(tmp_path / "readings.db")
+    runner = CliRunner()
+    result = runner.invoke(click.get_reading, ["--connect", "/dev/null", "-n", "20", "-f", "sqlite", "-o", output])
+    assert result.exit_code == 0
+    assert sqlite3.connect(output).execute("SELECT count(*), min(device) FROM readings").fetchone() == (20, "/dev/null")
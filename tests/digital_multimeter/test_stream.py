@@ -0,0 +1,109 @@
+import queue
+
+from click.testing import CliRunner
+
+from digital_multimeter import main
+from digital_multimeter.cli import click
+from digital_multimeter.main import DigitalMultimeter
+from digital_multimeter.multimeters.MultimeterFortuneFS9721 import MultimeterFortuneFS9721
+from digital_multimeter.multimeters.MultimeterVC870USBHID import MultimeterVC870USBHID
+
+FRAME_VOLTAGE_DC = bytes.fromhex("162035435e677e8995a0b8c0d4e0")
+FRAME_VOLTAGE_AC = bytes.fromhex("1a2f3d4d5b617f879da0b0c1d5e0")
+FRAME_RESISTANCE_OVERLOAD = bytes.fromhex("122030475d6e788090a2b0c4d0e0")
+
+
+class FakeSerial:
+    def __init__(self, data=b""):
+        self.data = bytearray(data)
+
+    @property
+    def in_waiting(self):
+        return len(self.data)
+
+    def read(self, size=1):
+        chunk = bytes(self.data[:size])
+        del self.data[:size]
+        return chunk
+
+    def close(self):
+        pass
+
+
+def fs9721(data):
+    dmm = DigitalMultimeter(connect="/dev/ttyUSB0")
+    dmm.multimeter = MultimeterFortuneFS9721(connect=None)
+    dmm.multimeter.serial = FakeSerial(data)
+    return dmm
+
+
+def modes(readings):
+    return [reading["instrument"]["operation_mode"] for reading in readings]
+
+
+def test_stream_freshest():
+    data = FRAME_VOLTAGE_DC + FRAME_RESISTANCE_OVERLOAD + FRAME_VOLTAGE_AC[:5]
+    dmm = fs9721(data)
+    assert modes(dmm.stream(count=1)) == ["resistance"]
+    dmm.multimeter.serial.data += FRAME_VOLTAGE_AC[5:] + FRAME_VOLTAGE_DC
+    assert modes(dmm.stream(count=1)) == ["voltage_dc"]
+    assert dmm.get_stats()["frames_received"] == 4
+
+    dmm = fs9721(data + FRAME_VOLTAGE_AC[5:])
+    assert modes(dmm.stream(count=3, freshest=False)) == ["voltage_dc", "resistance", "voltage_ac"]
+
+
+def test_stream_vc870_freshest():
+    dmm = DigitalMultimeter(connect="1a86:e008", model="Voltcraft_VC870")
+    dmm.multimeter = MultimeterVC870USBHID(connect=None)
+    dmm.multimeter.buffer += b"000123450000000000000\r\n811001230000000000100\r\n"
+    dmm.multimeter.stream_packets = queue.Queue()
+    dmm.multimeter.streaming = True
+    dmm.multimeter._stream_packets()
+    assert [reading["reading"]["operation_mode"] for reading in dmm.stream(count=1)] == ["ACA"]
+    dmm.multimeter.streaming = False
+
+
+def test_stream_schedule(monkeypatch):
+    clock = [100.0]
+    sleeps = []
+    durations = iter([0.1, 0.1, 2.6, 0.1, 0.1])
+
+    def get_reading(self, compact=False, freshest=False):
+        clock[0] += next(durations)
+        return clock[0]
+
+    def sleep(seconds):
+        sleeps.append(round(seconds, 6))
+        clock[0] += seconds
+
+    monkeypatch.setattr(main.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(main.time, "sleep", sleep)
+    monkeypatch.setattr(DigitalMultimeter, "get_reading", get_reading)
+    readings = list(DigitalMultimeter().stream(count=5, interval=1))
+    # readings start on schedule at 100, 101, 102; the third overruns 103 and 104 so the fourth starts at 105
+    assert [round(reading, 6) for reading in readings] == [100.1, 101.1, 104.6, 105.1, 106.1]
+    assert sleeps == [0.9, 0.9, 0.4, 0.9]
+
+    clock[0], sleeps[:] = 100.0, []
+    durations = iter([0.1, 1.3, 0.1, 0.1])
+    readings = list(DigitalMultimeter().stream(count=4, interval=1))
+    # the second reading overruns 102 by 0.3, so the third is taken straight away and the schedule kept
+    assert [round(reading, 6) for reading in readings] == [100.1, 102.3, 102.4, 103.1]
+
+
+def test_read_freshest(monkeypatch):
+    calls = []
+
+    def get_reading(self, compact=False, freshest=False):
+        calls.append(freshest)
+        return MultimeterFortuneFS9721(connect=None).parse_packet(FRAME_VOLTAGE_DC)
+
+    monkeypatch.setattr(DigitalMultimeter, "get_reading", get_reading)
+    runner = CliRunner()
+    result = runner.invoke(click.get_reading, ["--connect", "/dev/null", "-n", "2", "-f", "ndjson"])
+    assert result.exit_code == 0
+    assert calls == [False, False]
+    result = runner.invoke(click.get_reading, ["--connect", "/dev/null", "-n", "2", "-i", "0.01", "-f", "ndjson"])
+    assert result.exit_code == 0
+    assert calls[2:] == [True, True]